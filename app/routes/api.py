@@ -1,17 +1,34 @@
 # app/routes/api.py
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response
 import ccxt
 from config import Config
-from app.services.monitor import SharedState, add_log
+from app.services.monitor import SharedState, add_log, get_public_exchange
+from app.services.exchange_registry import ExchangeRegistry
+from app.services.market_bus import MarketBus
+from app.services.rate_limiter import RateLimiter
+from app.utils.metrics import Metrics
+from app.utils.request_cache import SingleFlightCache
+from app.services.system_sampler import SystemSampler
+from app.services.candle_store import CandleStore
+from app.services.market_feed import MarketFeed
 from app.services.bot_manager import BotManager
 import json, os
+import hashlib
 import copy # 用于深拷贝配置
 
 bp = Blueprint('api', __name__)
 
+# /api/kline 响应缓存 (请求合并 + 短 TTL)
+kline_cache = SingleFlightCache(ttl=getattr(Config, 'KLINE_CACHE_TTL', 1.5))
+
 @bp.route('/market_status')
 def market_status():
-    return jsonify(SharedState.market_data)
+    # 总线快照整体替换，读到的一定是完整的一版
+    data = dict(MarketBus.snapshot())
+    # 系统状态由独立采样线程提供，读取时挂载到 BTC/USDT (前端沿用原字段)
+    if "BTC/USDT" in data:
+        data["BTC/USDT"] = {**data["BTC/USDT"], **SystemSampler.latest()}
+    return jsonify(data)
 
 @bp.route('/set_timeframe', methods=['POST'])
 def set_timeframe():
@@ -47,22 +64,41 @@ def update_source():
     except Exception as e:
         return jsonify({"status": "error", "msg": str(e)})
 
+@bp.route('/system/stats')
+def system_stats():
+    """系统资源采样历史 (环形缓冲)"""
+    return jsonify({"status": "ok", "latest": SystemSampler.latest(), "history": SystemSampler.snapshot()})
+
+@bp.route('/system/indicator_cache')
+def indicator_cache_stats():
+    """指标缓存命中统计"""
+    return jsonify({"status": "ok", "stats": SharedState.indicator_cache.stats(),
+                    "kline_cache": kline_cache.stats()})
+
+@bp.route('/system/rate_limits')
+def rate_limit_stats():
+    """各交易所共享限频桶的状态 (按优先级统计排队与等待)"""
+    return jsonify({"status": "ok", "buckets": RateLimiter.stats(), "clients": ExchangeRegistry.stats()})
+
+@bp.route('/metrics')
+def metrics():
+    """交易所请求 / 指标计算耗时 (Prometheus 文本格式，含 p50/p95/p99)"""
+    return Response(Metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @bp.route('/check_balance', methods=['POST'])
 def check_balance():
     try:
         data = request.json
         exchange_id = data.get('exchange_id', 'binance')
-        exchange_class = getattr(ccxt, exchange_id)
-        params = {
-            'apiKey': data.get('api_key'),
-            'secret': data.get('secret'),
-            'timeout': 10000,
-            'options': {'defaultType': 'swap'}
-        }
-        if data.get('password'):
-            params['password'] = data.get('password')
-            
-        ex = exchange_class(params)
+        if not hasattr(ccxt, exchange_id):
+            return jsonify({"status": "error", "msg": f"不支持的交易所: {exchange_id}"})
+
+        # 用户随手提交的凭证只做一次性校验: 临时客户端不进注册表 (避免常驻内存、无限增长)
+        ex = ExchangeRegistry.create(exchange_id, 'swap',
+                                  api_key=data.get('api_key') or '',
+                                  secret=data.get('secret') or '',
+                                  password=data.get('password') or '',
+                                  timeout=10000)
         bal = ex.fetch_balance()
         quote = data.get('quote', 'USDT')
         
@@ -76,6 +112,22 @@ def check_balance():
     except Exception as e:
         return jsonify({"status": "error", "msg": str(e)})
 
+def _load_kline(source, symbol, tf):
+    """拉取 K 线并预先序列化，返回 (body, etag)"""
+    # 与监控线程共用本地 K 线仓库，避免每次刷新都整段下载
+    if MarketFeed.offline():
+        # 离线回放: 只读回放事件写入的本地序列，不访问交易所
+        ohlcv = CandleStore.read(source, symbol, tf, limit=500)
+    else:
+        # 与监控线程共用同一个长连接客户端 (不再每次请求新建实例、重下市场元数据)
+        exchange = get_public_exchange(verbose=False)
+        # 图表请求优先级最低，限频紧张时让行给交易与行情轮询
+        with RateLimiter.priority(RateLimiter.CHART):
+            ohlcv = CandleStore.get_ohlcv(exchange, source, symbol, tf, limit=500)
+    body = json.dumps({"status": "ok", "data": ohlcv}, separators=(',', ':'))
+    etag = hashlib.md5(body.encode('utf-8')).hexdigest()
+    return body, etag
+
 @bp.route('/kline')
 def get_kline():
     try:
@@ -83,53 +135,63 @@ def get_kline():
         tf = request.args.get('tf', '1h')
         source = getattr(Config, 'MARKET_SOURCE', 'binance')
         
-        if source == 'coinbase':
-            exchange = ccxt.coinbase({'enableRateLimit': True})
-            if 'USDT' in symbol: symbol = symbol.replace('USDT', 'USD')
-        elif source == 'okx':
-            exchange = ccxt.okx({'enableRateLimit': True, 'options': {'defaultType': 'swap'}})
-        else:
-            exchange = ccxt.binance({'enableRateLimit': True})
+        if source == 'coinbase' and 'USDT' in symbol:
+            symbol = symbol.replace('USDT', 'USD')
+        
+        # 多个图表页同时轮询同一品种时，只触发一次上游拉取，结果在短 TTL 内共享
+        body, etag = kline_cache.get((source, symbol, tf), lambda: _load_kline(source, symbol, tf))
         
-        ohlcv = exchange.fetch_ohlcv(symbol, timeframe=tf, limit=500)
-        return jsonify({"status": "ok", "data": ohlcv})
+        # 数据未变化时返回 304，前端沿用已有数据
+        if etag in request.if_none_match:
+            resp = Response(status=304)
+        else:
+            resp = Response(body, mimetype='application/json')
+        resp.set_etag(etag)
+        resp.headers['Cache-Control'] = 'no-cache'
+        return resp
     except Exception as e:
         return jsonify({"status": "error", "msg": str(e)})
 
+# 旧版 /future/* 接口对应 default 机器人；/bots/<bot_id>/* 为多机器人接口
 @bp.route('/future/start', methods=['POST'])
-def future_start():
+@bp.route('/bots/<bot_id>/start', methods=['POST'])
+def future_start(bot_id=BotManager.DEFAULT_ID):
     try:
-        BotManager.start_bot(request.json)
+        BotManager.start_bot(request.json, bot_id)
         return jsonify({"status": "ok"})
     except Exception as e:
         return jsonify({"status": "error", "msg": str(e)})
 
 @bp.route('/future/stop', methods=['POST'])
-def future_stop():
-    BotManager.stop_bot()
+@bp.route('/bots/<bot_id>/stop', methods=['POST'])
+def future_stop(bot_id=BotManager.DEFAULT_ID):
+    BotManager.stop_bot(bot_id)
     return jsonify({"status": "ok"})
 
 @bp.route('/future/pause', methods=['POST'])
-def future_pause():
+@bp.route('/bots/<bot_id>/pause', methods=['POST'])
+def future_pause(bot_id=BotManager.DEFAULT_ID):
     try:
-        BotManager.pause_bot()
+        BotManager.pause_bot(bot_id)
         return jsonify({"status": "ok"})
     except Exception as e:
         return jsonify({"status": "error", "msg": str(e)})
 
 @bp.route('/future/resume', methods=['POST'])
-def future_resume():
+@bp.route('/bots/<bot_id>/resume', methods=['POST'])
+def future_resume(bot_id=BotManager.DEFAULT_ID):
     try:
-        BotManager.resume_bot()
+        BotManager.resume_bot(bot_id)
         return jsonify({"status": "ok"})
     except Exception as e:
         return jsonify({"status": "error", "msg": str(e)})
 
 @bp.route('/future/update', methods=['POST'])
-def future_update():
+@bp.route('/bots/<bot_id>/update', methods=['POST'])
+def future_update(bot_id=BotManager.DEFAULT_ID):
     try:
         # 这里由 BotManager 内部处理保存逻辑 (Write-Through)
-        keys = BotManager.update_config(request.json)
+        keys = BotManager.update_config(request.json, bot_id)
         if keys:
             add_log(f"[指令] 参数热更新: {', '.join(keys)}")
             return jsonify({'status': 'ok', 'msg': f'已更新: {", ".join(keys)}'})
@@ -137,9 +199,28 @@ def future_update():
     except Exception as e:
         return jsonify({'status': 'error', 'msg': str(e)})
 
+@bp.route('/bots')
+def bots_list():
+    """所有机器人的概要状态"""
+    bots = []
+    for bot_id, bot in sorted(BotManager.list_bots().items()):
+        data = bot.status_data
+        bots.append({
+            "id": bot_id,
+            "symbol": bot.config.get('symbol'),
+            "exchange_id": bot.config.get('exchange_id', 'binance'),
+            "running": bot.running,
+            "paused": bot.paused,
+            "last_price": data.get('last_price', 0),
+            "current_pos": data.get('current_pos', 0),
+            "unrealized_pnl": data.get('unrealized_pnl', 0),
+        })
+    return jsonify({"status": "ok", "bots": bots})
+
 @bp.route('/future/status')
-def future_status():
-    bot = BotManager.get_bot()
+@bp.route('/bots/<bot_id>/status')
+def future_status(bot_id=BotManager.DEFAULT_ID):
+    bot = BotManager.get_bot(bot_id)
     
     res = {
         "running": False,
@@ -153,8 +234,8 @@ def future_status():
     target_symbol = "BTC/USDT" 
     if bot: target_symbol = bot.config.get('symbol', "BTC/USDT")
     
-    if target_symbol in SharedState.market_data:
-        m_data = SharedState.market_data[target_symbol]
+    m_data = MarketBus.get(target_symbol)
+    if m_data:
         res['current_price'] = m_data['price']
         res['smi'] = m_data['smi']
         res['rsi'] = m_data['rsi']
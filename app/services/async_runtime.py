@@ -0,0 +1,119 @@
+# app/services/async_runtime.py
+# ---------------------------------------
+# 共享 asyncio 运行时
+# - 进程内只有一个事件循环线程，所有异步模式的机器人与异步 ccxt 客户端都挂在上面
+# - AsyncExchangeFacade: 把异步 ccxt 客户端包装成同步调用接口，
+#   使策略 Mixin (同步代码) 无需改写即可在工作线程中使用异步客户端，
+#   网络 IO 统一在事件循环上并发完成
+# ---------------------------------------
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from config import Config
+
+
+class AsyncRuntime:
+    CALL_TIMEOUT = 60      # 同步调用等待协程结果的上限 (秒)
+    STEP_WORKERS = getattr(Config, 'BOT_STEP_WORKERS', 16)   # 所有机器人同步步进共用的线程数
+
+    _loop = None
+    _thread = None
+    _step_pool = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def loop(cls):
+        """获取 (必要时启动) 共享事件循环"""
+        if cls._loop is None:
+            with cls._lock:
+                if cls._loop is None:
+                    ready = threading.Event()
+                    cls._thread = threading.Thread(target=cls._run, args=(ready,), daemon=True,
+                                                   name="async-runtime")
+                    cls._thread.start()
+                    ready.wait()
+        return cls._loop
+
+    @classmethod
+    def _run(cls, ready):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        cls._loop = loop
+        ready.set()
+        loop.run_forever()
+
+    @classmethod
+    def step_pool(cls):
+        """
+        所有机器人的同步步进共用的有界线程池 (线程数不随机器人数量增长)
+        步进只在执行期间占用线程，机器人多于线程数时排队轮流执行
+        与事件循环的默认线程池分开: 步进中同步等待的协程若用到默认线程池 (如 DNS 解析)，不会与步进互相占满
+        """
+        if cls._step_pool is None:
+            with cls._lock:
+                if cls._step_pool is None:
+                    cls._step_pool = ThreadPoolExecutor(max_workers=cls.STEP_WORKERS, thread_name_prefix="bot-step")
+        return cls._step_pool
+
+    @classmethod
+    async def run_blocking(cls, func, *args):
+        """在共享步进线程池中执行同步函数并 await 结果 (在事件循环上调用)"""
+        return await asyncio.get_running_loop().run_in_executor(cls.step_pool(), functools.partial(func, *args))
+
+    @classmethod
+    def in_loop_thread(cls):
+        return threading.current_thread() is cls._thread
+
+    @classmethod
+    def spawn(cls, coro):
+        """在共享循环上启动协程，返回 concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, cls.loop())
+
+    @classmethod
+    def run(cls, coro, timeout=None):
+        """从普通线程同步等待协程结果 (不可在事件循环线程内调用)"""
+        if cls.in_loop_thread():
+            coro.close()
+            raise RuntimeError("不能在事件循环线程内同步等待协程")
+        return cls.spawn(coro).result(timeout or cls.CALL_TIMEOUT)
+
+    @classmethod
+    def call_soon(cls, callback, *args):
+        """线程安全地在事件循环上调度一个普通回调 (如 asyncio.Event.set)"""
+        cls.loop().call_soon_threadsafe(callback, *args)
+
+
+class AsyncExchangeFacade:
+    """
+    异步 ccxt 客户端的同步外观:
+    协程方法 -> 提交到共享循环并阻塞等待结果；其余属性 (markets / has / id / 精度函数等) 直接透传
+    原始异步客户端可通过 .client 访问，供协程代码直接 await
+    """
+
+    def __init__(self, client):
+        object.__setattr__(self, 'client', client)
+
+    def __getattr__(self, name):
+        attr = getattr(self.client, name)
+        if asyncio.iscoroutinefunction(attr):
+            def call(*args, **kwargs):
+                return AsyncRuntime.run(attr(*args, **kwargs))
+            call.__name__ = name
+            return call
+        return attr
+
+    def __setattr__(self, name, value):
+        setattr(self.client, name, value)
+
+    def gather(self, *calls):
+        """
+        并发执行多个调用并按顺序返回结果 (单次跨线程往返)
+        calls: [(method_name, args, kwargs), ...]；失败的调用返回异常对象
+        """
+        async def run_all():
+            return await asyncio.gather(
+                *(getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in calls),
+                return_exceptions=True)
+        return AsyncRuntime.run(run_all())
@@ -8,6 +8,7 @@ import logging
 import traceback
 
 from app.services.monitor import SharedState
+from app.services.market_bus import MarketBus
 
 # ============ 路径常量 ============
 CONFIG_PATH = "autopilot_config.json"  # 本地开发路径
@@ -22,11 +23,12 @@ logger = logging.getLogger(__name__)
 class AutoPilotService:
     """
     SignalGuard / AutoPilot 服务 (单例模式)
-    重构版: 使用 SharedState 数据源，支持用户自定义执行目标
+    重构版: 订阅 MarketBus 行情总线 (事件驱动)，支持用户自定义执行目标
     """
     _instance = None
     _lock = threading.Lock()
     _initialized = False
+    RELOAD_INTERVAL = 1.0   # 配置 / 状态文件的最短重读间隔 (秒)
 
     def __new__(cls):
         if cls._instance is None:
@@ -63,8 +65,8 @@ class AutoPilotService:
             instance._running = True
             instance.worker = threading.Thread(target=instance._run_loop, daemon=True)
             instance.worker.start()
-            logger.info("[AutoPilot] 后台监控服务已启动 (SharedState 模式)")
-            print("[AutoPilot] 后台监控服务已启动 (SharedState 模式)")
+            logger.info("[AutoPilot] 后台监控服务已启动 (MarketBus 模式)")
+            print("[AutoPilot] 后台监控服务已启动 (MarketBus 模式)")
 
     @classmethod
     def get_runtime_data(cls):
@@ -74,62 +76,72 @@ class AutoPilotService:
 
     # ============ 核心监控循环 (重构版) ============
     def _run_loop(self):
-        """主监控循环 - 从 SharedState 读取数据"""
-        while self._running:
-            try:
-                # 1. 重新加载状态和配置
-                self.state = self.load_state()
-                self.config = self.load_config()
-                
-                # 1. 动态获取主页正在监控的交易对 (Dynamic Discovery)
-                active_symbols = list(SharedState.market_data.keys())
-                
-                # 如果主页还没准备好
-                if not active_symbols:
-                    time.sleep(3)
-                    continue
-                
-                # 默认跟随主页的第一个交易对
-                watch_symbol = active_symbols[0]
-                market_entry = SharedState.market_data.get(watch_symbol, {})
-                
-                # 获取主页当前的周期 (用于 UI 显示)
-                current_tf = SharedState.watch_settings.get(watch_symbol, 'Unknown')
+        """主监控循环 - 订阅行情总线，有新数据立即处理"""
+        subscription = None
+        subscribed_symbol = None
+        last_reload = 0
+        try:
+            while self._running:
+                try:
+                    # 默认跟随主页监控列表的第一个交易对 (与行情线程的发布顺序无关)
+                    watch_symbol = next(iter(SharedState.watch_settings), None)
+                    if subscription is None or watch_symbol != subscribed_symbol:
+                        # 只订阅监控品种，队列只保留其最新一条更新 (消费慢时旧更新直接丢弃)
+                        if subscription is not None:
+                            subscription.close()
+                        subscription = MarketBus.subscribe_queue(
+                            symbols=[watch_symbol] if watch_symbol else None, maxsize=1)
+                        subscribed_symbol = watch_symbol
 
-                smi_value = market_entry.get('smi')
-                current_price = market_entry.get('price')
-                triggers = self.config.get('sentinel', {}).get('triggers', {})
-                
-                # 3. 验证数据
-                if smi_value is None or current_price is None:
-                    logger.debug(f"[AutoPilot] 等待主页数据初始化... (watched: {watch_symbol})")
-                    time.sleep(3)
-                    continue
-                
-                # 4. 更新运行时数据 (供 API 读取)
-                self.runtime_data.update({
-                    'smi': smi_value,
-                    'price': current_price,
-                    'monitor_symbol': watch_symbol,  # Send actual source to UI
-                    'monitor_tf': current_tf,        # Send actual TF to UI
-                    'updated_at': time.time()
-                })
-                
-                # 5. 检查是否启用 (仅拦截交易逻辑，数据已更新)
-                if not self.state.get('enabled', False):
-                    time.sleep(3)  # 空闲时快速轮询保持 UI 更新
-                    continue
-                
-                # 6. 核心逻辑分支 (The Brain)
-                self._process_signal(smi_value, current_price, triggers)
-                
-                # 7. 快速轮询 (仅读内存，安全)
-                time.sleep(3)
-                
-            except Exception as e:
-                logger.error(f"[AutoPilot] 监控循环异常: {e}")
-                logger.error(traceback.format_exc())
-                time.sleep(5)
+                    # 等待行情更新；超时也走一轮，保持 UI 数据与配置刷新
+                    subscription.get(timeout=3)
+
+                    # 1. 重新加载状态和配置 (更新频繁时限制磁盘读取频率)
+                    if time.time() - last_reload >= self.RELOAD_INTERVAL:
+                        self.state = self.load_state()
+                        self.config = self.load_config()
+                        last_reload = time.time()
+                    
+                    # 如果主页还没准备好
+                    if watch_symbol is None:
+                        continue
+                    market_entry = MarketBus.get(watch_symbol, {})
+                    
+                    # 获取主页当前的周期 (用于 UI 显示)
+                    current_tf = SharedState.watch_settings.get(watch_symbol, 'Unknown')
+
+                    smi_value = market_entry.get('smi')
+                    current_price = market_entry.get('price')
+                    triggers = self.config.get('sentinel', {}).get('triggers', {})
+                    
+                    # 3. 验证数据
+                    if smi_value is None or current_price is None:
+                        logger.debug(f"[AutoPilot] 等待主页数据初始化... (watched: {watch_symbol})")
+                        continue
+                    
+                    # 4. 更新运行时数据 (供 API 读取)
+                    self.runtime_data.update({
+                        'smi': smi_value,
+                        'price': current_price,
+                        'monitor_symbol': watch_symbol,  # Send actual source to UI
+                        'monitor_tf': current_tf,        # Send actual TF to UI
+                        'updated_at': time.time()
+                    })
+                    
+                    # 5. 检查是否启用 (仅拦截交易逻辑，数据已更新)
+                    if not self.state.get('enabled', False):
+                        continue
+                    
+                    # 6. 核心逻辑分支 (The Brain)
+                    self._process_signal(smi_value, current_price, triggers)
+                    
+                except Exception as e:
+                    logger.error(f"[AutoPilot] 监控循环异常: {e}")
+                    logger.error(traceback.format_exc())
+                    time.sleep(5)
+        finally:
+            if subscription is not None:
+                subscription.close()
 
     def _process_signal(self, smi_value, current_price, triggers):
         """信号处理核心逻辑 (The Brain)"""
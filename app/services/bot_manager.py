@@ -1,115 +1,160 @@
 # app/services/bot_manager.py
+# ---------------------------------------
+# 合约网格机器人管理器 (多实例)
+# - 按 bot_id 托管多个 FutureGridBot；旧版单机器人接口对应 'default'
+# - 默认 (async) 所有机器人共用一个事件循环与有界步进线程池 (见 AsyncRuntime，BOT_STEP_WORKERS)，
+#   机器人数量不受线程数限制，步进排队轮流执行；execution_mode='thread' 的机器人各占一个步进线程，
+#   下单 / 撤单共用有界提交线程池 (ORDER_SUBMIT_POOL_SIZE)；同一账户的交易所客户端由 ExchangeRegistry 复用
+# - 每个机器人一个状态文件 (default 沿用原路径)，重启后逐个恢复
+# ---------------------------------------
 import json
 import os
+import re
+import threading
 from app.strategies.future_grid_strategy import FutureGridBot
 from app.services.monitor import add_log
 
 class BotManager:
-    _future_bot = None  # 单例实例
+    DEFAULT_ID = 'default'
+    _bots = {}  # { bot_id: FutureGridBot }
+    _lock = threading.Lock()
     STATE_FILE = "bot_state.json"  # 本地开发路径
     EXTERNAL_STATE_PATH = "/opt/myquant_config/bot_state.json" # VPS 生产路径
+    BOTS_STATE_DIR = "/opt/myquant_config/bots"  # 其余机器人的状态文件目录 (<bot_id>.json)
+    BOT_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,32}$')
 
     @classmethod
-    def get_bot(cls):
-        return cls._future_bot
+    def get_bot(cls, bot_id=DEFAULT_ID):
+        return cls._bots.get(bot_id)
 
     @classmethod
-    def start_bot(cls, config):
-        if cls._future_bot and cls._future_bot.running:
-            raise Exception("策略已在运行中")
-        
-        # 初始化并启动
-        cls._future_bot = FutureGridBot(config, add_log)
-        cls._future_bot.start()
-        add_log("[Manager] 机器人实例已创建并启动")
+    def list_bots(cls):
+        return dict(cls._bots)
+
+    @classmethod
+    def _require_running(cls, bot_id, action):
+        bot = cls._bots.get(bot_id)
+        if not bot or not bot.running:
+            raise Exception(f"策略未运行，无法{action}")
+        return bot
+
+    @classmethod
+    def _bot_logger(cls, bot_id):
+        if bot_id == cls.DEFAULT_ID:
+            return add_log
+        return lambda msg: add_log(f"[{bot_id}] {msg}")
+
+    @classmethod
+    def start_bot(cls, config, bot_id=DEFAULT_ID):
+        if not cls.BOT_ID_PATTERN.match(bot_id or ''):
+            raise Exception("机器人 ID 只能包含字母、数字、下划线和短横线 (最长 32 位)")
+
+        with cls._lock:
+            bot = cls._bots.get(bot_id)
+            if bot and bot.running:
+                raise Exception("策略已在运行中")
+
+            # 同一交易所同一品种只允许一个机器人 (撤单 / 纠偏按品种操作，会互相干扰)
+            exchange_id = config.get('exchange_id', 'binance')
+            for other_id, other in cls._bots.items():
+                if other.running and other.config.get('symbol') == config.get('symbol') \
+                        and other.config.get('exchange_id', 'binance') == exchange_id:
+                    raise Exception(f"{config.get('symbol')} 已由机器人 {other_id} 运行")
+
+            # 初始化并启动
+            bot = FutureGridBot(config, cls._bot_logger(bot_id))
+            cls._bots[bot_id] = bot
+        bot.start()
+        add_log(f"[Manager] 机器人实例已创建并启动: {bot_id}")
         
         # 启动成功后，保存状态
-        cls.save_state()
+        cls.save_state(bot_id)
 
     @classmethod
-    def stop_bot(cls):
-        if cls._future_bot:
-            cls._future_bot.stop()
-            add_log("[Manager] 停止指令已下达")
+    def stop_bot(cls, bot_id=DEFAULT_ID):
+        bot = cls._bots.get(bot_id)
+        if bot:
+            bot.stop()
+            add_log(f"[Manager] 停止指令已下达: {bot_id}")
             
             # 停止后，保存状态 (running=False)
-            cls.save_state()
+            cls.save_state(bot_id)
 
     @classmethod
-    def pause_bot(cls):
-        if cls._future_bot and cls._future_bot.running:
-            cls._future_bot.pause()
-            add_log("[Manager] 暂停指令已下达")
-            
-            # 暂停后，保存状态 (paused=True)
-            cls.save_state()
-        else:
-            raise Exception("策略未运行，无法暂停")
+    def pause_bot(cls, bot_id=DEFAULT_ID):
+        bot = cls._require_running(bot_id, "暂停")
+        bot.pause()
+        add_log(f"[Manager] 暂停指令已下达: {bot_id}")
+        
+        # 暂停后，保存状态 (paused=True)
+        cls.save_state(bot_id)
 
     @classmethod
-    def resume_bot(cls):
-        if cls._future_bot and cls._future_bot.running:
-            cls._future_bot.resume()
-            add_log("[Manager] 恢复指令已下达")
-            
-            # 恢复后，保存状态 (paused=False)
-            cls.save_state()
-        else:
-            raise Exception("策略未运行，无法恢复")
+    def resume_bot(cls, bot_id=DEFAULT_ID):
+        bot = cls._require_running(bot_id, "恢复")
+        bot.resume()
+        add_log(f"[Manager] 恢复指令已下达: {bot_id}")
+        
+        # 恢复后，保存状态 (paused=False)
+        cls.save_state(bot_id)
     
+    # 热更新白名单: (请求字段, 配置字段, 类型, 名称)；grid_count 为 grid_num 的旧字段名
+    UPDATABLE = (
+        ('stop_loss', 'stop_loss', float, '止损'),
+        ('take_profit', 'take_profit', float, '止盈'),
+        ('active_order_limit', 'active_order_limit', int, '挂单数'),
+        ('grid_num', 'grid_num', int, '格数'),
+        ('grid_count', 'grid_num', int, '格数'),
+        ('upper_price', 'upper_price', float, '上限'),
+        ('lower_price', 'lower_price', float, '下限'),
+        ('amount', 'amount', float, '金额'),
+    )
+    RISK_KEYS = {'stop_loss', 'take_profit'}             # 只影响风控判断，不触碰交易所挂单
+    GRID_KEYS = {'grid_num', 'upper_price', 'lower_price'}  # 需要重新生成网格
+
+    @staticmethod
+    def _same_value(current, value, cast):
+        try:
+            return cast(current) == value
+        except (TypeError, ValueError):
+            return current == value
+
     @classmethod
-    def update_config(cls, updates):
-        """运行时热更新"""
-        if not cls._future_bot or not cls._future_bot.running:
+    def update_config(cls, updates, bot_id=DEFAULT_ID):
+        """运行时热更新 (只处理与当前配置不同的字段)"""
+        bot = cls._bots.get(bot_id)
+        if not bot or not bot.running:
             raise Exception("策略未运行")
         
         updated_keys = []
-        # 安全更新白名单
-        if 'stop_loss' in updates:
-            val = updates['stop_loss']
-            cls._future_bot.config['stop_loss'] = float(val) if val else ''
-            updated_keys.append('止损')
-            
-        if 'take_profit' in updates:
-            val = updates['take_profit']
-            cls._future_bot.config['take_profit'] = float(val) if val else ''
-            updated_keys.append('止盈')
-            
-        if 'active_order_limit' in updates and updates['active_order_limit']:
-            cls._future_bot.config['active_order_limit'] = int(updates['active_order_limit'])
-            updated_keys.append('挂单数')
-            
-        # 扩展：支持格数、区间、金额等核心参数更新
-        if 'grid_count' in updates and updates['grid_count']:
-            cls._future_bot.config['grid_count'] = int(updates['grid_count'])
-            updated_keys.append('格数')
-
-        if 'upper_price' in updates and updates['upper_price']:
-            cls._future_bot.config['upper_price'] = float(updates['upper_price'])
-            updated_keys.append('上限')
-
-        if 'lower_price' in updates and updates['lower_price']:
-            cls._future_bot.config['lower_price'] = float(updates['lower_price'])
-            updated_keys.append('下限')
-            
-        if 'amount' in updates and updates['amount']:
-            val = float(updates['amount'])
-            cls._future_bot.config['amount'] = val
-            cls._future_bot.order_qty = val # 同步更新缓存
-            updated_keys.append('金额')
+        changed = set()
+        for field, key, cast, label in cls.UPDATABLE:
+            if field not in updates: continue
+            raw = updates[field]
+            if key in cls.RISK_KEYS:
+                # 止盈止损允许清空
+                value = cast(raw) if raw else ''
+            elif not raw:
+                continue
+            else:
+                value = cast(raw)
+            if key in changed or cls._same_value(bot.config.get(key), value, cast): continue
+            bot.config[key] = value
+            changed.add(key)
+            updated_keys.append(label)
         
-        # 软重启逻辑：重算网格 + 重置挂单
-        if updated_keys:
+        # 软重启逻辑：仅对挂单有影响的参数做差量调整 (不撤全部挂单)
+        if changed - cls.RISK_KEYS:
             try:
-                # 1. 重新计算网格数组
-                cls._future_bot.generate_grids()
-                
-                # 2. 获取当前价格并重置挂单墙
-                current_price = cls._future_bot.status_data.get('last_price', 0)
+                current_price = bot.status_data.get('last_price', 0)
                 if current_price > 0:
-                    cls._future_bot.initialize_grid_orders(current_price)
-                    add_log(f"[Soft Restart] 参数已热更新，网格重置完成")
+                    bot.rebalance_orders(current_price, regrid=bool(changed & cls.GRID_KEYS))
+                    add_log(f"[Soft Restart] 参数已热更新，挂单差量调整完成")
                 else:
+                    # 无价格时只刷新参数缓存，挂单在下次纠偏 / 重启时按新参数铺设
+                    bot.order_qty = float(bot.config.get('amount', 0))
+                    if changed & cls.GRID_KEYS:
+                        bot.generate_grids()
                     add_log(f"[Soft Restart] 警告: 未获取到有效价格，仅更新参数")
                     
             except Exception as e:
@@ -117,70 +162,85 @@ class BotManager:
 
         # 【核心安全机制】参数更新后，强制保存最新配置到磁盘 (Write-Through)
         if updated_keys:
-            cls.save_state()
+            cls.save_state(bot_id)
             
         return updated_keys
 
     @classmethod
-    def save_state(cls):
-        """将当前状态写入硬盘"""
+    def state_path(cls, bot_id):
+        if bot_id == cls.DEFAULT_ID:
+            return cls.EXTERNAL_STATE_PATH
+        return os.path.join(cls.BOTS_STATE_DIR, f"{bot_id}.json")
+
+    @classmethod
+    def save_state(cls, bot_id=DEFAULT_ID):
+        """将指定机器人的状态写入硬盘"""
         state = {
             "running": False,
             "paused": False,
             "config": {}
         }
         
-        if cls._future_bot:
-            state["running"] = cls._future_bot.running
-            state["paused"] = getattr(cls._future_bot, "paused", False)
-            state["config"] = cls._future_bot.config
+        bot = cls._bots.get(bot_id)
+        if bot:
+            state["running"] = bot.running
+            state["paused"] = getattr(bot, "paused", False)
+            state["config"] = bot.config
         
         try:
+            state_path = cls.state_path(bot_id)
             # 确保存储目录存在
-            config_dir = os.path.dirname(cls.EXTERNAL_STATE_PATH)
+            config_dir = os.path.dirname(state_path)
             if config_dir and not os.path.exists(config_dir):
                 os.makedirs(config_dir, exist_ok=True)
 
-            with open(cls.EXTERNAL_STATE_PATH, 'w', encoding='utf-8') as f:
+            with open(state_path, 'w', encoding='utf-8') as f:
                 json.dump(state, f, indent=4, ensure_ascii=False)
         except Exception as e:
-            add_log(f"[系统] 状态保存失败: {e}")
+            add_log(f"[系统] 状态保存失败 ({bot_id}): {e}")
 
     @classmethod
     def load_state(cls):
-        """启动时从硬盘恢复状态"""
+        """启动时从硬盘恢复所有机器人的状态"""
         # 优先读取外部配置
         state_file = cls.EXTERNAL_STATE_PATH
-        if not os.path.exists(state_file):
+        if not os.path.exists(state_file) and os.path.exists(cls.STATE_FILE):
             # 回退到本地默认文件 (首次运行或迁移)
-            if os.path.exists(cls.STATE_FILE):
-                state_file = cls.STATE_FILE
-                add_log("[系统] 外部状态未找到，使用本地默认存档")
-            else:
-                return
-            
+            state_file = cls.STATE_FILE
+            add_log("[系统] 外部状态未找到，使用本地默认存档")
+        if os.path.exists(state_file):
+            cls._restore(cls.DEFAULT_ID, state_file)
+
+        if os.path.isdir(cls.BOTS_STATE_DIR):
+            for name in sorted(os.listdir(cls.BOTS_STATE_DIR)):
+                bot_id, ext = os.path.splitext(name)
+                if ext == '.json' and bot_id != cls.DEFAULT_ID and cls.BOT_ID_PATTERN.match(bot_id):
+                    cls._restore(bot_id, os.path.join(cls.BOTS_STATE_DIR, name))
+
+    @classmethod
+    def _restore(cls, bot_id, state_file):
         try:
             with open(state_file, 'r', encoding='utf-8') as f:
                 state = json.load(f)
             
             # 如果存档显示之前是运行状态，则自动重启
             if state.get("running", False) and state.get("config"):
-                print(">>> [System] 检测到异常退出/重启，正在恢复策略...")
-                add_log("[系统] 检测到存档，正在自动恢复策略...")
+                print(f">>> [System] 检测到异常退出/重启，正在恢复策略 {bot_id}...")
+                add_log(f"[系统] 检测到存档，正在自动恢复策略: {bot_id}")
                 
                 # 1. 恢复启动 (使用之前的配置)
                 try:
-                    cls.start_bot(state["config"])
+                    cls.start_bot(state["config"], bot_id)
                 except Exception as e:
-                    add_log(f"[恢复失败] 启动出错: {e}")
+                    add_log(f"[恢复失败] {bot_id} 启动出错: {e}")
                     return
 
                 # 2. 恢复暂停状态 (如果是暂停中)
                 if state.get("paused", False):
-                    cls.pause_bot()
-                    add_log("[系统] 已恢复至【暂停】状态")
+                    cls.pause_bot(bot_id)
+                    add_log(f"[系统] {bot_id} 已恢复至【暂停】状态")
                 else:
-                    add_log("[系统] 已恢复至【运行】状态")
+                    add_log(f"[系统] {bot_id} 已恢复至【运行】状态")
                     
         except Exception as e:
-            add_log(f"[系统] 状态恢复失败: {e}")
\ No newline at end of file
+            add_log(f"[系统] 状态恢复失败 ({bot_id}): {e}")
@@ -0,0 +1,418 @@
+# app/services/candle_store.py
+# ---------------------------------------
+# 本地 K 线仓库: 每个 (source, symbol, tf) 一个 numpy 环形缓冲区
+# 首次整段拉取，之后只用 since= 增量补齐最新几根
+# 可选落盘: 每个序列一个定长 .npy 内存映射文件，重启后零拷贝映射，只补停机期间的缺口
+# ---------------------------------------
+import os
+import re
+import threading
+import time
+import ccxt
+import numpy as np
+from config import Config
+
+# 持久化文件头 (第 0 行): [版本, 容量, 周期毫秒, head, count, 保留]
+_HEADER_VERSION = 1.0
+
+
+class CandleSeries:
+    """
+    定长环形缓冲区，按时间升序存放 ccxt 格式 K 线 [ts, o, h, l, c, v]
+    - 追加新 K 线 O(1)，超出容量时自动覆盖最旧的数据
+    - 已存在时间戳的 K 线被覆盖 (修订) 时返回变更标记
+    """
+
+    def __init__(self, capacity, tf_ms, path=None):
+        self.capacity = capacity
+        self.tf_ms = tf_ms
+        self.path = path
+        self._head = 0    # 最旧一根所在的物理下标
+        self._count = 0
+        self._header = None
+        self.accepted_gaps = set()   # 整段重建后仍存在的缺口 (上游本身缺数据)，不再触发重建
+
+        if path:
+            store = self._open_mapped(path, capacity, tf_ms)
+            self._header = store[0]
+            self._data = store[1:]
+            self._head = int(self._header[3])
+            self._count = int(self._header[4])
+        else:
+            self._data = np.zeros((capacity, 6), dtype=np.float64)
+
+    @staticmethod
+    def _open_mapped(path, capacity, tf_ms):
+        """映射已有文件 (布局不匹配则重建)；第 0 行为文件头，其余为 K 线数据"""
+        shape = (capacity + 1, 6)
+        if os.path.exists(path):
+            try:
+                store = np.load(path, mmap_mode='r+')
+                header = store[0]
+                if (store.shape == shape and store.dtype == np.float64 and
+                        header[0] == _HEADER_VERSION and header[1] == capacity and
+                        header[2] == tf_ms and 0 <= header[4] <= capacity):
+                    return store
+            except Exception as e:
+                print(f"[CandleStore] 缓存文件损坏，重建: {path} ({e})")
+
+        store = np.lib.format.open_memmap(path, mode='w+', dtype=np.float64, shape=shape)
+        store[0] = [_HEADER_VERSION, capacity, tf_ms, 0, 0, 0]
+        return store
+
+    def _sync_header(self):
+        if self._header is not None:
+            self._header[3] = self._head
+            self._header[4] = self._count
+
+    def flush(self):
+        """将映射页刷回磁盘 (进程被杀时内核也会写回，此处用于整段加载后的显式落盘)"""
+        if self._header is not None:
+            self._data.base.flush()
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def first_ts(self):
+        if not self._count: return None
+        return int(self._data[self._head, 0])
+
+    @property
+    def last_ts(self):
+        if not self._count: return None
+        return int(self._data[(self._head + self._count - 1) % self.capacity, 0])
+
+    def _physical(self, logical):
+        return (self._head + logical) % self.capacity
+
+    def _ordered_ts(self):
+        idx = (self._head + np.arange(self._count)) % self.capacity
+        return self._data[idx, 0]
+
+    def has(self, ts):
+        """缓冲区内是否存在该时间戳的 K 线"""
+        if not self._count or ts < self.first_ts or ts > self.last_ts:
+            return False
+        ordered_ts = self._ordered_ts()
+        pos = int(np.searchsorted(ordered_ts, ts))
+        return pos < self._count and ordered_ts[pos] == ts
+
+    def gap_timestamps(self):
+        """相邻两根间隔超过 1.5 个周期处，缺口之后那根 K 线的时间戳集合"""
+        if self._count < 2:
+            return set()
+        ordered_ts = self._ordered_ts()
+        idx = np.nonzero(np.diff(ordered_ts) > self.tf_ms * 1.5)[0]
+        return {int(ts) for ts in ordered_ts[idx + 1]}
+
+    def rows(self, limit=None):
+        """按时间升序返回 (最多 limit 根) K 线的二维数组副本"""
+        n = self._count if limit is None else min(limit, self._count)
+        idx = (self._head + np.arange(self._count - n, self._count)) % self.capacity
+        return self._data[idx]
+
+    def to_list(self, limit=None):
+        """返回 ccxt 格式列表 (时间戳为 int)"""
+        out = self.rows(limit).tolist()
+        for row in out:
+            row[0] = int(row[0])
+        return out
+
+    def clear(self):
+        self._head = 0
+        self._count = 0
+        self._sync_header()
+
+    def append(self, row):
+        if self._count < self.capacity:
+            self._data[self._physical(self._count)] = row
+            self._count += 1
+        else:
+            self._data[self._head] = row
+            self._head = (self._head + 1) % self.capacity
+        self._sync_header()
+
+    def merge(self, ohlcv):
+        """
+        合并一批按时间升序的 K 线
+        返回 (新增根数, 修订根数)；早于缓冲区起点的 K 线被忽略
+        """
+        appended = revised = 0
+        ordered_ts = None
+        for row in ohlcv:
+            # 部分交易所的成交量字段可能为 None
+            row = [0.0 if v is None else v for v in row[:6]]
+            ts = row[0]
+            last_ts = self.last_ts
+            if last_ts is None or ts > last_ts:
+                self.append(row)
+                appended += 1
+                ordered_ts = None
+                continue
+
+            if ordered_ts is None:
+                ordered_ts = self._ordered_ts()
+            pos = int(np.searchsorted(ordered_ts, ts))
+            if pos < self._count and ordered_ts[pos] == ts:
+                slot = self._physical(pos)
+                if not np.array_equal(self._data[slot], row):
+                    self._data[slot] = row
+                    revised += 1
+        return appended, revised
+
+
+class CandleStore:
+    """
+    进程内共享的 K 线仓库 (监控线程 / 图表接口 / 指标计算共用)
+    - 首次访问: fetch_ohlcv(limit=INITIAL_LIMIT) 整段填充
+    - 之后: since = 最后一根 - OVERLAP_BARS 根，只拉取重叠段 + 新 K 线
+      · 重叠段与本地不一致 -> 视为交易所修订，原位覆盖
+      · 单页未追到最新 -> 按 since 分页回补；返回数据与本地无重叠、相邻 K 线缺根或断档超过容量 -> 整段重建
+      · 重建后仍存在的缺口视为上游缺数据，不再反复重建
+    - 新序列只为交易所已知的市场 / 周期建立，且首次拉取成功后才分配缓冲区、写落盘文件
+    - 序列数超过 MAX_SERIES 时淘汰最久未访问的；超过 IDLE_SECONDS 未访问的由 evict_idle 清理
+    """
+    CAPACITY = 1000
+    INITIAL_LIMIT = 500
+    OVERLAP_BARS = 2
+    REFRESH_INTERVAL = 1.0   # 同一序列两次上游请求的最小间隔 (秒)
+    CACHE_DIR = getattr(Config, 'OHLCV_CACHE_DIR', None)   # None 表示仅内存
+    LOCAL_CACHE_DIR = "ohlcv_cache"                          # 生产目录不可写时的本地回退
+    MAX_SERIES = 256         # 内存中最多保留的序列数 (LRU)
+    IDLE_SECONDS = 1800      # 超过该时长未被读取的序列由 evict_idle 移出内存
+
+    _series = {}       # { (source, symbol, tf): CandleSeries }
+    _locks = {}        # { (source, symbol, tf): threading.Lock }
+    _last_refresh = {}
+    _last_access = {}  # { (source, symbol, tf): 最近一次读取时间 }
+    _lock = threading.Lock()
+    stats = {"full_loads": 0, "top_ups": 0, "backfills": 0, "gaps": 0, "revisions": 0}
+
+    @classmethod
+    def _key_lock(cls, key):
+        with cls._lock:
+            lock = cls._locks.get(key)
+            if lock is None:
+                lock = cls._locks[key] = threading.Lock()
+            return lock
+
+    @classmethod
+    def get_series(cls, source, symbol, tf):
+        return cls._series.get((source, symbol, tf))
+
+    @classmethod
+    def get_ohlcv(cls, exchange, source, symbol, tf, limit=500):
+        """读取 (必要时增量刷新) 某个序列，返回 ccxt 格式 K 线列表"""
+        key = (source, symbol, tf)
+        if key not in cls._series:
+            # 未知的交易对 / 周期 (如图表接口传入的任意参数) 直接拒绝，不建锁、不建序列
+            cls._validate(exchange, symbol, tf)
+
+        with cls._key_lock(key):
+            now = time.time()
+            series = cls._series.get(key)
+            if series is None:
+                series = cls._load_series(exchange, key, max(limit, cls.INITIAL_LIMIT))
+                if series is None:
+                    return []
+            elif now - cls._last_refresh.get(key, 0) >= cls.REFRESH_INTERVAL or not len(series):
+                cls._refresh(exchange, series, symbol, tf, max(limit, cls.INITIAL_LIMIT))
+                cls._last_refresh[key] = now
+
+            cls._last_access[key] = now
+            return series.to_list(limit)
+
+    @staticmethod
+    def _validate(exchange, symbol, tf):
+        """新序列只为交易所已知的市场 / 周期建立 (市场元数据未加载时跳过交易对检查)"""
+        markets = getattr(exchange, 'markets', None)
+        if markets and symbol not in markets:
+            raise ccxt.BadSymbol(f"未知交易对: {symbol}")
+        timeframes = getattr(exchange, 'timeframes', None)
+        if timeframes and tf not in timeframes:
+            raise ccxt.BadRequest(f"不支持的 K 线周期: {tf}")
+
+    @classmethod
+    def _load_series(cls, exchange, key, limit):
+        """
+        首次读取某序列 (已持有该 key 的锁): 有落盘缓存时映射后增量补齐，否则先整段拉取，
+        拉取成功且非空才分配缓冲区 / 创建落盘文件并登记；拉取失败时异常上抛，不留下任何状态
+        """
+        _, symbol, tf = key
+        tf_ms = exchange.parse_timeframe(tf) * 1000
+        path = cls._cache_path(key)
+        if path and os.path.exists(path):
+            # 重启后: 映射已有文件，只补停机期间的缺口
+            series = cls._create_series(key, tf_ms)
+            cls._refresh(exchange, series, symbol, tf, limit)
+        else:
+            rows = exchange.fetch_ohlcv(symbol, tf, limit=limit)
+            if not rows:
+                return None
+            series = cls._create_series(key, tf_ms)
+            cls._fill(series, rows)
+
+        with cls._lock:
+            cls._series[key] = series
+            cls._last_refresh[key] = time.time()
+            cls._last_access[key] = time.time()
+            cls._evict_overflow()
+        return series
+
+    @classmethod
+    def read(cls, source, symbol, tf, limit=500):
+        """只读本地序列 (不访问交易所)，未加载时返回空列表；供离线回放使用"""
+        key = (source, symbol, tf)
+        series = cls._series.get(key)
+        if series is None:
+            return []
+        cls._last_access[key] = time.time()
+        with cls._key_lock(key):
+            return series.to_list(limit)
+
+    @classmethod
+    def apply_candle(cls, source, symbol, tf, row, create=False):
+        """
+        合并推送来的单根 K 线 (默认仅对已加载的序列生效，未加载的序列等首次读取时整段拉取)
+        create=True (离线回放) 时为未加载的序列建立纯内存序列，不写入落盘缓存
+        """
+        key = (source, symbol, tf)
+        series = cls._series.get(key)
+        if create and series is None:
+            with cls._key_lock(key):
+                series = cls._series.get(key)
+                if series is None:
+                    tf_ms = ccxt.Exchange.parse_timeframe(tf) * 1000
+                    series = cls._series[key] = CandleSeries(cls.CAPACITY, tf_ms)
+                    cls._last_access[key] = time.time()
+        if series is None or (not len(series) and not create):
+            return
+        with cls._key_lock(key):
+            _, revised = series.merge([row])
+            cls.stats["revisions"] += revised
+
+    @classmethod
+    def _cache_path(cls, key):
+        """序列对应的落盘文件路径；目录均不可用时返回 None (退化为纯内存)"""
+        if not cls.CACHE_DIR:
+            return None
+        for cache_dir in (cls.CACHE_DIR, cls.LOCAL_CACHE_DIR):
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+                if os.access(cache_dir, os.W_OK):
+                    name = re.sub(r'[^A-Za-z0-9._-]', '-', '_'.join(key))
+                    return os.path.join(cache_dir, f"{name}.npy")
+            except OSError:
+                continue
+        return None
+
+    @classmethod
+    def _create_series(cls, key, tf_ms):
+        path = cls._cache_path(key)
+        if path:
+            try:
+                series = CandleSeries(cls.CAPACITY, tf_ms, path=path)
+                if len(series):
+                    print(f"[CandleStore] 已映射本地缓存 {key}: {len(series)} 根")
+                return series
+            except Exception as e:
+                print(f"[CandleStore] 缓存映射失败，改用内存: {e}")
+        return CandleSeries(cls.CAPACITY, tf_ms)
+
+    @classmethod
+    def _refresh(cls, exchange, series, symbol, tf, limit):
+        now_ms = time.time() * 1000
+        if not len(series) or (now_ms - series.last_ts) / series.tf_ms > series.capacity:
+            # 首次加载，或停机时间超过缓冲容量: 整段重建
+            cls._full_load(exchange, series, symbol, tf, limit)
+            return
+
+        cls.stats["top_ups"] += 1
+        since = series.last_ts - cls.OVERLAP_BARS * series.tf_ms
+        while True:
+            page = exchange.fetch_ohlcv(symbol, tf, since=since)
+            if not page:
+                return
+            gaps = cls._find_gaps(series, page) - series.accepted_gaps
+            if page[0][0] > series.last_ts or gaps:
+                # 断档: 返回数据与本地无重叠 (上游忽略 since)，或相邻 K 线之间缺根 / 重叠段本地缺根，整段重建
+                cls.stats["gaps"] += 1
+                cls._full_load(exchange, series, symbol, tf, limit)
+                return
+
+            prev_last = series.last_ts
+            _, revised = series.merge(page)
+            cls.stats["revisions"] += revised
+            if series.last_ts <= prev_last or series.last_ts >= now_ms - series.tf_ms:
+                return
+            # 单页未追到最新 (停机/断线期间积压): 继续按 since 分页回补
+            cls.stats["backfills"] += 1
+            since = series.last_ts
+
+    @classmethod
+    def _full_load(cls, exchange, series, symbol, tf, limit):
+        cls._fill(series, exchange.fetch_ohlcv(symbol, tf, limit=limit))
+
+    @classmethod
+    def _fill(cls, series, rows):
+        series.clear()
+        series.merge(rows)
+        series.flush()
+        # 整段重建后仍存在的缺口来自上游 (交易所本身无该 K 线)，记录下来避免每次刷新都重建
+        series.accepted_gaps = series.gap_timestamps()
+        cls.stats["full_loads"] += 1
+
+    @staticmethod
+    def _find_gaps(series, page):
+        """
+        检查一页增量数据的时间戳间隔，返回缺口之后那根 K 线的时间戳集合:
+        - 重叠段 (<= 本地最后一根) 内本地缺失的 K 线 (环形缓冲区只能追加，无法插入补齐)
+        - 本地最后一根 -> 新数据、以及新数据内部，相邻间隔超过 1.5 个周期 (月线等不等长周期也不误报)
+        """
+        gaps = set()
+        max_step = series.tf_ms * 1.5
+        prev = series.last_ts
+        for row in page:
+            ts = row[0]
+            if ts <= series.last_ts:
+                if ts >= series.first_ts and not series.has(ts):
+                    gaps.add(ts)
+                continue
+            if ts - prev > max_step:
+                gaps.add(ts)
+            prev = ts
+        return gaps
+
+    @classmethod
+    def evict(cls, source=None, symbol=None, tf=None):
+        """移除匹配的序列 (参数为 None 表示不限)"""
+        with cls._lock:
+            for key in list(cls._series.keys()):
+                if ((source is None or key[0] == source) and
+                        (symbol is None or key[1] == symbol) and
+                        (tf is None or key[2] == tf)):
+                    cls._drop(key)
+
+    @classmethod
+    def evict_idle(cls, max_idle=None):
+        """移除超过 max_idle 秒 (默认 IDLE_SECONDS) 未被读取的序列 (落盘文件保留，下次读取时重新映射)；返回移除数"""
+        cutoff = time.time() - (max_idle if max_idle is not None else cls.IDLE_SECONDS)
+        with cls._lock:
+            idle = [key for key in cls._series if cls._last_access.get(key, 0) < cutoff]
+            for key in idle:
+                cls._drop(key)
+        return len(idle)
+
+    @classmethod
+    def _evict_overflow(cls):
+        """序列数超过 MAX_SERIES 时淘汰最久未访问的 (调用方持有 cls._lock)"""
+        while len(cls._series) > cls.MAX_SERIES:
+            cls._drop(min(cls._series, key=lambda k: cls._last_access.get(k, 0)))
+
+    @classmethod
+    def _drop(cls, key):
+        cls._series.pop(key, None)
+        cls._last_refresh.pop(key, None)
+        cls._last_access.pop(key, None)
+        cls._locks.pop(key, None)
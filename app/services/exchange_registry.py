@@ -0,0 +1,97 @@
+# app/services/exchange_registry.py
+# ---------------------------------------
+# 进程级交易所客户端注册表
+# - 按 (exchange_id, market_type, 凭证哈希) 复用长连接客户端 (复用 HTTP keep-alive / TLS 会话)
+# - 市场元数据 (markets) 按 (exchange_id, market_type) 共享，TTL 过期后才重新下载
+# - 所有客户端的请求统一经过 RateLimiter 的按交易所令牌桶，并由 Metrics 记录各接口耗时
+# ---------------------------------------
+import hashlib
+import threading
+import time
+import ccxt
+import ccxt.async_support as ccxt_async
+
+from app.services.rate_limiter import RateLimiter
+from app.utils.metrics import Metrics
+
+
+class ExchangeRegistry:
+    MARKETS_TTL = 6 * 3600   # 市场元数据刷新周期 (秒)
+
+    _clients = {}        # { (exchange_id, market_type, cred_hash, async_mode): ccxt 实例 }
+    _markets = {}        # { (exchange_id, market_type): (loaded_at, markets, currencies) }
+    _market_locks = {}
+    _client_markets_at = {}   # { id(client): 该客户端注入的元数据版本 (loaded_at) }
+    _lock = threading.Lock()
+
+    @staticmethod
+    def credentials_hash(api_key='', secret='', password=''):
+        """凭证指纹 (不保存明文)，公共客户端为空串"""
+        if not api_key:
+            return ''
+        raw = f"{api_key}\x00{secret}\x00{password}".encode('utf-8')
+        return hashlib.sha256(raw).hexdigest()[:16]
+
+    @classmethod
+    def get(cls, exchange_id, market_type=None, api_key='', secret='', password='', timeout=30000,
+            async_mode=False):
+        """获取 (或创建) 一个长期复用的客户端；async_mode=True 时返回 ccxt.async_support 客户端"""
+        key = (exchange_id, market_type, cls.credentials_hash(api_key, secret, password), async_mode)
+        with cls._lock:
+            client = cls._clients.get(key)
+            if client is None:
+                client = cls._clients[key] = cls.create(exchange_id, market_type, api_key, secret, password,
+                                                        timeout, async_mode)
+        return client
+
+    @staticmethod
+    def create(exchange_id, market_type=None, api_key='', secret='', password='', timeout=30000,
+               async_mode=False):
+        """新建一个不入注册表的客户端 (一次性校验等场景，用完即释放，凭证不常驻内存)"""
+        params = {
+            'enableRateLimit': True,
+            'timeout': timeout
+        }
+        if market_type:
+            params['options'] = {'defaultType': market_type}
+        if api_key:
+            params['apiKey'] = api_key
+            params['secret'] = secret
+            if password:
+                params['password'] = password
+        client = getattr(ccxt_async if async_mode else ccxt, exchange_id)(params)
+        RateLimiter.install(client)
+        Metrics.instrument(client)
+        return client
+
+    @classmethod
+    def ensure_markets(cls, client):
+        """
+        确保客户端已加载市场元数据:
+        同一交易所/市场类型的元数据只下载一次，其他客户端直接注入；超过 TTL 再刷新
+        """
+        market_key = (client.id, client.options.get('defaultType'))
+        with cls._lock:
+            lock = cls._market_locks.setdefault(market_key, threading.Lock())
+
+        with lock:
+            cached = cls._markets.get(market_key)
+            now = time.time()
+            if cached and now - cached[0] < cls.MARKETS_TTL:
+                if cls._client_markets_at.get(id(client)) != cached[0]:
+                    client.set_markets(cached[1], cached[2])
+                    cls._client_markets_at[id(client)] = cached[0]
+                return client.markets
+
+            client.load_markets(reload=bool(cached))
+            cls._markets[market_key] = (now, client.markets, client.currencies)
+            cls._client_markets_at[id(client)] = now
+            return client.markets
+
+    @classmethod
+    def stats(cls):
+        return {
+            "clients": len(cls._clients),
+            "markets": {f"{k[0]}:{k[1] or 'default'}": int(time.time() - v[0])
+                        for k, v in cls._markets.items()}
+        }
@@ -0,0 +1,114 @@
+# app/services/market_bus.py
+# ---------------------------------------
+# 进程内行情总线 (pub/sub)
+# - 每个品种一份带版本号的最新状态 (价格 / 指标 / 延迟 ...)
+# - 发布时整体替换快照 dict (copy-on-write)，Flask 线程读取的永远是完整的一版
+# - 订阅方式: 回调 (在发布线程同步执行) 或可等待的队列 (满时丢弃最旧的更新)
+# ---------------------------------------
+import queue
+import threading
+
+
+class Subscription:
+    """队列订阅: 消费方在自己的线程中 get()，有更新立即返回"""
+
+    def __init__(self, symbols=None, maxsize=64):
+        self.symbols = set(symbols) if symbols else None
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def get(self, timeout=None):
+        """等待下一条更新，超时返回 None"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def _offer(self, update):
+        while True:
+            try:
+                self.queue.put_nowait(update)
+                return
+            except queue.Full:
+                # 消费跟不上时只保留最新的更新
+                try:
+                    self.queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def close(self):
+        MarketBus.unsubscribe(self)
+
+
+class MarketBus:
+    """
+    更新格式 (dict):
+      {'symbol': 'BTC/USDT', 'version': 12, 'data': {...完整状态...}, 'changed': ('price', ...)}
+    """
+    _snapshot = {}       # { symbol: entry }，只整体替换，不原地修改
+    _version = 0         # 全局版本号 (任意品种更新即 +1)
+    _callbacks = []      # [(symbols 或 None, callback)]
+    _subscriptions = []
+    _lock = threading.Lock()
+
+    @classmethod
+    def publish(cls, symbol, fields, create=True):
+        """
+        合并发布某品种的状态字段；create=False 时仅更新已存在的品种
+        返回本次更新的版本号 (未发布返回 None)
+        """
+        with cls._lock:
+            previous = cls._snapshot.get(symbol)
+            if previous is None and not create:
+                return None
+            cls._version += 1
+            entry = {**previous, **fields} if previous else dict(fields)
+            entry['version'] = cls._version
+            snapshot = dict(cls._snapshot)
+            snapshot[symbol] = entry
+            cls._snapshot = snapshot
+            callbacks, subscriptions = cls._callbacks, cls._subscriptions
+
+        update = {'symbol': symbol, 'version': entry['version'], 'data': entry, 'changed': tuple(fields)}
+        for symbols, callback in callbacks:
+            if symbols is not None and symbol not in symbols: continue
+            try:
+                callback(update)
+            except Exception as e:
+                print(f"[Bus] 订阅者回调异常: {e}")
+        for sub in subscriptions:
+            if sub.symbols is None or symbol in sub.symbols:
+                sub._offer(update)
+        return entry['version']
+
+    @classmethod
+    def snapshot(cls):
+        """当前全部品种的状态 (只读，调用方不要修改)"""
+        return cls._snapshot
+
+    @classmethod
+    def get(cls, symbol, default=None):
+        return cls._snapshot.get(symbol, default)
+
+    @classmethod
+    def version(cls):
+        return cls._version
+
+    @classmethod
+    def subscribe(cls, callback, symbols=None):
+        with cls._lock:
+            cls._callbacks = cls._callbacks + [(set(symbols) if symbols else None, callback)]
+
+    @classmethod
+    def subscribe_queue(cls, symbols=None, maxsize=64):
+        sub = Subscription(symbols, maxsize)
+        with cls._lock:
+            cls._subscriptions = cls._subscriptions + [sub]
+        return sub
+
+    @classmethod
+    def unsubscribe(cls, target):
+        with cls._lock:
+            cls._callbacks = [(s, cb) for s, cb in cls._callbacks if cb is not target]
+            cls._subscriptions = [sub for sub in cls._subscriptions if sub is not target]
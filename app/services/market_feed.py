@@ -0,0 +1,399 @@
+# app/services/market_feed.py
+# ---------------------------------------
+# 可插拔行情推送层 (Feed)
+# 适配器负责"从哪里拿数据"，MarketFeed 负责把事件推入 MarketBus 与订阅者
+#
+# 事件格式 (dict):
+#   ticker: {'type': 'ticker', 'source', 'symbol', 'market', 'price', 'ts', 'latency'}
+#   trade:  {'type': 'trade',  'source', 'symbol', 'price', 'amount', 'side', 'ts'}
+#   candle: {'type': 'candle', 'source', 'symbol', 'tf', 'ohlcv': [ts, o, h, l, c, v]}
+# symbol 一律为前端显示符号 (如 BTC/USDT)，与 MarketBus 快照的 key 一致；
+# market 为行情源实际报价的市场 (ccxt 统一符号，如现货 BTC/USDT / 永续 BTC/USDT:USDT)
+# 机器人经 MarketFeed.track_market 登记的交易市场单独报价，其 ticker 事件的 symbol 与 market 相同
+# (不在 MarketBus 中建立新品种，只推送给订阅者)
+# ---------------------------------------
+import asyncio
+import json
+from abc import ABC, abstractmethod
+import threading
+import time
+
+from config import Config
+from app.services.market_bus import MarketBus
+from app.services.monitor import (SharedState, add_log, get_public_exchange,
+                                  fetch_bulk_prices, resolve_market_symbol, to_query_symbol)
+
+
+class FeedAdapter(ABC):
+    """行情适配器接口: start() 后通过 self.emit(event) 推送事件"""
+    name = 'base'
+
+    def __init__(self, source, emit):
+        self.source = source
+        self._emit = emit
+        self.symbols = []
+        self._running = False
+        self._thread = None
+
+    def start(self, symbols):
+        self.symbols = list(symbols)
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True, name=f"feed-{self.name}")
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+
+    def emit(self, event):
+        event.setdefault('source', self.source)
+        self._emit(event)
+
+    @abstractmethod
+    def _run(self):
+        """适配器线程主体"""
+
+
+class RestPollingAdapter(FeedAdapter):
+    """REST 轮询适配器 (与原监控行为一致): 定时批量拉取价格并推送 ticker 事件"""
+    name = 'rest'
+
+    def __init__(self, source, emit, interval=2):
+        super().__init__(source, emit)
+        self.interval = interval
+
+    def _run(self):
+        exchange = get_public_exchange()
+        while self._running:
+            try:
+                self.poll_once(exchange)
+            except Exception as e:
+                print(f"[Feed:rest] 轮询异常: {e}")
+            time.sleep(self.interval)
+
+    def poll_once(self, exchange):
+        self._poll_display(exchange)
+        self._poll_markets(exchange)
+
+    def _poll_display(self, exchange):
+        prices = fetch_bulk_prices(exchange, self.source, self.symbols)
+        for display_symbol in self.symbols:
+            if display_symbol not in prices:
+                try:
+                    t1 = time.time()
+                    ticker = exchange.fetch_ticker(to_query_symbol(self.source, display_symbol))
+                    prices[display_symbol] = (float(ticker['last']), int((time.time() - t1) * 1000))
+                except Exception:
+                    # 偶尔报错不打印，防止刷屏
+                    continue
+
+        now = int(time.time() * 1000)
+        for display_symbol, (price, latency) in prices.items():
+            self.emit({'type': 'ticker', 'symbol': display_symbol,
+                       'market': resolve_market_symbol(exchange, self.source, display_symbol),
+                       'price': price, 'ts': now, 'latency': latency})
+
+    def _poll_markets(self, exchange):
+        """机器人登记的交易市场 (如永续 BTC/USDT:USDT): 按 ccxt 统一符号直接报价"""
+        markets = MarketFeed.tracked_markets()
+        if not markets: return
+
+        prices = {}
+        if len(markets) > 1 and exchange.has.get('fetchTickers'):
+            try:
+                t1 = time.time()
+                tickers = exchange.fetch_tickers(markets)
+                latency = int((time.time() - t1) * 1000)
+                for market, ticker in tickers.items():
+                    if market in markets and ticker.get('last') is not None:
+                        prices[market] = (float(ticker['last']), latency)
+            except Exception:
+                # 部分交易所不支持跨类型批量查询，本轮逐个请求
+                pass
+        for market in markets:
+            if market in prices: continue
+            try:
+                t1 = time.time()
+                ticker = exchange.fetch_ticker(market)
+                prices[market] = (float(ticker['last']), int((time.time() - t1) * 1000))
+            except Exception:
+                continue
+
+        now = int(time.time() * 1000)
+        for market, (price, latency) in prices.items():
+            self.emit({'type': 'ticker', 'symbol': market, 'market': market,
+                       'price': price, 'ts': now, 'latency': latency})
+
+
+class StreamingAdapter(FeedAdapter):
+    """
+    WebSocket 推送适配器 (基于 ccxt.pro 的 watch_* 接口)
+    在独立线程中运行 asyncio 事件循环，每个品种一个 watch 协程
+    """
+    name = 'stream'
+
+    def __init__(self, source, emit, watch_trades=False):
+        super().__init__(source, emit)
+        self.watch_trades = watch_trades
+
+    def _run(self):
+        asyncio.run(self._main())
+
+    def _create_exchange(self):
+        import ccxt.pro as ccxtpro
+        params = {'enableRateLimit': True}
+        if self.source == 'okx':
+            params['options'] = {'defaultType': 'swap'}
+        return getattr(ccxtpro, self.source)(params)
+
+    async def _main(self):
+        exchange = self._create_exchange()
+        try:
+            tasks = []
+            for display_symbol in self.symbols:
+                tasks.append(self._watch_ticker(exchange, display_symbol))
+                tasks.append(self._watch_candles(exchange, display_symbol))
+                if self.watch_trades:
+                    tasks.append(self._watch_trades(exchange, display_symbol))
+            tasks.append(self._watch_markets(exchange))
+            await asyncio.gather(*tasks)
+        finally:
+            await exchange.close()
+
+    async def _watch_markets(self, exchange):
+        """机器人登记的交易市场: 新登记的市场启动 watch 协程，取消登记后对应协程自行退出"""
+        watching = {}
+        try:
+            while self._running:
+                for market in MarketFeed.tracked_markets():
+                    task = watching.get(market)
+                    if task is None or task.done():
+                        watching[market] = asyncio.ensure_future(self._watch_ticker(exchange, market, market))
+                await asyncio.sleep(1)
+        finally:
+            for task in watching.values():
+                task.cancel()
+
+    async def _watch_ticker(self, exchange, display_symbol, market=None):
+        """market 非空时订阅机器人登记的交易市场 (直接按统一符号查询，取消登记后退出)"""
+        query_symbol = market or to_query_symbol(self.source, display_symbol)
+        while self._running and (market is None or MarketFeed.is_tracked(market)):
+            try:
+                ticker = await exchange.watch_ticker(query_symbol)
+                if ticker.get('last') is None: continue
+                self.emit({'type': 'ticker', 'symbol': display_symbol,
+                           'market': ticker.get('symbol') or query_symbol, 'price': float(ticker['last']),
+                           'ts': ticker.get('timestamp') or int(time.time() * 1000), 'latency': 0})
+            except Exception as e:
+                print(f"[Feed:stream] ticker {display_symbol} 断开，重连中: {e}")
+                await asyncio.sleep(1)
+
+    async def _watch_candles(self, exchange, display_symbol):
+        query_symbol = to_query_symbol(self.source, display_symbol)
+        if not exchange.has.get('watchOHLCV'): return
+        while self._running:
+            tf = SharedState.watch_settings.get(display_symbol, '1h')
+            try:
+                candles = await exchange.watch_ohlcv(query_symbol, tf)
+                for row in candles:
+                    self.emit({'type': 'candle', 'symbol': display_symbol, 'tf': tf, 'ohlcv': row})
+            except Exception as e:
+                print(f"[Feed:stream] K线 {display_symbol} 断开，重连中: {e}")
+                await asyncio.sleep(1)
+
+    async def _watch_trades(self, exchange, display_symbol):
+        query_symbol = to_query_symbol(self.source, display_symbol)
+        while self._running:
+            try:
+                trades = await exchange.watch_trades(query_symbol)
+                for t in trades:
+                    self.emit({'type': 'trade', 'symbol': display_symbol, 'price': float(t['price']),
+                               'amount': float(t['amount'] or 0), 'side': t.get('side'), 'ts': t['timestamp']})
+            except Exception as e:
+                print(f"[Feed:stream] 成交 {display_symbol} 断开，重连中: {e}")
+                await asyncio.sleep(1)
+
+
+class ReplayAdapter(FeedAdapter):
+    """
+    本地回放适配器: 按原始时间间隔 (可加速) 重放 FeedRecorder 录制的 JSONL 事件
+    用于离线测试，不访问任何交易所: 价格与 K 线均来自录制文件 (candle 事件写入内存 K 线序列，
+    监控线程回放模式下只读本地序列)；录制文件中没有 candle 事件时不计算指标
+    """
+    name = 'replay'
+
+    def __init__(self, source, emit, path, speed=1.0, loop=False):
+        super().__init__(source, emit)
+        self.path = path
+        self.speed = speed
+        self.loop = loop
+
+    def _run(self):
+        try:
+            while self._running:
+                self.replay_once()
+                if not self.loop: break
+        except Exception as e:
+            # 录制文件缺失 / 内容损坏: 记录后停止回放，不向线程抛出
+            add_log(f"[Feed] 回放失败，已停止: {self.path} ({e})")
+        self._running = False
+
+    def replay_once(self):
+        last_ts = None
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not self._running: return
+                line = line.strip()
+                if not line: continue
+                event = json.loads(line)
+                if self.symbols and event.get('symbol') not in self.symbols: continue
+
+                ts = event.get('ts') or (event.get('ohlcv') or [None])[0]
+                if last_ts is not None and ts and self.speed > 0:
+                    delay = (ts - last_ts) / 1000 / self.speed
+                    if delay > 0: time.sleep(delay)
+                if ts: last_ts = ts
+                self.emit(event)
+
+
+class FeedRecorder:
+    """
+    事件录制器: 作为订阅者挂到 MarketFeed 上，将事件逐行写入 JSONL 供回放
+    配置 FEED_RECORD_FILE 后由 MarketFeed.start 自动挂载 (rest / stream 模式)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        # received_at 为本进程的接收时间，回放时由 publish 重新生成
+        record = {k: v for k, v in event.items() if k != 'received_at'}
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+class MarketFeed:
+    """
+    行情推送中枢 (单例，类方法)
+    - 适配器产生的事件在此统一分发: 将最新价发布到 MarketBus，并回调所有订阅者
+    - 订阅者回调在适配器线程中同步执行，应保持轻量
+    """
+    _adapter = None
+    _recorder = None
+    _listeners = []
+    _latest = {}     # { symbol: ticker event }
+    _markets = {}    # { 机器人交易市场 (ccxt 统一符号): 登记次数 }
+    _lock = threading.Lock()
+
+    @classmethod
+    def start(cls, source, symbols, mode=None):
+        """启动 (或按新参数重启) 行情推送"""
+        mode = mode or getattr(Config, 'MARKET_FEED', 'rest')
+        cls.stop()
+
+        if mode == 'replay':
+            adapter = ReplayAdapter(source, cls.publish, getattr(Config, 'REPLAY_FILE', 'feed_replay.jsonl'),
+                                    speed=getattr(Config, 'REPLAY_SPEED', 1.0))
+        elif mode == 'stream':
+            adapter = StreamingAdapter(source, cls.publish)
+        else:
+            adapter = RestPollingAdapter(source, cls.publish,
+                                         interval=getattr(Config, 'FEED_POLL_INTERVAL', 2))
+        cls._adapter = adapter
+        with cls._lock:
+            cls._latest = {}
+
+        # 录制在线行情供之后离线回放 (回放模式本身不录制)
+        record_file = getattr(Config, 'FEED_RECORD_FILE', None)
+        if record_file and mode != 'replay':
+            cls._recorder = FeedRecorder(record_file)
+            cls.subscribe(cls._recorder)
+            add_log(f"[Feed] 行情事件录制到: {record_file}")
+
+        adapter.start(symbols)
+        add_log(f"[Feed] 行情推送已启动: {adapter.name} ({source})")
+
+    @classmethod
+    def stop(cls):
+        if cls._adapter:
+            cls._adapter.stop()
+            cls._adapter = None
+        if cls._recorder:
+            cls.unsubscribe(cls._recorder)
+            cls._recorder = None
+
+    @classmethod
+    def offline(cls):
+        """当前是否为离线回放 (不应访问交易所)"""
+        return isinstance(cls._adapter, ReplayAdapter)
+
+    @classmethod
+    def subscribe(cls, callback):
+        with cls._lock:
+            if callback not in cls._listeners:
+                cls._listeners = cls._listeners + [callback]
+
+    @classmethod
+    def unsubscribe(cls, callback):
+        with cls._lock:
+            cls._listeners = [cb for cb in cls._listeners if cb is not callback]
+
+    @classmethod
+    def track_market(cls, market):
+        """登记需要单独报价的交易市场 (机器人订阅共享行情时调用，按引用计数)"""
+        with cls._lock:
+            cls._markets[market] = cls._markets.get(market, 0) + 1
+
+    @classmethod
+    def untrack_market(cls, market):
+        with cls._lock:
+            count = cls._markets.get(market, 0) - 1
+            if count > 0:
+                cls._markets[market] = count
+            else:
+                cls._markets.pop(market, None)
+
+    @classmethod
+    def tracked_markets(cls):
+        return list(cls._markets)
+
+    @classmethod
+    def is_tracked(cls, market):
+        return market in cls._markets
+
+    @classmethod
+    def latest_ticker(cls, symbol, max_age=None):
+        """最近一次 ticker 事件；超过 max_age 秒视为过期返回 None"""
+        event = cls._latest.get(symbol)
+        if event is None: return None
+        if max_age is not None and time.time() - event['received_at'] > max_age:
+            return None
+        return event
+
+    @classmethod
+    def publish(cls, event):
+        """适配器回调入口"""
+        etype = event.get('type')
+        symbol = event.get('symbol')
+
+        if etype == 'ticker':
+            event['received_at'] = time.time()
+            with cls._lock:
+                cls._latest[symbol] = event
+            # 价格即时发布到行情总线 (仅更新监控线程已建立的品种)
+            fields = {"price": event['price']}
+            if 'latency' in event:
+                fields["latency"] = event['latency']
+            MarketBus.publish(symbol, fields, create=False)
+
+        elif etype == 'candle':
+            from app.services.candle_store import CandleStore
+            CandleStore.apply_candle(event.get('source'), to_query_symbol(event.get('source'), symbol),
+                                     event['tf'], event['ohlcv'], create=cls.offline())
+
+        for callback in cls._listeners:
+            try:
+                callback(event)
+            except Exception as e:
+                print(f"[Feed] 订阅者回调异常: {e}")
@@ -1,18 +1,27 @@
 # app/services/monitor.py
 import threading
 import time
-import psutil
 import json
 import os
-import ccxt
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FutureTimeout
 from app.utils.notifier import send_message
-from app.utils.indicators import calculate_rsi, calculate_smi
+from app.utils.indicator_cache import IndicatorCache
+from app.utils.metrics import Metrics
+from app.services.candle_store import CandleStore
+from app.services.exchange_registry import ExchangeRegistry
+from app.services.market_bus import MarketBus
+from app.services.system_sampler import SystemSampler
 from config import Config  # 【新增】引入配置
 
+# === 并发拉取参数 ===
+MONITOR_WORKERS = getattr(Config, 'MONITOR_WORKERS', 8)        # 并发线程上限
+MONITOR_ROUND_TIMEOUT = 30                                     # 单轮最长等待 (秒)
+FEED_STALE_SECONDS = getattr(Config, 'FEED_STALE_SECONDS', 10) # 推送价格过期阈值 (过期则回退 REST)
+
 # === 全局共享数据 ===
 class SharedState:
-    market_data = {}  # { 'BTC/USDT': {...} }
+    # 行情状态 (价格 / 指标) 统一由 MarketBus 发布与读取: MarketBus.snapshot() / MarketBus.get(symbol)
     system_logs = deque(maxlen=200) 
     target_source = getattr(Config, 'MARKET_SOURCE', 'binance') # 【新增】目标数据源 (用于热切换) 
     
@@ -21,6 +30,9 @@ class SharedState:
     watch_settings = {"BTC/USDT": "1h"}
     last_alert_time = 0
 
+    # 指标结果缓存 (LRU)，key: (source, symbol, tf)
+    indicator_cache = IndicatorCache()
+
 def add_log(msg):
     ts = time.strftime("%H:%M:%S")
     log_entry = f"[{ts}] {msg}"
@@ -29,46 +41,248 @@ def add_log(msg):
     SharedState.system_logs.appendleft(log_entry)
     print(log_entry)
 
-def get_public_exchange():
-    """【新增】根据配置获取交易所实例 (工厂模式)"""
+def source_exchange(source_name):
+    """行情源名称 -> (exchange_id, market_type)"""
+    if source_name == 'coinbase':
+        return 'coinbase', None
+    if source_name == 'okx':
+        # OKX 特殊处理：默认看 Swap
+        return 'okx', 'swap'
+    return 'binance', None # 默认 binance
+
+def _ensure_markets(exchange):
+    try:
+        ExchangeRegistry.ensure_markets(exchange)
+    except Exception as e:
+        # 元数据加载失败不阻塞，ccxt 会在首次请求时自行重试
+        print(f"[System] 市场元数据加载失败: {e}")
+    return exchange
+
+def get_public_exchange(verbose=True, load_markets=True):
+    """【新增】根据配置获取交易所实例 (注册表复用长连接客户端与市场元数据)；离线回放时不加载元数据"""
     source = getattr(Config, 'MARKET_SOURCE', 'binance')
-    
-    common_params = {
-        'enableRateLimit': True, 
-        'timeout': 30000
-    }
 
-    if source == 'coinbase':
-        print(f">>> [System] 公共行情源: Coinbase (现货/机构)")
-        return ccxt.coinbase(common_params)
+    if verbose:
+        if source == 'coinbase':
+            print(f">>> [System] 公共行情源: Coinbase (现货/机构)")
+        elif source == 'okx':
+            print(f">>> [System] 公共行情源: OKX (合约)")
+        else:
+            print(f">>> [System] 公共行情源: Binance")
+    exchange = ExchangeRegistry.get(*source_exchange(source))
+
+    if not load_markets:
+        return exchange
+    return _ensure_markets(exchange)
+
+# 监控工作线程各自持有的公共客户端 { source_name: ccxt 实例 }
+_worker_local = threading.local()
+
+def get_worker_exchange(source_name):
+    """
+    当前工作线程专属的公共客户端: ccxt 同步客户端不是线程安全的，监控线程池的各工作线程不共用实例
+    市场元数据由注册表共享注入 (不重复下载，TTL 到期随共享副本刷新)；限频仍为同一交易所的令牌桶
+    """
+    clients = getattr(_worker_local, 'clients', None)
+    if clients is None:
+        clients = _worker_local.clients = {}
+    exchange = clients.get(source_name)
+    if exchange is None:
+        exchange = clients[source_name] = ExchangeRegistry.create(*source_exchange(source_name))
+    return _ensure_markets(exchange)
+
+def to_query_symbol(source_name, display_symbol):
+    """【新增】智能符号适配 (Smart Adapter): 前端显示符号 -> 行情源查询符号"""
+    # 如果是 Coinbase，它主力是 USD，这里做隐式映射
+    # 前端看 BTC/USDT -> 后台查 BTC/USD
+    if source_name == 'coinbase' and 'USDT' in display_symbol:
+        return display_symbol.replace('USDT', 'USD')
+    return display_symbol
+
+def resolve_market_symbol(exchange, source_name, display_symbol):
+    """
+    前端显示符号在行情源上实际对应的市场 (ccxt 统一符号)
+    如 BTC/USDT 解析为现货 BTC/USDT，而合约机器人交易的是永续 BTC/USDT:USDT；元数据未加载时返回查询符号
+    """
+    query_symbol = to_query_symbol(source_name, display_symbol)
+    try:
+        return exchange.market(query_symbol)['symbol']
+    except Exception:
+        return query_symbol
+
+def fetch_bulk_prices(exchange, source_name, display_symbols):
+    """
+    批量获取价格: 行情源支持 fetchTickers 时一次请求拿到整个监控列表
+    返回 { display_symbol: (price, latency_ms) }；缺失的品种由调用方逐个回退
+    请求速率由公共客户端上的 RateLimiter 令牌桶统一控制 (与图表接口 / 机器人共用同一交易所额度)
+    """
+    if len(display_symbols) < 2 or not exchange.has.get('fetchTickers'):
+        return {}
+
+    query_map = {to_query_symbol(source_name, s): s for s in display_symbols}
+    try:
+        t1 = time.time()
+        tickers = exchange.fetch_tickers(list(query_map.keys()))
+        latency = int((time.time() - t1) * 1000) # ms
+    except Exception as e:
+        # 偶尔报错不打印，防止刷屏 (本轮全部回退为逐个请求)
+        return {}
+
+    prices = {}
+    for query_symbol, ticker in tickers.items():
+        display_symbol = query_map.get(query_symbol)
+        if display_symbol and ticker.get('last') is not None:
+            prices[display_symbol] = (float(ticker['last']), latency)
+    return prices
+
+def poll_symbol(source_name, display_symbol, bulk_price=None):
+    """
+    拉取单个品种的 K 线 (及必要时的价格)，在工作线程中执行 (使用该工作线程自己的客户端)
+    返回 (display_symbol, tf, price, latency, ohlcv)；失败返回 None，指标由主循环在任务完成后计算发布
+    """
+    from app.services.bot_manager import BotManager
+    from app.services.market_feed import MarketFeed
+
+    query_symbol = to_query_symbol(source_name, display_symbol)
+    # 离线回放: 价格与 K 线只来自回放事件，不访问交易所
+    offline = MarketFeed.offline()
+    exchange = None if offline else get_worker_exchange(source_name)
     
-    elif source == 'okx':
-        print(f">>> [System] 公共行情源: OKX (合约)")
-        # OKX 特殊处理：默认看 Swap
-        params = common_params.copy()
-        params['options'] = {'defaultType': 'swap'}
-        return ccxt.okx(params)
+    # 1. 获取价格 & 计算延迟 (批量结果缺失时回退为单独请求)
+    if bulk_price:
+        current_price, latency = bulk_price
+    elif offline:
+        return None
+    else:
+        try:
+            t1 = time.time()
+            ticker = exchange.fetch_ticker(query_symbol)
+            t2 = time.time()
+            current_price = float(ticker['last'])
+            latency = int((t2 - t1) * 1000) # ms
+        except Exception as e:
+            # 偶尔报错不打印，防止刷屏
+            return None
     
-    else: # 默认 binance
-        print(f">>> [System] 公共行情源: Binance")
-        return ccxt.binance(common_params)
+    # 2. 获取 K 线
+    tf = SharedState.watch_settings.get(display_symbol, '1h')
+    try:
+        # 本地 K 线仓库: 首次整段加载，之后仅 since= 增量补齐
+        if offline:
+            ohlcv = CandleStore.read(source_name, query_symbol, tf, limit=500)
+        else:
+            ohlcv = CandleStore.get_ohlcv(exchange, source_name, query_symbol, tf, limit=500)
+    except:
+        return None
+    
+    # 3. 驱动机器人 (只驱动合约机器人)
+    bot = BotManager.get_bot()
+    if bot and bot.running:
+        # 注意：机器人自己有 fetch_market_data，这里仅作为 fallback 或触发器
+        # 实际交易中，机器人使用自己的行情源，这里不需要频繁驱动
+        pass 
+
+    return display_symbol, tf, current_price, latency, ohlcv
+
+def _publish_entry(source_name, polled, result):
+    display_symbol, tf, current_price, latency, _ = polled
+    rsi, smi, sig = result
+    # 更新共享状态 (注意：Key 依然用 display_symbol，保持前端一致)
+    entry = {
+        "price": current_price,
+        "tf": tf,
+        "rsi": round(rsi, 2) if rsi else 0,
+        "smi": round(smi, 5) if smi else 0,
+        "sig": round(sig, 5) if sig else 0,
+        "source": source_name, # 标记来源
+        "latency": latency # 【新增】延迟
+    }
+    # 发布到行情总线 (与已有字段合并，订阅者即时收到更新)
+    MarketBus.publish(display_symbol, entry)
+
+def publish_indicators(source_name, polled):
+    """
+    单个品种拉取完成后立即计算并发布 (不等待同轮其它品种)
+    指标缓存中已有该序列的流式状态，已收盘前缀未变时 O(1) 折算最新 K 线
+    """
+    display_symbol, tf, _, _, ohlcv = polled
+    try:
+        with Metrics.timer('indicator_compute_seconds', source=source_name, symbol=display_symbol, tf=tf):
+            result = SharedState.indicator_cache.compute(source_name, display_symbol, tf, ohlcv)
+    except Exception as e:
+        print(f"[Monitor] 指标计算失败 ({display_symbol}): {e}")
+        return
+    _publish_entry(source_name, polled, result)
+
+def publish_indicator_batch(source_name, polled):
+    """
+    冷启动品种 (指标缓存中尚无状态) 整批计算并发布
+    交给 IndicatorCache.compute_many: 需整段播种的品种较多时由批量引擎一次算完
+    """
+    if not polled: return
+    try:
+        # 整批一次计时 (批量播种无法拆分到单个品种，不计入按品种的 indicator_compute_seconds)
+        with Metrics.timer('indicator_batch_seconds', source=source_name):
+            results = SharedState.indicator_cache.compute_many(
+                source_name, [(display_symbol, tf, ohlcv) for display_symbol, tf, _, _, ohlcv in polled])
+    except Exception as e:
+        print(f"[Monitor] 指标计算失败: {e}")
+        return
+
+    for item in polled:
+        _publish_entry(source_name, item, results[(item[0], item[1])])
+
+def collect_round(source_name, futures, timeout=MONITOR_ROUND_TIMEOUT):
+    """
+    按完成顺序处理本轮拉取任务 futures = {future: display_symbol}
+    - 已有指标状态的品种完成即发布，慢品种不拖累其它品种
+    - 冷启动品种攒到本轮冷启动任务全部返回 (或超时) 后整批播种
+    返回超时仍未完成的 {display_symbol: future}，由调用方带入下一轮继续等待
+    """
+    cache = SharedState.indicator_cache
+    cold = {f for f, sym in futures.items()
+            if not cache.is_warm(source_name, sym, SharedState.watch_settings.get(sym, '1h'))}
+    cold_ready = []
+    pending = dict(futures)
+    try:
+        for f in as_completed(futures, timeout=timeout):
+            pending.pop(f)
+            polled = f.result() if f.exception() is None else None
+            if f in cold:
+                cold.discard(f)
+                if polled: cold_ready.append(polled)
+                if not cold:
+                    publish_indicator_batch(source_name, cold_ready)
+                    cold_ready = []
+            elif polled:
+                publish_indicators(source_name, polled)
+    except FutureTimeout:
+        # 超时的冷启动品种不再等待，已返回的先整批发布
+        publish_indicator_batch(source_name, cold_ready)
+    return {sym: f for f, sym in pending.items()}
 
 def market_monitor_thread():
-    from app.services.bot_manager import BotManager
-    
-    # 1. 初始化交易所
-    exchange = get_public_exchange()
+    from app.services.market_feed import MarketFeed
+
+    # 1. 初始化交易所 (回放模式不访问交易所)
+    offline = getattr(Config, 'MARKET_FEED', 'rest') == 'replay'
+    # (共享客户端加载的市场元数据随后注入各工作线程的客户端)
+    get_public_exchange(load_markets=not offline)
     symbols = list(SharedState.watch_settings.keys())
+
+    # 并发拉取线程池: 每个工作线程一个公共客户端 (见 get_worker_exchange)，
+    # 请求速率由各客户端上的 RateLimiter 按交易所统一限制
+    pool = ThreadPoolExecutor(max_workers=MONITOR_WORKERS, thread_name_prefix="monitor")
+    # 上一轮超时仍未返回的任务 {display_symbol: future}: 本轮继续等待，不重复提交，避免慢品种的任务逐轮堆积
+    in_flight = {}
     
     print(">>> [System] 智能监控服务已启动...")
     
     # 【新增】热切换检测
     current_source_name = Config.MARKET_SOURCE
 
-    # 初始化流量计算变量
-    last_sent_bytes = 0
-    last_recv_bytes = 0
-    last_net_time = time.time()
+    # 行情推送层 (rest / stream / replay)，价格由推送实时写入
+    MarketFeed.start(current_source_name, symbols)
 
     while True:
         try:
@@ -77,128 +291,39 @@ def market_monitor_thread():
                 add_log(f"[Monitor] 切换行情源: {current_source_name} -> {SharedState.target_source}")
                 # 动态修改 Config (虽然 Config 是单例，但这里修改内存值以欺骗 get_public_exchange)
                 Config.MARKET_SOURCE = SharedState.target_source
-                exchange = get_public_exchange()
+                get_public_exchange(load_markets=not offline)
                 current_source_name = SharedState.target_source
+                MarketFeed.start(current_source_name, symbols)
+                # 旧数据源的在途任务: 未开始的取消，已开始的结果丢弃
+                for future in in_flight.values():
+                    future.cancel()
+                in_flight = {}
 
+            # 价格来自推送层 (rest 模式下为一次 fetch_tickers 批量轮询)，过期的品种由工作线程回退单独请求
+            bulk_prices = {}
             for display_symbol in symbols:
-                # 【新增】智能符号适配 (Smart Adapter)
-                query_symbol = display_symbol
-                
-                # 如果是 Coinbase，它主力是 USD，这里做隐式映射
-                # 前端看 BTC/USDT -> 后台查 BTC/USD
-                if current_source_name == 'coinbase' and 'USDT' in display_symbol:
-                    query_symbol = display_symbol.replace('USDT', 'USD')
-                
-                # 1. 获取价格 & 计算延迟
-                latency = 0
-                try:
-                    t1 = time.time()
-                    ticker = exchange.fetch_ticker(query_symbol)
-                    t2 = time.time()
-                    current_price = float(ticker['last'])
-                    latency = int((t2 - t1) * 1000) # ms
-                except Exception as e:
-                    # 偶尔报错不打印，防止刷屏
-                    continue
-                
-                # 2. 计算指标
-                tf = SharedState.watch_settings.get(display_symbol, '1h')
-                try:
-                    ohlcv = exchange.fetch_ohlcv(query_symbol, tf, limit=500)
-                    closes = [x[4] for x in ohlcv]
-                    
-                    rsi = calculate_rsi(closes)
-                    smi, sig = calculate_smi(closes)
-                    
-                    # 3. 更新共享状态 (注意：Key 依然用 display_symbol，保持前端一致)
-                    SharedState.market_data[display_symbol] = {
-                        "price": current_price,
-                        "tf": tf,
-                        "rsi": round(rsi, 2) if rsi else 0,
-                        "smi": round(smi, 5) if smi else 0,
-                        "sig": round(sig, 5) if sig else 0,
-                        "source": current_source_name, # 标记来源
-                        "latency": latency # 【新增】延迟
-                    }
-                except:
-                    continue
-                
-                # 4. 驱动机器人 (只驱动合约机器人)
-                bot = BotManager.get_bot()
-                if bot and bot.running:
-                    # 注意：机器人自己有 fetch_market_data，这里仅作为 fallback 或触发器
-                    # 实际交易中，机器人使用自己的行情源，这里不需要频繁驱动
-                    pass 
-
-            # === A. 获取系统状态 (System Stats) ===
-            try:
-                # 1. 基础硬件
-                cpu = psutil.cpu_percent()
-                mem = psutil.virtual_memory().percent
-                disk = psutil.disk_usage('/').percent
-                
-                # 2. 网络流量 (实时与总量)
-                net = psutil.net_io_counters()
-                curr_sent = net.bytes_sent
-                curr_recv = net.bytes_recv
-                
-                # 实时网速 (需依赖 last_sent_bytes 变量，确保循环外已初始化)
-                curr_time = time.time()
-                time_delta = curr_time - last_net_time
-                
-                if time_delta > 0.1:
-                    up_speed_kb = (curr_sent - last_sent_bytes) / time_delta / 1024
-                    down_speed_kb = (curr_recv - last_recv_bytes) / time_delta / 1024
-                    sys_up = f"{int(up_speed_kb)}"
-                    sys_down = f"{int(down_speed_kb)}"
-                else:
-                    sys_up = "0"
-                    sys_down = "0"
-                
-                last_sent_bytes = curr_sent
-                last_recv_bytes = curr_recv
-                last_net_time = curr_time
-                
-                # 总量 (GB)
-                sent_gb = round(curr_sent / (1024**3), 2)
-                recv_gb = round(curr_recv / (1024**3), 2)
-                
-                # 3. 时间与平均值 (Split Calculation)
-                uptime_sec = time.time() - psutil.boot_time()
-                uptime_days = uptime_sec / 86400
-                
-                # 格式化运行时间 (e.g. "5d 12h")
-                days = int(uptime_days)
-                hours = int((uptime_sec % 86400) / 3600)
-                uptime_str = f"{days}d {hours}h"
-                
-                # 计算日均 (GB/Day)
-                if uptime_days > 0.01:
-                    daily_sent = round(sent_gb / uptime_days, 2)
-                    daily_recv = round(recv_gb / uptime_days, 2)
-                else:
-                    daily_sent = 0
-                    daily_recv = 0
-                
-                # [挂载数据]
-                if "BTC/USDT" in SharedState.market_data:
-                    # 注意: sys_up/sys_down (实时速度) 的计算逻辑需保留在上方
-                    SharedState.market_data["BTC/USDT"].update({
-                        "sys_cpu": cpu,
-                        "sys_mem": mem,
-                        "sys_disk": disk,
-                        "sys_up": sys_up,
-                        "sys_down": sys_down,
-                        "sys_uptime": uptime_str,
-                        
-                        # 新的分离统计数据
-                        "sys_total_up": f"{sent_gb} G",
-                        "sys_daily_up": f"{daily_sent} G/d",
-                        "sys_total_down": f"{recv_gb} G",
-                        "sys_daily_down": f"{daily_recv} G/d"
-                    })
-            except Exception as e:
-                print(f"[SysMonitor Error] {e}")
+                ticker = MarketFeed.latest_ticker(display_symbol, max_age=FEED_STALE_SECONDS)
+                if ticker:
+                    bulk_prices[display_symbol] = (ticker['price'], ticker.get('latency', 0))
+
+            # 并发拉取: 每个品种一个任务 (上一轮仍在途的品种沿用原任务)，按完成顺序逐个发布
+            futures = {}
+            for display_symbol in symbols:
+                future = in_flight.get(display_symbol) or pool.submit(
+                    poll_symbol, current_source_name, display_symbol, bulk_prices.get(display_symbol))
+                futures[future] = display_symbol
+            in_flight = collect_round(current_source_name, futures)
+
+            # 清理已移出监控列表 / 已切换周期或数据源的指标缓存
+            SharedState.indicator_cache.retain(
+                (current_source_name, sym, SharedState.watch_settings.get(sym, '1h'))
+                for sym in symbols
+            )
+            # 长时间未被读取的 K 线序列 (如图表临时查看过的品种) 移出内存
+            CandleStore.evict_idle()
+
+            # === A. 系统状态 (System Stats) ===
+            # 已移至独立采样线程 (SystemSampler)，由 /api/market_status 在读取时挂载
 
             # === B. 哨兵报警逻辑 (Sentinel Alert) ===
             try:
@@ -228,7 +353,7 @@ def market_monitor_thread():
                         print(f"[Sentinel Error] 重置标记失败: {e}")
                 
                 # 2. 检查 SMI 触发
-                btc_data = SharedState.market_data.get("BTC/USDT", {})
+                btc_data = MarketBus.get("BTC/USDT", {})
                 current_smi = btc_data.get("smi")
                 
                 if current_smi is not None:
@@ -252,7 +377,8 @@ def market_monitor_thread():
                     
                     if is_triggered and (time.time() - SharedState.last_alert_time > interval):
                         # 发送消息
-                        full_msg = f"{msg_type}\n当前价格: {btc_data.get('price')}\nCPU: {cpu}% MEM: {mem}%"
+                        sys_stats = SystemSampler.latest()
+                        full_msg = f"{msg_type}\n当前价格: {btc_data.get('price')}\nCPU: {sys_stats.get('sys_cpu')}% MEM: {sys_stats.get('sys_mem')}%"
                         send_message(ap_config, full_msg)
                         SharedState.last_alert_time = time.time()
             except Exception as e:
@@ -267,5 +393,7 @@ def market_monitor_thread():
             time.sleep(5)
 
 def start_market_monitor():
+    # 系统资源采样 (独立线程，与行情循环互不阻塞)
+    SystemSampler.start(getattr(Config, 'SYS_SAMPLE_INTERVAL', 2))
     t = threading.Thread(target=market_monitor_thread, daemon=True)
     t.start()
\ No newline at end of file
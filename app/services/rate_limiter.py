@@ -0,0 +1,187 @@
+# app/services/rate_limiter.py
+# ---------------------------------------
+# 进程级交易所限频调度器
+# - 每个交易所一个令牌桶 (同一 IP 的监控 / 机器人 / 接口请求共用同一额度)
+# - 按 ccxt 的接口权重 (cost) 扣减令牌，速率取自 ccxt 的 rateLimit
+# - 优先级: 下单/撤单 > 账户查询 > 行情轮询 > 图表请求
+#   低优先级请求不能把桶耗到预留线以下，且有高优先级请求排队时必须让行
+# ---------------------------------------
+import asyncio
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+from config import Config
+
+
+class _Bucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate                # 令牌/秒
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.cond = threading.Condition()
+        self.waiting = [0] * len(RateLimiter.RESERVE)
+        self.waited = [0.0] * len(RateLimiter.RESERVE)   # 各优先级累计等待 (秒)
+        self.granted = [0] * len(RateLimiter.RESERVE)
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, cost, priority):
+        """非阻塞尝试: 成功扣减返回 0，否则返回建议等待秒数 (供协程 await asyncio.sleep)"""
+        with self.cond:
+            self._refill()
+            need = min(cost + self.capacity * RateLimiter.RESERVE[priority], self.capacity)
+            if not any(self.waiting[:priority]) and self.tokens >= need:
+                self.tokens -= cost
+                self.granted[priority] += 1
+                return 0
+            return max((need - self.tokens) / self.rate, 0.005)
+
+    async def acquire_async(self, cost, priority):
+        t0 = time.monotonic()
+        wait = self.try_acquire(cost, priority)
+        if not wait: return
+        with self.cond:
+            self.waiting[priority] += 1
+        try:
+            while wait:
+                await asyncio.sleep(wait)
+                wait = self.try_acquire(cost, priority)
+        finally:
+            with self.cond:
+                self.waiting[priority] -= 1
+                self.waited[priority] += time.monotonic() - t0
+                self.cond.notify_all()
+
+    def acquire(self, cost, priority):
+        t0 = time.monotonic()
+        with self.cond:
+            self.waiting[priority] += 1
+            try:
+                while True:
+                    self._refill()
+                    # 该优先级需要保留给更高优先级的余量
+                    need = min(cost + self.capacity * RateLimiter.RESERVE[priority], self.capacity)
+                    if not any(self.waiting[:priority]) and self.tokens >= need:
+                        self.tokens -= cost
+                        break
+                    self.cond.wait(max((need - self.tokens) / self.rate, 0.005))
+            finally:
+                self.waiting[priority] -= 1
+                self.cond.notify_all()
+            self.granted[priority] += 1
+            self.waited[priority] += time.monotonic() - t0
+
+
+class RateLimiter:
+    # 优先级 (数值越小越优先)
+    ORDER, ACCOUNT, MARKET, CHART = 0, 1, 2, 3
+    NAMES = ('order', 'account', 'market', 'chart')
+    # 各优先级不可动用的桶容量比例 (为更高优先级预留)
+    RESERVE = (0.0, 0.1, 0.3, 0.5)
+    BURST_SECONDS = getattr(Config, 'RATE_LIMIT_BURST_SECONDS', 1.0)   # 桶容量 = 速率 * 该秒数
+
+    # 按方法名自动归类的优先级 (未列出的方法沿用当前上下文，默认 MARKET)
+    METHOD_PRIORITY = {
+        'create_order': ORDER, 'create_orders': ORDER, 'edit_order': ORDER,
+        'cancel_order': ORDER, 'cancel_orders': ORDER, 'cancel_all_orders': ORDER,
+        'fetch_balance': ACCOUNT, 'fetch_positions': ACCOUNT, 'fetch_order': ACCOUNT,
+        'fetch_open_orders': ACCOUNT, 'fetch_my_trades': ACCOUNT, 'fetch_funding_rate': ACCOUNT,
+        'set_leverage': ACCOUNT, 'set_margin_mode': ACCOUNT, 'set_position_mode': ACCOUNT,
+    }
+
+    _buckets = {}
+    _lock = threading.Lock()
+    # 当前优先级 (ContextVar: 线程之间、协程任务之间互不影响)
+    _priority = contextvars.ContextVar('rate_limit_priority', default=None)
+
+    @classmethod
+    def current_priority(cls):
+        level = cls._priority.get()
+        return cls.MARKET if level is None else level
+
+    @classmethod
+    @contextmanager
+    def priority(cls, level):
+        """在上下文内以指定优先级发起请求 (嵌套时取更高的优先级)"""
+        previous = cls._priority.get()
+        token = cls._priority.set(level if previous is None else min(previous, level))
+        try:
+            yield
+        finally:
+            cls._priority.reset(token)
+
+    @classmethod
+    def bucket(cls, exchange_id, rate_limit_ms):
+        with cls._lock:
+            bucket = cls._buckets.get(exchange_id)
+            if bucket is None:
+                # 同一交易所的多个客户端取最保守的速率
+                rate = 1000.0 / max(rate_limit_ms or 50, 1)
+                bucket = cls._buckets[exchange_id] = _Bucket(rate, max(rate * cls.BURST_SECONDS, 1.0))
+            elif rate_limit_ms:
+                bucket.rate = min(bucket.rate, 1000.0 / max(rate_limit_ms, 1))
+            return bucket
+
+    @classmethod
+    def acquire(cls, exchange_id, cost=1, priority=None, rate_limit_ms=None):
+        level = cls.current_priority() if priority is None else priority
+        cls.bucket(exchange_id, rate_limit_ms).acquire(1 if cost is None else cost, level)
+
+    @classmethod
+    async def acquire_async(cls, exchange_id, cost=1, priority=None, rate_limit_ms=None):
+        level = cls.current_priority() if priority is None else priority
+        await cls.bucket(exchange_id, rate_limit_ms).acquire_async(1 if cost is None else cost, level)
+
+    @classmethod
+    def install(cls, client):
+        """
+        接管 ccxt 客户端的限频: 替换实例的 throttle 钩子 (fetch2 在每次 REST 请求前调用)，
+        并按方法名为交易 / 账户接口自动提升优先级 (同步 / 异步客户端均适用)
+        """
+        exchange_id = client.id
+        cls.bucket(exchange_id, client.rateLimit)
+        if asyncio.iscoroutinefunction(client.throttle):
+            async def throttle(cost=None):
+                await cls.acquire_async(exchange_id, cost)
+            client.throttle = throttle
+        else:
+            client.throttle = lambda cost=None: cls.acquire(exchange_id, cost)
+
+        for name, level in cls.METHOD_PRIORITY.items():
+            method = getattr(client, name, None)
+            if method is None: continue
+            setattr(client, name, cls._wrap(method, level))
+        return client
+
+    @classmethod
+    def _wrap(cls, method, level):
+        if asyncio.iscoroutinefunction(method):
+            async def wrapped(*args, **kwargs):
+                with cls.priority(level):
+                    return await method(*args, **kwargs)
+        else:
+            def wrapped(*args, **kwargs):
+                with cls.priority(level):
+                    return method(*args, **kwargs)
+        wrapped.__name__ = method.__name__
+        return wrapped
+
+    @classmethod
+    def stats(cls):
+        result = {}
+        for exchange_id, b in list(cls._buckets.items()):
+            result[exchange_id] = {
+                "rate": round(b.rate, 2),
+                "tokens": round(b.tokens, 2),
+                "waiting": dict(zip(cls.NAMES, b.waiting)),
+                "granted": dict(zip(cls.NAMES, b.granted)),
+                "avg_wait_ms": {n: round(w / g * 1000, 1) if g else 0
+                                for n, w, g in zip(cls.NAMES, b.waited, b.granted)}
+            }
+        return result
@@ -0,0 +1,113 @@
+# app/services/system_sampler.py
+# ---------------------------------------
+# 系统资源采样器: 独立线程按固定节奏采样 CPU / 内存 / 磁盘 / 网络
+# 与行情循环完全解耦 (交易所请求卡住不影响采样，反之亦然)
+# ---------------------------------------
+import threading
+import time
+from collections import deque
+
+import psutil
+
+
+class SystemSampler:
+    INTERVAL = 2          # 采样周期 (秒)
+    HISTORY = 300         # 环形缓冲长度 (默认约 10 分钟)
+
+    # 环形缓冲区: 每个指标一条定长序列
+    history = {
+        "ts": deque(maxlen=HISTORY),
+        "cpu": deque(maxlen=HISTORY),
+        "mem": deque(maxlen=HISTORY),
+        "disk": deque(maxlen=HISTORY),
+        "up_kb": deque(maxlen=HISTORY),
+        "down_kb": deque(maxlen=HISTORY),
+    }
+    _latest = {}          # 最近一次采样 (前端 sys_* 字段格式)
+    _lock = threading.Lock()
+    _thread = None
+
+    @classmethod
+    def start(cls, interval=None):
+        if cls._thread and cls._thread.is_alive():
+            return
+        if interval:
+            cls.INTERVAL = interval
+        cls._thread = threading.Thread(target=cls._run, daemon=True, name="sys-sampler")
+        cls._thread.start()
+
+    @classmethod
+    def latest(cls):
+        """最近一次采样结果 (sys_cpu / sys_mem / ... 字段)"""
+        return cls._latest
+
+    @classmethod
+    def snapshot(cls):
+        """全部历史缓冲的副本 (供接口返回)"""
+        with cls._lock:
+            return {k: list(v) for k, v in cls.history.items()}
+
+    @classmethod
+    def _run(cls):
+        boot_time = psutil.boot_time()
+        psutil.cpu_percent()  # 首次调用仅建立基准
+        net = psutil.net_io_counters()
+        last_sent, last_recv = net.bytes_sent, net.bytes_recv
+        last_t = time.monotonic()
+
+        while True:
+            time.sleep(cls.INTERVAL)
+            try:
+                # 1. 基础硬件
+                cpu = psutil.cpu_percent()
+                mem = psutil.virtual_memory().percent
+                disk = psutil.disk_usage('/').percent
+
+                # 2. 网络流量: 速度只取决于采样器自身的时间间隔
+                net = psutil.net_io_counters()
+                now = time.monotonic()
+                dt = now - last_t
+                up_kb = (net.bytes_sent - last_sent) / dt / 1024 if dt > 0 else 0
+                down_kb = (net.bytes_recv - last_recv) / dt / 1024 if dt > 0 else 0
+                last_sent, last_recv, last_t = net.bytes_sent, net.bytes_recv, now
+
+                # 总量 (GB)
+                sent_gb = round(net.bytes_sent / (1024**3), 2)
+                recv_gb = round(net.bytes_recv / (1024**3), 2)
+
+                # 3. 运行时间与日均
+                uptime_sec = time.time() - boot_time
+                uptime_days = uptime_sec / 86400
+                days = int(uptime_days)
+                hours = int((uptime_sec % 86400) / 3600)
+
+                if uptime_days > 0.01:
+                    daily_sent = round(sent_gb / uptime_days, 2)
+                    daily_recv = round(recv_gb / uptime_days, 2)
+                else:
+                    daily_sent = 0
+                    daily_recv = 0
+
+                with cls._lock:
+                    cls.history["ts"].append(int(time.time()))
+                    cls.history["cpu"].append(cpu)
+                    cls.history["mem"].append(mem)
+                    cls.history["disk"].append(disk)
+                    cls.history["up_kb"].append(int(up_kb))
+                    cls.history["down_kb"].append(int(down_kb))
+
+                # 整体替换，读端不会看到半更新的字典
+                cls._latest = {
+                    "sys_cpu": cpu,
+                    "sys_mem": mem,
+                    "sys_disk": disk,
+                    "sys_up": f"{int(up_kb)}",
+                    "sys_down": f"{int(down_kb)}",
+                    "sys_uptime": f"{days}d {hours}h",
+                    "sys_total_up": f"{sent_gb} G",
+                    "sys_daily_up": f"{daily_sent} G/d",
+                    "sys_total_down": f"{recv_gb} G",
+                    "sys_daily_down": f"{daily_recv} G/d"
+                }
+            except Exception as e:
+                print(f"[SysMonitor Error] {e}")
@@ -1,16 +1,35 @@
 # app/strategies/future_grid_modules/calculation.py
 import math
+from bisect import bisect_right
 
 class FutureGridCalcMixin:
     def calculate_grid_index(self, price):
+        """价格所在格子: 满足 grids[i] <= price 的最大 i (低于下沿时为 0)，O(1)"""
         if price == 0: return -1
-        grid_idx = -1
-        for i, p in enumerate(self.grids):
-            if price >= p: grid_idx = i
-            else: break
-        
-        if grid_idx < 0: grid_idx = 0 
-        if grid_idx >= len(self.grids): grid_idx = len(self.grids) - 1 
+        grids = self.grids
+        n = len(grids)
+        if n == 0: return 0
+
+        step = self.grid_step
+        if step > 0:
+            # 等差网格直接算出索引，再按取整后的网格价修正边界
+            grid_idx = int((price - self.grid_lower) // step)
+            if grid_idx < 0: grid_idx = 0
+            if grid_idx >= n: grid_idx = n - 1
+            while grid_idx + 1 < n and price >= grids[grid_idx + 1]: grid_idx += 1
+            while grid_idx > 0 and price < grids[grid_idx]: grid_idx -= 1
+            return grid_idx
+
+        # 无步长元数据 (非等差网格) 时二分查找
+        grid_idx = bisect_right(grids, price) - 1
+        return min(max(grid_idx, 0), n - 1)
+
+    def nearest_grid_index(self, price):
+        """距离价格最近的网格线 (距离相同时取下方)"""
+        grid_idx = self.calculate_grid_index(price)
+        if grid_idx < 0: return 0
+        if grid_idx + 1 < len(self.grids) and abs(self.grids[grid_idx + 1] - price) < abs(self.grids[grid_idx] - price):
+            grid_idx += 1
         return grid_idx
 
     def calculate_target_position(self, grid_idx):
@@ -1,7 +1,18 @@
 # app/strategies/future_grid_modules/data_sync.py
+import threading
 import time
 
+from config import Config
+
 class FutureGridSyncMixin:
+    # 账户数据各字段的缓存时长 (秒)
+    ACCOUNT_FIELDS = ('positions', 'balance', 'funding')
+    ACCOUNT_TTL = {
+        'positions': getattr(Config, 'ACCOUNT_POSITION_TTL', 2),
+        'balance': getattr(Config, 'ACCOUNT_BALANCE_TTL', 60),
+        'funding': getattr(Config, 'ACCOUNT_FUNDING_TTL', 600),
+    }
+
     def _get_position_amount(self, pos_info):
         try:
             if 'positionAmt' in pos_info: return float(pos_info['positionAmt'])
@@ -9,48 +20,90 @@ class FutureGridSyncMixin:
             return 0.0
         except: return 0.0
 
-    def sync_account_data(self):
+    def sync_account_data(self, force=False, fields=None):
+        """
+        同步账户数据 (持仓 / 余额 / 资金费率)，按字段缓存:
+        - 未到期的字段不发请求；资金费率在缓存时长与下次结算时间中较早者到期
+        - force=True 忽略缓存，但在本次调用之后才开始的同步结果可直接复用
+        - 多个线程同时同步时只由一个线程发请求，其余等待后复用结果；需刷新的字段并发请求
+        fields: 只同步指定字段 ('positions' / 'balance' / 'funding')，默认全部
+        """
         if not self.running or not self.exchange.apiKey: return
 
-        try:
-            positions = self.exchange.fetch_positions([self.market_symbol])
-            found_pos = False
-            
-            for pos in positions:
-                if pos['symbol'] == self.market_symbol:
-                    self.status_data['current_pos'] = self._get_position_amount(pos['info'])
-                    self.status_data['entry_price'] = float(pos.get('entryPrice') or 0)
-                    self.status_data['liquidation_price'] = float(pos.get('liquidationPrice') or 0)
-                    self.status_data['unrealized_pnl'] = float(pos.get('unrealizedPnl') or 0)
-                    found_pos = True
+        requested_at = time.time()
+        fields = fields or self.ACCOUNT_FIELDS
+        while True:
+            with self._account_lock:
+                started = time.time()
+                due = [f for f in fields
+                       if started >= self._account_expires_at[f]
+                       or (force and self._account_fetched_at[f] < requested_at)]
+                if not due: return
+                flight = self._account_flight
+                if flight is None:
+                    self._account_flight = flight = threading.Event()
                     break
-            
-            if not found_pos: 
-                self.status_data['current_pos'] = 0
-                self.status_data['entry_price'] = 0
-                self.status_data['liquidation_price'] = 0
-                self.status_data['unrealized_pnl'] = 0
+            # 已有同步在进行: 等其结束后重新判断是否还需要请求
+            flight.wait(timeout=30)
+
+        try:
+            self._refresh_account(due, started)
+        finally:
+            with self._account_lock:
+                self._account_flight = None
+            flight.set()
 
-            balance = self.exchange.fetch_balance()
-            quote_currency = self.config['symbol'].split('/')[1] 
-            if quote_currency in balance['total']:
-                self.status_data['wallet_balance'] = float(balance['total'].get(quote_currency, 0))
+    def _refresh_account(self, due, started):
+        calls = {
+            'positions': ('fetch_positions', ([self.market_symbol],), {}),
+            'balance': ('fetch_balance', (), {}),
+            'funding': ('fetch_funding_rate', (self.market_symbol,), {}),
+        }
+        results = self._gather_calls(*[calls[f] for f in due], account=True)
 
+        for field, result in zip(due, results):
             try:
-                funding_info = self.exchange.fetch_funding_rate(self.market_symbol)
-                raw_rate = float(funding_info.get('fundingRate', 0) or 0)
-                self.status_data['funding_rate'] = round(raw_rate * 100, 4)
-            except:
-                self.status_data['funding_rate'] = 0
-            
-            self.status_data['liquidation'] = self.status_data['liquidation_price']
+                if isinstance(result, Exception): raise result
+                expires_at = started + self.ACCOUNT_TTL[field]
+                if field == 'positions':
+                    self._apply_positions(result)
+                    self.last_sync_time = time.time()
+                elif field == 'balance':
+                    quote_currency = self.config['symbol'].split('/')[1]
+                    if quote_currency in result['total']:
+                        self.status_data['wallet_balance'] = float(result['total'].get(quote_currency, 0))
+                else:
+                    raw_rate = float(result.get('fundingRate', 0) or 0)
+                    self.status_data['funding_rate'] = round(raw_rate * 100, 4)
+                    # 费率只在结算时变化: 到下次结算时间点即过期
+                    next_funding = result.get('fundingTimestamp') or result.get('nextFundingTimestamp')
+                    if next_funding and next_funding / 1000 > started:
+                        expires_at = min(expires_at, next_funding / 1000 + 1)
+                with self._account_lock:
+                    self._account_fetched_at[field] = started
+                    self._account_expires_at[field] = expires_at
+            except Exception as e:
+                # 失败的字段不写入缓存，下次同步重试
+                if field == 'funding':
+                    self.status_data['funding_rate'] = 0
+                else:
+                    self.log(f"[数据同步失败] {e}")
 
+        self.status_data['liquidation'] = self.status_data['liquidation_price']
 
+    def _apply_positions(self, positions):
+        for pos in positions:
+            if pos['symbol'] == self.market_symbol:
+                self.status_data['current_pos'] = self._get_position_amount(pos['info'])
+                self.status_data['entry_price'] = float(pos.get('entryPrice') or 0)
+                self.status_data['liquidation_price'] = float(pos.get('liquidationPrice') or 0)
+                self.status_data['unrealized_pnl'] = float(pos.get('unrealizedPnl') or 0)
+                return
 
-            self.last_sync_time = time.time() 
-            
-        except Exception as e:
-            self.log(f"[数据同步失败] {e}")
+        self.status_data['current_pos'] = 0
+        self.status_data['entry_price'] = 0
+        self.status_data['liquidation_price'] = 0
+        self.status_data['unrealized_pnl'] = 0
 
     def sim_calculate_pnl(self):
         try:
@@ -2,12 +2,16 @@
 import ccxt
 import os
 import importlib.util
+from array import array
+from app.services.exchange_registry import ExchangeRegistry
+from app.services.async_runtime import AsyncExchangeFacade
 
 class FutureGridInitMixin:
     def init_exchange(self):
         try:
             exchange_id = self.config.get('exchange_id', 'binance')
-            exchange_class = getattr(ccxt, exchange_id)
+            if not hasattr(ccxt, exchange_id):
+                raise ValueError(f"不支持的交易所: {exchange_id}")
             
             api_key = self.config.get('api_key', '')
             secret = self.config.get('secret', '')
@@ -32,18 +36,12 @@ class FutureGridInitMixin:
                     except Exception as e:
                         self.log(f"[系统] 外部密钥加载失败: {e}")
 
-            params = {
-                'apiKey': api_key,
-                'secret': secret,
-                'enableRateLimit': True,
-                'options': {'defaultType': 'swap'}, 
-                'timeout': 30000
-            }
-            if password:
-                params['password'] = password
-
-            self.exchange = exchange_class(params)
-            self.exchange.load_markets()
+            # 注册表复用同一凭证的长连接客户端；市场元数据按 TTL 共享，不在每次启动时重新下载
+            # 异步模式: 使用 ccxt.async_support 客户端，经同步外观供各 Mixin 调用
+            client = ExchangeRegistry.get(exchange_id, 'swap', api_key, secret, password,
+                                          async_mode=self.async_mode)
+            self.exchange = AsyncExchangeFacade(client) if self.async_mode else client
+            ExchangeRegistry.ensure_markets(self.exchange)
             
             user_symbol = self.config['symbol']
             target_base = user_symbol.split('/')[0]
@@ -95,14 +93,15 @@ class FutureGridInitMixin:
             if num < 2: num = 2
             
             step = (upper - lower) / num
-            # [新增] 缓存关键参数供新逻辑使用
+            # [新增] 缓存关键参数供新逻辑使用 (等差网格: 价格 = lower + i * step，索引可直接算出)
             self.grid_step = step
             self.grid_count = num
+            self.grid_lower = lower
 
-            self.grids = [lower + i * step for i in range(num + 1)]
-            
             digits = 2 if lower > 100 else (4 if lower > 1 else 6)
-            self.grids = [round(g, digits) for g in self.grids]
+            # 紧凑的 double 数组 (万级网格线也只占几十 KB)
+            self.grids = array('d', (round(lower + i * step, digits) for i in range(num + 1)))
+            self._display_key = None
             
             self.log(f"[网格生成] 区间 {lower}-{upper}, 共 {num} 格")
             return True
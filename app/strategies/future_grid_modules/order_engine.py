@@ -1,8 +1,23 @@
 # app/strategies/future_grid_modules/order_engine.py
+import threading
 import time
-import math
+from concurrent.futures import ThreadPoolExecutor
+
+from config import Config
 
 class FutureGridOrderMixin:
+    DISPLAY_WINDOW = 200   # 网格数超过该值时，前端挂单表只显示当前位置附近的窗口
+    RECONCILE_INTERVAL = 30  # 成交游标模式下，挂单全量对账 (fetch_open_orders) 的间隔 (秒)
+    TRADES_PAGE_LIMIT = 100
+    # 各交易所批量下单接口单次最多订单数 (未列出的按 5)
+    BATCH_ORDER_LIMITS = {'binance': 5, 'binanceusdm': 5, 'okx': 20, 'bybit': 10, 'bitget': 50}
+    SUBMIT_WORKERS = getattr(Config, 'ORDER_SUBMIT_WORKERS', 4)       # 同步模式下单个机器人同时在途的请求数
+    SUBMIT_POOL_SIZE = getattr(Config, 'ORDER_SUBMIT_POOL_SIZE', 16)  # 同步模式下所有机器人共用的提交线程数
+    ACCOUNT_POOL_SIZE = getattr(Config, 'ACCOUNT_SYNC_POOL_SIZE', 4)  # 同步模式下所有机器人共用的账户查询线程数
+    _submit_pool = None
+    _account_sync_pool = None
+    _submit_pool_lock = threading.Lock()
+
     # ==================================================================
     # [新增] Phase 4: 推窗/队列平移核心逻辑组件
     # ==================================================================
@@ -11,62 +26,188 @@ class FutureGridOrderMixin:
         if not self.exchange or not self.exchange.apiKey: return
         try:
             self.exchange.cancel_all_orders(self.market_symbol)
-            self.active_orders = {'buy': {}, 'sell': {}}
+            self._reset_active_orders()
         except Exception:
             # 兼容不支持 cancel_all 的情况
             orders = self.exchange.fetch_open_orders(self.market_symbol)
             for o in orders:
                 try: self.exchange.cancel_order(o['id'], self.market_symbol)
                 except: pass
-            self.active_orders = {'buy': {}, 'sell': {}}
+            self._reset_active_orders()
+
+    # --- 本地挂单簿: active_orders[side] = {网格索引: order_id}，order_index = {order_id: (side, 网格索引)} ---
+    def _reset_active_orders(self):
+        self.active_orders = {'buy': {}, 'sell': {}}
+        self.order_index = {}
+
+    def _remember_order(self, side, grid_idx, order_id):
+        self.active_orders[side][grid_idx] = order_id
+        self.order_index[order_id] = (side, grid_idx)
+
+    def _forget_order(self, side, grid_idx):
+        order_id = self.active_orders[side].pop(grid_idx, None)
+        if order_id is not None:
+            self.order_index.pop(order_id, None)
+            self._fill_progress.pop(order_id, None)
+        return order_id
+
+    def _grid_price(self, grid_idx):
+        """网格索引 -> 挂单价 (区间内直接取网格线，区间外按步长外推)"""
+        if 0 <= grid_idx < len(self.grids):
+            return self.grids[grid_idx]
+        return self.grid_lower + grid_idx * self.grid_step
+
+    def _gather_calls(self, *calls, account=False):
+        """
+        [新增] 并发执行多个交易所调用，按顺序返回结果 (失败的调用返回异常对象)
+        calls: [(method_name, args, kwargs), ...]
+        异步模式下在事件循环上一次 gather；同步模式下经共享线程池并发:
+        account=True (持仓 / 余额 / 费率查询) 走独立的小线程池，不与下单 / 撤单争用提交线程
+        """
+        if not calls: return []
+        if hasattr(self.exchange, 'gather'):
+            return self.exchange.gather(*calls)
+
+        def invoke(name, args, kwargs):
+            try:
+                return getattr(self.exchange, name)(*args, **kwargs)
+            except Exception as e:
+                return e
+        if len(calls) == 1:
+            return [invoke(*calls[0])]
+        pool = self._account_pool() if account else self._order_pool()
+        # 每个机器人同时最多 SUBMIT_WORKERS 个请求在途，单个机器人铺挂单墙时不会占满共享线程池
+        results = []
+        for k in range(0, len(calls), self.SUBMIT_WORKERS):
+            futures = [pool.submit(invoke, *call) for call in calls[k:k + self.SUBMIT_WORKERS]]
+            results.extend(f.result() for f in futures)
+        return results
+
+    @classmethod
+    def _order_pool(cls):
+        """所有同步模式机器人共用的下单 / 撤单 / 查单线程池 (按需创建，线程数不随机器人数量增长)"""
+        return cls._shared_pool('_submit_pool', cls.SUBMIT_POOL_SIZE, "order-submit")
+
+    @classmethod
+    def _account_pool(cls):
+        """所有同步模式机器人共用的账户查询线程池 (与下单线程池分开，账户同步积压时不拖慢下单)"""
+        return cls._shared_pool('_account_sync_pool', cls.ACCOUNT_POOL_SIZE, "account-sync")
+
+    @classmethod
+    def _shared_pool(cls, attr, size, prefix):
+        if getattr(cls, attr) is None:
+            with cls._submit_pool_lock:
+                if getattr(cls, attr) is None:
+                    setattr(cls, attr, ThreadPoolExecutor(max_workers=size, thread_name_prefix=prefix))
+        return getattr(cls, attr)
+
+    def _wait_order_filled(self, order_id, timeout=3.0):
+        """[新增] 等待订单出现成交 (短间隔起步、逐步退避)，超时返回最后一次查询结果"""
+        deadline = time.time() + timeout
+        delay = 0.1
+        while True:
+            order = self.exchange.fetch_order(order_id, self.market_symbol)
+            if float(order.get('filled') or 0) > 0 or order.get('status') in ('closed', 'canceled'):
+                return order
+            if time.time() + delay > deadline:
+                return order
+            time.sleep(delay)
+            delay = min(delay * 2, 1.0)
+
+    def _wait_position_change(self, previous_pos, timeout=2.0):
+        """[新增] 成交后等待持仓同步到账 (持仓变化即返回，超时以最后一次同步为准)"""
+        deadline = time.time() + timeout
+        delay = 0.1
+        while True:
+            self.sync_account_data(force=True, fields=('positions',))
+            if self.status_data['current_pos'] != previous_pos or time.time() + delay > deadline:
+                return
+            time.sleep(delay)
+            delay = min(delay * 2, 1.0)
+
+    def _batch_size(self):
+        return self.BATCH_ORDER_LIMITS.get(self.exchange.id, 5)
 
-    def _place_order_safe(self, side, price):
-        """[新增] 安全下单包装函数"""
+    def _place_orders(self, placements):
+        """
+        [新增] 批量挂限价单: placements = [(side, 网格索引), ...]
+        交易所支持 createOrders 时按批提交，否则逐单并发提交；各批次并行执行，
+        全部返回后一次性写入本地挂单簿
+        """
         if not self.exchange or not self.exchange.apiKey: return
         
-        # 价格对齐 (假设最小Step)
-        price = round(price / self.grid_step) * self.grid_step
-        
         # 本地防重
-        if price in self.active_orders[side]:
-            return
-        
-        try:
-            price_str = self._to_precision(price=price)
-            amt_str = self._to_precision(amount=self.order_qty)
-            
-            order = self.exchange.create_order(
-                self.market_symbol, 'limit', side, amt_str, price_str
-            )
-            self.active_orders[side][price] = order['id']
-            # self.log(f"✅ 挂单: {side} @ {price}") 
-        except Exception as e:
-            self.log(f"🛑 下单失败 [{side} {price}]: {e}")
+        with self.state_lock:
+            pending = [(side, i) for side, i in dict.fromkeys(placements) if i not in self.active_orders[side]]
+        if not pending: return
 
-    def _cancel_order_by_price(self, side, price):
-        """[新增] 根据价格查找并撤销订单"""
-        target_id = None
-        target_price_key = None
-        
-        # 模糊匹配价格
-        for p, oid in self.active_orders[side].items():
-            if math.isclose(float(p), float(price), abs_tol=self.grid_step * 0.1):
-                target_id = oid
-                target_price_key = p
-                break
-        
-        if target_id:
+        amt_str = self._to_precision(amount=self.order_qty)
+        requests = [(side, i, self._to_precision(price=self._grid_price(i))) for side, i in pending]
+
+        # 批量接口: 各批次一次并发提交；整批失败的退回逐单提交
+        placed, singles = [], requests
+        if self.exchange.has.get('createOrders') and len(requests) > 1:
+            size = self._batch_size()
+            chunks = [requests[k:k + size] for k in range(0, len(requests), size)]
+            results = self._gather_calls(*[
+                ('create_orders', ([{'symbol': self.market_symbol, 'type': 'limit', 'side': side,
+                                     'amount': amt_str, 'price': price_str}
+                                    for side, _, price_str in chunk],), {})
+                for chunk in chunks])
+            singles = []
+            for chunk, orders in zip(chunks, results):
+                if isinstance(orders, Exception):
+                    self.log(f"⚠️ 批量下单失败，改为逐单提交: {orders}")
+                    singles.extend(chunk)
+                    continue
+                for (side, grid_idx, price_str), order in zip(chunk, orders):
+                    if order and order.get('id'):
+                        placed.append((side, grid_idx, order['id']))
+                    else:
+                        self.log(f"🛑 下单失败 [{side} {price_str}]: {(order or {}).get('info')}")
+
+        results = self._gather_calls(*[('create_order', (self.market_symbol, 'limit', side, amt_str, price_str), {})
+                                       for side, _, price_str in singles])
+        for (side, grid_idx, price_str), order in zip(singles, results):
+            if isinstance(order, Exception):
+                self.log(f"🛑 下单失败 [{side} {price_str}]: {order}")
+            else:
+                placed.append((side, grid_idx, order['id']))
+
+        with self.state_lock:
+            for side, grid_idx, order_id in placed:
+                self._remember_order(side, grid_idx, order_id)
+            # self.log(f"✅ 挂单: {len(placed)}/{len(requests)}")
+
+    def _cancel_orders(self, cancels):
+        """[新增] 批量撤单: cancels = [(side, 网格索引), ...]；支持 cancelOrders 时一次提交，否则逐单并发"""
+        if not cancels: return
+        with self.state_lock:
+            targets = [(side, i, self.active_orders[side].get(i)) for side, i in cancels]
+        targets = [t for t in targets if t[2]]
+        if not targets: return
+
+        if len(targets) > 1 and self.exchange.has.get('cancelOrders'):
             try:
-                self.exchange.cancel_order(target_id, self.market_symbol)
-                del self.active_orders[side][target_price_key]
-                # self.log(f"♻️ 撤单: {side} @ {price}")
+                self.exchange.cancel_orders([oid for _, _, oid in targets], self.market_symbol)
+                with self.state_lock:
+                    for side, grid_idx, oid in targets:
+                        if self.active_orders[side].get(grid_idx) == oid:
+                            self._forget_order(side, grid_idx)
+                return
             except Exception as e:
-                # 订单可能已消失，清理本地记录
-                if "NotFound" in str(e) or "Unknown" in str(e):
-                    if target_price_key in self.active_orders[side]:
-                        del self.active_orders[side][target_price_key]
-                else:
-                    self.log(f"⚠️ 撤单失败: {e}")
+                self.log(f"⚠️ 批量撤单失败，改为逐单撤销: {e}")
+
+        results = self._gather_calls(*[('cancel_order', (oid, self.market_symbol), {}) for _, _, oid in targets])
+        for (side, grid_idx, oid), result in zip(targets, results):
+            # 订单可能已消失 (已成交 / 已撤)，同样清理本地记录
+            if isinstance(result, Exception) and not ("NotFound" in str(result) or "Unknown" in str(result)):
+                self.log(f"⚠️ 撤单失败: {result}")
+                continue
+            with self.state_lock:
+                if self.active_orders[side].get(grid_idx) == oid:
+                    self._forget_order(side, grid_idx)
+            # self.log(f"♻️ 撤单: {side} @ {self._grid_price(grid_idx)}")
 
     def initialize_grid_orders(self, current_price):
         """
@@ -77,177 +218,313 @@ class FutureGridOrderMixin:
         self.log(f"⚡ 正在计算初始网格模型 (Strategy Aware)...")
         self._cancel_all_orders()
         
+        # 1~2. 根据策略模式确定 Gap 位置
+        gap_idx = self._initial_gap_index(current_price)
+        mode = self.config.get('strategy_type', 'neutral')
+
+        # 3. 确定空档价格
+        self.gap_idx = gap_idx
+        self.gap_price = self.grids[gap_idx]
+        self.log(f"📍 初始空档锁定: {self.gap_price} (模式: {mode}, 现价: {current_price})")
+        
+        # 4. 生成挂单墙: 下方 N 格买、上方 N 格卖 (靠近区间边界时按步长外推)，整批提交
+        target = self._target_order_set(gap_idx)
+        placements = [('buy', i) for i in sorted(target['buy'], reverse=True)]
+        placements += [('sell', i) for i in sorted(target['sell'])]
+        t0 = time.time()
+        self._place_orders(placements)
+        self.log(f"🧱 挂单墙已提交: {len(self.order_index)}/{len(placements)} 单, 耗时 {time.time() - t0:.2f}s")
+            
+        self.update_orders_display_from_memory()
+
+    def _initial_gap_index(self, current_price):
+        """按策略模式确定初始空档索引 (复用 manage_maker_orders 的思想)"""
         # 1. 计算基础网格索引 (复用旧逻辑)
         grid_idx = self.calculate_grid_index(current_price)
-        
-        # 2. 根据策略模式确定 Gap 位置 (复用 manage_maker_orders 的思想)
         mode = self.config.get('strategy_type', 'neutral')
-        
-        # 默认 Gap (Neutral)
-        gap_idx = grid_idx 
-        
+
         if mode == 'long':
             # Long 模式:
             # 旧逻辑中 buy_start = idx, sell_start = idx + 2
             # 意味着中间的 idx + 1 是空档 (Gap)
-            gap_idx = grid_idx + 1
-            if gap_idx >= len(self.grids): gap_idx = len(self.grids) - 1
+            return min(grid_idx + 1, len(self.grids) - 1)
 
-        elif mode == 'short':
+        if mode == 'short':
             # Short 模式:
             # 旧逻辑中 buy_start = idx - 1, sell_start = idx + 1
             # 意味着中间的 idx 是空档 (Gap)
-            gap_idx = grid_idx
-        
+            return grid_idx
+
+        # Neutral: 使用四舍五入寻找最近的网格线
+        return self.nearest_grid_index(current_price)
+
+    def rebalance_orders(self, current_price, regrid=False):
+        """
+        [新增] 参数热更新后的差量调整 (替代 撤全部 + 重铺挂单墙)
+        以 (方向, 价格, 数量) 比对现有挂单与新参数下的目标挂单: 相同的原单保留 (重映射到新网格索引)，
+        只撤销 / 新挂真正变化的部分；下单数量变化时所有挂单都会被替换
+        regrid: 区间 / 格数有变化，需要重新生成网格
+        与步进互斥执行 (step_lock)，保证快照到重建之间挂单簿不被成交处理改写
+        """
+        with self.step_lock:
+            self._rebalance_orders(current_price, regrid)
+
+    def _rebalance_orders(self, current_price, regrid):
+        # 1. 以旧网格 / 旧数量为现有挂单建立快照
+        old_amt = self._to_precision(amount=self.order_qty)
+        with self.state_lock:
+            existing = [(side, i, oid) for side in ('buy', 'sell') for i, oid in self.active_orders[side].items()]
+        live = {(side, self._to_precision(price=self._grid_price(i)), old_amt): (side, i, oid)
+                for side, i, oid in existing}
+
+        # 2. 应用新参数
+        self.order_qty = float(self.config.get('amount', 0))
+        if regrid and not self.generate_grids():
+            return
+        # 网格未变时沿用当前空档，避免仅调整挂单数就整体平移
+        if regrid or not 0 <= self.gap_idx < len(self.grids):
+            gap_idx = self._initial_gap_index(current_price)
         else:
-            # Neutral: 使用四舍五入寻找最近的网格线
-            min_dist = float('inf')
-            best_i = 0
-            for i, p in enumerate(self.grids):
-                if abs(p - current_price) < min_dist:
-                    min_dist = abs(p - current_price)
-                    best_i = i
-            gap_idx = best_i
+            gap_idx = self.gap_idx
 
-        # 3. 确定空档价格
-        self.gap_price = self.grids[gap_idx]
-        self.log(f"📍 初始空档锁定: {self.gap_price} (模式: {mode}, 现价: {current_price})")
-        
-        # 4. 生成挂单
-        active_limit = int(self.config.get('active_order_limit', 5))
-        
-        # 下方挂买 (Gap - N*Step)
-        for i in range(1, active_limit + 1):
-            p = self.gap_price - (i * self.grid_step)
-            self._place_order_safe('buy', p)
-            
-        # 上方挂卖 (Gap + N*Step)
-        for i in range(1, active_limit + 1):
-            p = self.gap_price + (i * self.grid_step)
-            self._place_order_safe('sell', p)
-            
+        # 3. 目标挂单与快照求差
+        new_amt = self._to_precision(amount=self.order_qty)
+        target = self._target_order_set(gap_idx)
+        keep, to_place = {}, []
+        for side in ('buy', 'sell'):
+            for i in sorted(target[side], key=lambda i: abs(i - gap_idx)):
+                found = live.pop((side, self._to_precision(price=self._grid_price(i)), new_amt), None)
+                if found:
+                    keep[found[2]] = (side, i)
+                else:
+                    to_place.append((side, i))
+        to_cancel = [(side, i) for side, i, _ in live.values()]
+
+        # 4. 先按旧索引撤掉失效挂单 (失败的重试一次)，再把保留的挂单重映射到新索引，最后补挂
+        self._cancel_orders(to_cancel)
+        failed = self._untracked_after_cancel(keep)
+        if failed:
+            self._cancel_orders(failed)
+            failed = self._untracked_after_cancel(keep)
+        if failed:
+            # 仍有旧挂单撤不掉: 重映射会让它们脱离挂单簿 (成交无法识别)，改为全部撤单后重新铺设
+            self.log(f"⚠️ {len(failed)} 笔挂单撤销失败，改为全部撤单后重新铺设挂单墙")
+            self.initialize_grid_orders(current_price)
+            return
+        with self.state_lock:
+            self._reset_active_orders()
+            for oid, (side, i) in keep.items():
+                self._remember_order(side, i, oid)
+            self.gap_idx = gap_idx
+            self.gap_price = self.grids[gap_idx]
+        self._place_orders(to_place)
+
+        self.log(f"♻️ 差量调整: 保留 {len(keep)} / 撤销 {len(to_cancel)} / 新挂 {len(to_place)} "
+                 f"(空档 {self.gap_price})")
         self.update_orders_display_from_memory()
 
-    def _process_grid_shift(self, filled_order):
-        """[新增] 推窗逻辑：仅在成交时触发"""
+    def _untracked_after_cancel(self, keep):
+        """撤单后仍留在挂单簿、且不在保留集合中的挂单 [(side, 旧网格索引), ...]"""
         with self.state_lock:
-            side = filled_order['side']
-            fill_price = float(filled_order['price'])
-            amount = float(filled_order['amount'])
-            
-            # 更新状态：成交价即为新空档
+            return [(side, i) for oid, (side, i) in self.order_index.items() if oid not in keep]
+
+    def _target_order_set(self, gap_idx):
+        """
+        空档为 gap_idx 时应有的挂单: 下方 N 格买、上方 N 格卖 (N = active_order_limit)
+        与原推窗逻辑一致，靠近网格区间边界时按步长外推到区间外 (见 _grid_price)，两侧始终各 N 单；
+        仅跳过外推后价格 <= 0 的买单 (交易所无法挂出)
+        """
+        active_limit = int(self.config.get('active_order_limit', 5))
+        buys = {i for i in range(gap_idx - active_limit, gap_idx) if self._grid_price(i) > 0}
+        sells = set(range(gap_idx + 1, gap_idx + active_limit + 1))
+        return {'buy': buys, 'sell': sells}
+
+    def _process_fills(self, fills):
+        """
+        [新增] 多档成交一次性推窗
+        fills: [{'side', 'idx', 'price', 'amount', 'ts', 'id'}]，按时间排序后取最后一笔成交格为新空档，
+        计算目标挂单集合与本地挂单簿的差集，只执行净下单 / 净撤单；网络请求不在锁内执行
+        """
+        if not fills: return
+        fills = sorted(fills, key=lambda f: f.get('ts') or 0)
+
+        with self.state_lock:
+            for f in fills:
+                current = self.active_orders[f['side']].get(f['idx'])
+                if current is not None and f.get('id') in (None, current):
+                    self._forget_order(f['side'], f['idx'])
+                self.log(f"🔔 成交 {f['side']} {f['amount']} @ {f['price']}")
+
             old_gap = self.gap_price
-            new_gap = fill_price
-            self.gap_price = new_gap
-            
-            self.log(f"🔔 成交 {side} {amount} @ {fill_price} | 空档移动: {old_gap} -> {new_gap}")
-            
-            active_limit = int(self.config.get('active_order_limit', 5))
-            
-            if side == 'sell':
-                # 卖成交 -> 上移
-                target_buy = new_gap - self.grid_step
-                self._place_order_safe('buy', target_buy)
-                
-                target_top_sell = new_gap + (active_limit * self.grid_step)
-                self._place_order_safe('sell', target_top_sell)
-                
-                remove_buy = new_gap - ((active_limit + 1) * self.grid_step)
-                self._cancel_order_by_price('buy', remove_buy)
-                
-            elif side == 'buy':
-                # 买成交 -> 下移
-                target_sell = new_gap + self.grid_step
-                self._place_order_safe('sell', target_sell)
-                
-                target_bottom_buy = new_gap - (active_limit * self.grid_step)
-                self._place_order_safe('buy', target_bottom_buy)
-                
-                remove_sell = new_gap + ((active_limit + 1) * self.grid_step)
-                self._cancel_order_by_price('sell', remove_sell)
-            
-            self.update_orders_display_from_memory()
+            self.gap_idx = fills[-1]['idx']
+            self.gap_price = self._grid_price(self.gap_idx)
+
+            target = self._target_order_set(self.gap_idx)
+            to_place = {side: sorted(target[side] - self.active_orders[side].keys(),
+                                     key=lambda i: abs(i - self.gap_idx))
+                        for side in ('buy', 'sell')}
+            to_cancel = {side: [i for i in self.active_orders[side] if i not in target[side]]
+                         for side in ('buy', 'sell')}
+
+        self.log(f"📐 空档移动: {old_gap} -> {self.gap_price} ({len(fills)} 笔成交) | "
+                 f"新挂 {len(to_place['buy']) + len(to_place['sell'])} / 撤销 {len(to_cancel['buy']) + len(to_cancel['sell'])}")
+
+        # 先补靠近空档的挂单，再撤掉窗口外的远端挂单
+        self._place_orders([('buy', i) for i in to_place['buy']] + [('sell', i) for i in to_place['sell']])
+        self._cancel_orders([('buy', i) for i in to_cancel['buy']] + [('sell', i) for i in to_cancel['sell']])
+
+        self.update_orders_display_from_memory()
 
     def _check_order_status(self):
-        """[新增] 订单状态轮询"""
+        """
+        [新增] 订单状态轮询
+        支持 fetchMyTrades 时按成交游标增量拉取 (每轮 1 次请求，与成交笔数无关)，
+        并定期全量对账挂单；否则回退为 挂单差集 + 逐单查询
+        """
         if not self.exchange or not self.exchange.apiKey: return
 
         try:
-            # 获取当前交易所挂单
-            open_orders = self.exchange.fetch_open_orders(self.market_symbol)
-            open_ids = [o['id'] for o in open_orders]
-            
-            # 找出本地记录中存在，但交易所已不存在的订单
-            filled_candidates = []
-            
-            for side in ['buy', 'sell']:
-                # 使用 list() 复制 keys 避免遍历时修改字典
-                for price, oid in list(self.active_orders[side].items()):
-                    if oid not in open_ids:
-                        filled_candidates.append({'id': oid, 'side': side, 'price': price})
-            
-            for candidate in filled_candidates:
-                try:
-                    order_detail = self.exchange.fetch_order(candidate['id'], self.market_symbol)
-                    status = order_detail['status']
-                    
-                    if status == 'closed': 
-                        # 成交 -> 触发推窗
-                        price_key = candidate['price']
-                        if price_key in self.active_orders[candidate['side']]:
-                            del self.active_orders[candidate['side']][price_key]
-                        
-                        self._process_grid_shift(order_detail)
-                        self.sync_account_data()
-                        
-                    elif status == 'canceled': 
-                        # 撤销 -> 仅清理本地
-                        self.log(f"⚠️ 发现外部撤单: {candidate['side']}")
-                        if candidate['price'] in self.active_orders[candidate['side']]:
-                            del self.active_orders[candidate['side']][candidate['price']]
-                            
-                except Exception as e:
-                    self.log(f"查单失败: {e}")
-                    
+            if self.exchange.has.get('fetchMyTrades'):
+                filled = self._poll_fills_by_trades()
+                if time.time() - self.last_reconcile_time > self.RECONCILE_INTERVAL:
+                    filled += self._reconcile_open_orders()
+            else:
+                filled = self._reconcile_open_orders()
+
+            # 本轮所有成交处理完后只同步一次持仓 (余额 / 费率按各自缓存时长刷新)
+            if filled:
+                self.sync_account_data(force=True, fields=('positions',))
         except Exception as e:
             self.log(f"状态轮询异常: {e}")
 
+    def _poll_fills_by_trades(self):
+        """按 (since 时间戳 + 已见成交 id) 游标增量拉取成交，累计到订单完全成交时推窗；返回推窗次数"""
+        if self.fill_cursor_since is None:
+            # 首次启动: 只关心当前挂单，之前的成交与本地挂单无关
+            self.fill_cursor_since = self.exchange.milliseconds() - 5000
+
+        new_trades = []
+        for _ in range(5):
+            trades = self.exchange.fetch_my_trades(self.market_symbol, since=self.fill_cursor_since,
+                                                   limit=self.TRADES_PAGE_LIMIT)
+            for t in trades:
+                if t['id'] in self._seen_trade_set: continue
+                if len(self._seen_trade_ids) == self._seen_trade_ids.maxlen:
+                    self._seen_trade_set.discard(self._seen_trade_ids[0])
+                self._seen_trade_ids.append(t['id'])
+                self._seen_trade_set.add(t['id'])
+                new_trades.append(t)
+            if trades:
+                # since 为闭区间，同一毫秒的成交由已见 id 去重
+                self.fill_cursor_since = max(self.fill_cursor_since, max(t['timestamp'] or 0 for t in trades))
+            if len(trades) < self.TRADES_PAGE_LIMIT: break
+
+        fills = []
+        order_amount = float(self._to_precision(amount=self.order_qty))   # 实际下单量 (已按精度截断)
+        new_trades.sort(key=lambda t: t['timestamp'] or 0)
+        for t in new_trades:
+            located = self.order_index.get(t.get('order'))
+            if located is None: continue     # 非网格挂单 (如纠偏市价单)
+            side, grid_idx = located
+            order_id = t['order']
+
+            # 部分成交只累计，完全成交才推窗
+            done = self._fill_progress.get(order_id, 0.0) + float(t['amount'] or 0)
+            if done < order_amount * (1 - 1e-6):
+                self._fill_progress[order_id] = done
+                continue
+
+            fills.append({'side': side, 'idx': grid_idx, 'price': t['price'], 'amount': done,
+                          'ts': t['timestamp'], 'id': order_id})
+        self._process_fills(fills)
+        return len(fills)
+
+    def _reconcile_open_orders(self):
+        """挂单全量对账: 本地有、交易所已无的订单逐个查询终态；返回推窗次数"""
+        self.last_reconcile_time = time.time()
+
+        # 获取当前交易所挂单
+        open_orders = self.exchange.fetch_open_orders(self.market_symbol)
+        open_ids = {o['id'] for o in open_orders}
+        
+        # 找出本地记录中存在，但交易所已不存在的订单
+        filled_candidates = [
+            {'id': oid, 'side': side, 'idx': grid_idx}
+            for oid, (side, grid_idx) in list(self.order_index.items())
+            if oid not in open_ids
+        ]
+        
+        # 并发查询所有缺失订单的终态
+        details = self._gather_calls(*[('fetch_order', (c['id'], self.market_symbol), {})
+                                       for c in filled_candidates])
+
+        fills = []
+        for candidate, order_detail in zip(filled_candidates, details):
+            try:
+                if isinstance(order_detail, Exception): raise order_detail
+                status = order_detail['status']
+                
+                if status == 'closed': 
+                    # 成交 -> 汇总后统一推窗
+                    fills.append({'side': candidate['side'], 'idx': candidate['idx'], 'id': candidate['id'],
+                                  'price': order_detail.get('average') or order_detail['price'],
+                                  'amount': order_detail.get('filled') or order_detail['amount'],
+                                  'ts': order_detail.get('lastTradeTimestamp') or order_detail.get('timestamp')})
+                    
+                elif status == 'canceled': 
+                    # 撤销 -> 仅清理本地
+                    self.log(f"⚠️ 发现外部撤单: {candidate['side']}")
+                    with self.state_lock:
+                        if self.active_orders[candidate['side']].get(candidate['idx']) == candidate['id']:
+                            self._forget_order(candidate['side'], candidate['idx'])
+                        
+            except Exception as e:
+                self.log(f"查单失败: {e}")
+        self._process_fills(fills)
+        return len(fills)
+
+    def _display_range(self, center_idx):
+        """挂单表显示的索引区间 [lo, hi)，网格过多时以 center_idx 为中心开窗"""
+        n = len(self.grids)
+        if n <= self.DISPLAY_WINDOW:
+            return 0, n
+        if center_idx < 0:
+            center_idx = self.calculate_grid_index(self.status_data.get('last_price', 0))
+        half = self.DISPLAY_WINDOW // 2
+        lo = min(max(center_idx - half, 0), n - self.DISPLAY_WINDOW)
+        return lo, lo + self.DISPLAY_WINDOW
+
     def update_orders_display_from_memory(self):
         """[新增] 从内存 active_orders 生成前端显示数据"""
         try:
-            orders = []
             amount = self.config['amount']
+            n = len(self.grids)
             
-            # 估算当前 index
-            current_idx = -1
-            for i, p in enumerate(self.grids):
-                if math.isclose(p, self.gap_price, abs_tol=self.grid_step*0.1):
-                    current_idx = i
-                    break
+            # 空档所在 index (不在网格区间内时为 -1)
+            current_idx = self.gap_idx if 0 <= self.gap_idx < n else -1
             
             self.status_data['current_grid_idx'] = current_idx
 
-            for i in range(len(self.grids)-1, -1, -1):
+            buy_idx = self.active_orders['buy'].keys()
+            sell_idx = self.active_orders['sell'].keys()
+
+            lo, hi = self._display_range(current_idx)
+            key = ('memory', current_idx, frozenset(buy_idx), frozenset(sell_idx), amount, n, lo)
+            if key == self._display_key: return
+
+            orders = []
+            for i in range(hi - 1, lo - 1, -1):
                 p = self.grids[i]
                 order_type = "---"
                 style = "text-muted"
                 
-                is_buy = False
-                is_sell = False
-                
-                for bp in self.active_orders['buy'].keys():
-                    if math.isclose(float(bp), p, abs_tol=0.1): is_buy = True
-                
-                for sp in self.active_orders['sell'].keys():
-                    if math.isclose(float(sp), p, abs_tol=0.1): is_sell = True
-                
-                if math.isclose(p, self.gap_price, abs_tol=self.grid_step*0.1):
+                if i == current_idx:
                     style = "text-warning bg-dark border border-warning"
                     order_type = "⚡ 空档(GAP) ⚡"
-                elif is_sell:
+                elif i in sell_idx:
                     order_type = "SELL (挂单)"
                     style = "text-danger"
-                elif is_buy:
+                elif i in buy_idx:
                     order_type = "BUY (挂单)"
                     style = "text-success"
                     
@@ -256,6 +533,7 @@ class FutureGridOrderMixin:
                 })
             
             self.status_data['orders'] = orders
+            self._display_key = key
         except Exception as e:
             pass
 
@@ -310,14 +588,13 @@ class FutureGridOrderMixin:
             )
 
             order_id = order['id']
-            time.sleep(0.5) 
-            full_order = self.exchange.fetch_order(order_id, self.market_symbol)
-            filled = float(full_order.get('filled', 0))
+            # 等待成交回报 (替代固定休眠: 市价单通常首次查询即已成交)
+            full_order = self._wait_order_filled(order_id)
+            filled = float(full_order.get('filled') or 0)
             
             if filled > 0:
                 self.log(f"[纠偏成功] 已强制{side} {filled:.4f}")
-                time.sleep(0.5)
-                self.sync_account_data()
+                self._wait_position_change(current_pos)
                 # [新增] 纠偏后网格状态已乱，调用智能初始化重新铺设网格
                 # 注意：这里调用的是修改后的 initialize_grid_orders，它会自动处理 Long/Short 的 Gap 对齐
                 self.initialize_grid_orders(self.status_data['last_price'])
@@ -344,8 +621,13 @@ class FutureGridOrderMixin:
         try:
             amount = self.config['amount']
             active_limit = int(self.config.get('active_order_limit', 5))
+
+            # 现价格子未变时无需重建 (模拟模式下每个 tick 都会调用)
+            lo, hi = self._display_range(current_idx)
+            key = ('index', current_idx, active_limit, amount, len(self.grids), lo)
+            if key == self._display_key: return
             
-            for i in range(len(self.grids)-1, -1, -1):
+            for i in range(hi - 1, lo - 1, -1):
                 price = self.grids[i]
                 order_type = "---"
                 style = "text-muted"
@@ -365,5 +647,6 @@ class FutureGridOrderMixin:
                 })
             
             self.status_data['orders'] = orders 
+            self._display_key = key
         except Exception as e:
             self.log(f"[显示更新错误] {e}")
\ No newline at end of file
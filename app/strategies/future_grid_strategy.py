@@ -1,7 +1,13 @@
 # app/strategies/future_grid_strategy.py
+import asyncio
 import threading
 import time
 import random
+from collections import deque
+from array import array
+
+from config import Config
+from app.services.async_runtime import AsyncRuntime
 
 # 引入所有拆分出去的模块 (Mixin)
 from app.strategies.future_grid_modules.initialization import FutureGridInitMixin
@@ -17,7 +23,7 @@ class FutureGridBot(FutureGridInitMixin, FutureGridCalcMixin, FutureGridRiskMixi
         self.config = config
         self.log = logger_func
         self.exchange = None
-        self.grids = []
+        self.grids = array('d')
         self.running = False
         self.paused = False 
         self.market_symbol = None 
@@ -27,14 +33,30 @@ class FutureGridBot(FutureGridInitMixin, FutureGridCalcMixin, FutureGridRiskMixi
         self.last_grid_idx = -1
         self.force_sync = True
         self.sync_interval = 15
+        # [新增] 账户数据缓存: 各字段上次拉取时间 / 到期时间，并发的同步请求合并为一次
+        self._account_fetched_at = dict.fromkeys(self.ACCOUNT_FIELDS, 0)
+        self._account_expires_at = dict.fromkeys(self.ACCOUNT_FIELDS, 0)
+        self._account_lock = threading.Lock()
+        self._account_flight = None   # 进行中的同步 (threading.Event)
         # -----------------------------
 
         # [新增] Phase 4: 推窗策略核心状态 (增量追加)
         self.grid_step = 0.0      # 网格步长缓存
         self.grid_count = 0       # 网格数量缓存
-        self.active_orders = {'buy': {}, 'sell': {}}  # 本地挂单记录 {price: order_id}
+        self.grid_lower = 0.0     # 网格下沿 (索引 0 的价格)
+        self._display_key = None  # 挂单表显示缓存键 (状态未变时跳过重建)
+        self.active_orders = {'buy': {}, 'sell': {}}  # 本地挂单记录 {网格索引: order_id}
+        self.order_index = {}     # 反查表 {order_id: (side, 网格索引)}
+        self.gap_idx = -1         # 当前空档网格索引
+        # 成交游标 (fetch_my_trades 增量拉取)
+        self.fill_cursor_since = None            # 已处理到的成交时间戳 (ms)
+        self._seen_trade_ids = deque(maxlen=1000)
+        self._seen_trade_set = set()
+        self._fill_progress = {}                 # {order_id: 已累计成交量} (部分成交)
+        self.last_reconcile_time = 0
         self.gap_price = 0.0      # 当前空档价格
         self.state_lock = threading.Lock() # 线程锁确保原子性
+        self.step_lock = threading.RLock()  # 步进与热更新 (rebalance_orders) 互斥，避免挂单簿被并发改写
         self.order_qty = float(config.get('amount', 0)) # 缓存下单数量
         # -----------------------------
         
@@ -56,6 +78,21 @@ class FutureGridBot(FutureGridInitMixin, FutureGridCalcMixin, FutureGridRiskMixi
             "paused": False
         }
 
+        # [新增] 共享行情: 订阅监控线程的价格推送，代替机器人自己每秒 fetch_ticker
+        self.shared_feed = bool(config.get('shared_feed', getattr(Config, 'BOT_SHARED_FEED', False)))
+        self.feed_stale_seconds = getattr(Config, 'FEED_STALE_SECONDS', 10)
+        self.min_step_interval = getattr(Config, 'BOT_MIN_STEP_INTERVAL', 0.5)
+        self._feed_price = None
+        self._feed_price_at = 0
+        self._price_event = threading.Event()
+        self._feed_callback = None
+
+        # [新增] 执行模式: async (共享事件循环 + 有界步进线程池，默认) / thread (每个机器人一个线程)
+        self.async_mode = config.get('execution_mode', getattr(Config, 'BOT_EXECUTION_MODE', 'async')) == 'async'
+        self._async_price_event = None
+        self._task = None
+        self._step_thread = None
+
         # 后台运行线程
         self.worker_thread = None
 
@@ -87,17 +124,18 @@ class FutureGridBot(FutureGridInitMixin, FutureGridCalcMixin, FutureGridRiskMixi
         now = time.time()
         
         # 只有在初始化或定时同步时才执行 Watchdog
-        should_sync = False
+        should_sync = forced = False
         new_grid_idx = self.calculate_grid_index(current_price) # 用于 Watchdog 计算理论仓位
 
         if self.force_sync:
-            should_sync = True
+            should_sync = forced = True
             self.force_sync = False
         elif (now - self.last_sync_time) > self.sync_interval:
             should_sync = True
 
         if should_sync:
-            self.sync_account_data()
+            # 强制同步 (启动 / 纠偏 / 恢复后) 忽略缓存，定时同步只刷新到期字段
+            self.sync_account_data(force=forced)
             target_pos = self.calculate_target_position(new_grid_idx)
             self.adjust_position(target_pos)
             # self.manage_maker_orders(new_grid_idx) # [修改] 已废弃
@@ -105,7 +143,76 @@ class FutureGridBot(FutureGridInitMixin, FutureGridCalcMixin, FutureGridRiskMixi
             self.last_grid_idx = new_grid_idx
             self.last_sync_time = now
 
+    # --- 共享行情订阅 ---
+    def _on_feed_event(self, event):
+        """MarketFeed 回调 (在推送线程中执行，只记录价格并唤醒主循环)"""
+        if event.get('type') != 'ticker': return
+        if event.get('source') != self.config.get('exchange_id', 'binance'): return
+        # 只接受本机器人交易市场的报价 (现货价格不能驱动永续合约网格)
+        if event.get('market') != self.market_symbol: return
+        self._feed_price = float(event['price'])
+        self._feed_price_at = time.time()
+        self._price_event.set()
+        if self._async_price_event is not None:
+            AsyncRuntime.call_soon(self._async_price_event.set)
+
+    def _subscribe_feed(self):
+        if not self.shared_feed or self._feed_callback: return
+        from app.services.market_feed import MarketFeed
+        from app.services.monitor import SharedState
+        # 共享行情只推送监控数据源的价格；与本机器人交易所不一致时订阅不到任何事件，直接回退为自行拉取
+        feed_source = SharedState.target_source
+        exchange_id = self.config.get('exchange_id', 'binance')
+        if feed_source != exchange_id:
+            self.log(f"[警告] 共享行情源 {feed_source} 与交易所 {exchange_id} 不一致，不订阅共享行情，改为自行拉取价格")
+            return
+        # 登记本机器人的交易市场 (如永续 BTC/USDT:USDT)，由推送层单独报价，而不是沿用监控列表的现货价格
+        self._feed_callback = self._on_feed_event
+        MarketFeed.track_market(self.market_symbol)
+        MarketFeed.subscribe(self._feed_callback)
+        self.log(f"[行情] 已订阅共享行情推送: {self.market_symbol}")
+
+    def _unsubscribe_feed(self):
+        if not self._feed_callback: return
+        from app.services.market_feed import MarketFeed
+        MarketFeed.unsubscribe(self._feed_callback)
+        MarketFeed.untrack_market(self.market_symbol)
+        self._feed_callback = None
+
+    def _wait_feed_price(self):
+        """
+        等待共享行情的新价格 (最多 1 秒，与原轮询节奏一致)
+        推送价格在有效期内时直接使用；过期 (或未订阅) 返回 None，由调用方回退为自行拉取
+        """
+        if not self._feed_callback:
+            return None
+        self._price_event.wait(timeout=1)
+        self._price_event.clear()
+        if self._feed_price is None or time.time() - self._feed_price_at > self.feed_stale_seconds:
+            return None
+        return self._feed_price
+
+    def _sim_next_price(self, current_price):
+        """模拟模式: 随机游走"""
+        fluctuation = random.uniform(-0.005, 0.005)
+        current_price *= (1 + fluctuation)
+        if current_price > 100:
+            return round(current_price, 2)
+        elif current_price > 1:
+            return round(current_price, 4)
+        return round(current_price, 6)
+
+    def _step_in_worker(self, current_price):
+        """在工作线程中执行一步 (记录当前步进线程，stop() 据此避免等待自身)"""
+        with self.step_lock:
+            self._step_thread = threading.current_thread()
+            try:
+                self.run_step(current_price)
+            finally:
+                self._step_thread = None
+
     def _main_loop(self):
+        last_step = 0
         while self.running:
             if self.paused:
                 time.sleep(1)
@@ -113,33 +220,106 @@ class FutureGridBot(FutureGridInitMixin, FutureGridCalcMixin, FutureGridRiskMixi
 
             try:
                 current_price = self.status_data['last_price']
+                waited = False
 
                 if self.exchange and self.exchange.apiKey:
-                    try:
-                        ticker = self.exchange.fetch_ticker(self.market_symbol)
-                        current_price = float(ticker['last'])
-                    except Exception as e:
-                        self.log(f"[价格获取失败] {e}，使用上次价格继续")
+                    feed_price = self._wait_feed_price()
+                    waited = self._feed_callback is not None
+                    if feed_price is not None:
+                        current_price = feed_price
+                    else:
+                        try:
+                            ticker = self.exchange.fetch_ticker(self.market_symbol)
+                            current_price = float(ticker['last'])
+                        except Exception as e:
+                            self.log(f"[价格获取失败] {e}，使用上次价格继续")
 
                 else:
-                    fluctuation = random.uniform(-0.005, 0.005)
-                    current_price *= (1 + fluctuation)
-                    if current_price > 100:
-                        current_price = round(current_price, 2)
-                    elif current_price > 1:
-                        current_price = round(current_price, 4)
-                    else:
-                        current_price = round(current_price, 6)
+                    current_price = self._sim_next_price(current_price)
+
+                # 推送过快时限制步进频率 (run_step 内含订单状态查询)
+                elapsed = time.time() - last_step
+                if elapsed < self.min_step_interval:
+                    time.sleep(self.min_step_interval - elapsed)
+                    if self._feed_price is not None and time.time() - self._feed_price_at <= self.feed_stale_seconds:
+                        current_price = self._feed_price
 
                 self.status_data['last_price'] = current_price
-                self.run_step(current_price)
+                last_step = time.time()
+                self._step_in_worker(current_price)
+
+            except Exception as e:
+                self.log(f"[主循环异常] {e}")
+                waited = False
+
+            # 订阅共享行情时由价格推送驱动，不再固定休眠
+            if not waited:
+                time.sleep(1)
 
+        self._unsubscribe_feed()
+
+    # --- 异步执行模式 ---
+    async def _next_price_async(self):
+        """等待下一个价格: 共享行情推送 / 模拟随机游走 (最多等 1 秒)，推送过期时直接 await 异步客户端取价"""
+        current_price = self.status_data['last_price']
+        try:
+            await asyncio.wait_for(self._async_price_event.wait(), timeout=1)
+        except asyncio.TimeoutError:
+            pass
+        self._async_price_event.clear()
+        if not self.running or self.paused:
+            return current_price
+
+        if not (self.exchange and self.exchange.apiKey):
+            return self._sim_next_price(current_price)
+
+        if self._feed_callback and self._feed_price is not None \
+                and time.time() - self._feed_price_at <= self.feed_stale_seconds:
+            return self._feed_price
+        try:
+            ticker = await self.exchange.client.fetch_ticker(self.market_symbol)
+            return float(ticker['last'])
+        except Exception as e:
+            self.log(f"[价格获取失败] {e}，使用上次价格继续")
+            return current_price
+
+    async def _main_loop_async(self):
+        """事件驱动主循环: 等价格事件而非固定休眠；run_step (同步 Mixin 逻辑) 交给共享步进线程池执行"""
+        self._async_price_event = asyncio.Event()
+        if self._feed_price is not None:
+            self._async_price_event.set()
+        last_step = 0
+        while self.running:
+            try:
+                current_price = await self._next_price_async()
+                if not self.running: break
+                if self.paused: continue
+
+                # 推送过快时限制步进频率 (run_step 内含订单状态查询)
+                elapsed = time.time() - last_step
+                if elapsed < self.min_step_interval:
+                    await asyncio.sleep(self.min_step_interval - elapsed)
+
+                self.status_data['last_price'] = current_price
+                last_step = time.time()
+                await AsyncRuntime.run_blocking(self._step_in_worker, current_price)
             except Exception as e:
                 self.log(f"[主循环异常] {e}")
+                await asyncio.sleep(1)
+
+        self._async_price_event = None
+        self._unsubscribe_feed()
 
-            time.sleep(1)
+    async def _initialize_and_run_async(self):
+        # 初始化 (含挂单墙) 为同步 Mixin 逻辑，放到线程池执行，不阻塞事件循环
+        if await AsyncRuntime.run_blocking(self._initialize):
+            await self._main_loop_async()
 
     def _initialize_and_run(self):
+        if self._initialize():
+            self._main_loop()
+
+    def _initialize(self):
         self.log("[系统] 正在后台初始化交易所、账户和网格...")
 
         try:
@@ -173,11 +353,14 @@ class FutureGridBot(FutureGridInitMixin, FutureGridCalcMixin, FutureGridRiskMixi
             # [修改] 移除旧的 run_step 初始化调用，防止逻辑重叠
             # 建仓工作交由后续的 Watchdog 自动接管
 
-            self._main_loop()
+            if self.exchange and self.exchange.apiKey:
+                self._subscribe_feed()
+            return True
 
         except Exception as e:
             self.log(f"[初始化严重错误] {e}，策略无法启动")
             self.running = False
+            return False
 
     def start(self):
         if self.running:
@@ -190,8 +373,12 @@ class FutureGridBot(FutureGridInitMixin, FutureGridCalcMixin, FutureGridRiskMixi
         self.force_sync = True
         self.last_grid_idx = -1
 
-        self.worker_thread = threading.Thread(target=self._initialize_and_run, daemon=True)
-        self.worker_thread.start()
+        if self.async_mode:
+            # 多个机器人共用同一个事件循环，不再各占一个常驻线程
+            self._task = AsyncRuntime.spawn(self._initialize_and_run_async())
+        else:
+            self.worker_thread = threading.Thread(target=self._initialize_and_run, daemon=True)
+            self.worker_thread.start()
 
         self.log("[系统] 启动命令已接收，后台线程正在初始化（不会阻塞界面）")
 
@@ -217,9 +404,21 @@ class FutureGridBot(FutureGridInitMixin, FutureGridCalcMixin, FutureGridRiskMixi
         self.running = False 
         self.start_time = None 
         self.paused = False
-
-        if self.worker_thread and self.worker_thread.is_alive():
+        self._unsubscribe_feed()
+        self._price_event.set()
+        if self._async_price_event is not None:
+            AsyncRuntime.call_soon(self._async_price_event.set)
+
+        # 由策略自身 (如纠偏失败) 触发停止时不能等待自己
+        in_own_step = threading.current_thread() is self._step_thread
+        if self.worker_thread and self.worker_thread.is_alive() and not in_own_step \
+                and threading.current_thread() is not self.worker_thread:
             self.worker_thread.join(timeout=15)
+        if self._task and not self._task.done() and not in_own_step:
+            try:
+                self._task.result(timeout=15)
+            except Exception:
+                pass
 
         if self.exchange and self.exchange.apiKey:
             try:
@@ -238,4 +437,4 @@ class FutureGridBot(FutureGridInitMixin, FutureGridCalcMixin, FutureGridRiskMixi
                 self.log(f"[停止过程出错] {e}")
         else:
             self.status_data['current_pos'] = 0
-            self.log("[模拟] 已重置虚拟持仓")
\ No newline at end of file
+            self.log("[模拟] 已重置虚拟持仓")
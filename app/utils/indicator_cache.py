@@ -0,0 +1,175 @@
+# app/utils/indicator_cache.py
+# ---------------------------------------
+# 指标结果缓存: 位于 fetch_ohlcv 与指标计算之间的记忆化层
+# ---------------------------------------
+import threading
+from collections import OrderedDict
+
+from app.utils.indicators import StreamingRSI, StreamingSMI, batch_indicator_states, pad_series
+
+
+class _Entry:
+    """单个行情序列 (source, symbol, tf) 的缓存条目"""
+    __slots__ = ('rsi_stream', 'smi_stream', 'window_start', 'closed_ts', 'closed_close', 'live', 'result')
+
+    def __init__(self):
+        self.rsi_stream = StreamingRSI()
+        self.smi_stream = StreamingSMI()
+        self.window_start = None  # 流式状态的起点 (窗口第一根 K 线时间戳)
+        self.closed_ts = None     # 已收盘前缀的最后一根时间戳
+        self.closed_close = None  # 该根的收盘价 (用于识别交易所修订)
+        self.live = None          # 最近一次计算时的 (ts, close)
+        self.result = (None, None, None)
+
+
+class IndicatorCache:
+    """
+    按 (source, symbol, tf) 缓存流式指标状态，并以最后一根已收盘 K 线时间戳判断命中:
+    - 命中 (hit): 窗口起点与已收盘前缀都未变，仅把未收盘 K 线折算进来 (O(1))；
+      若未收盘 K 线也没变，直接返回上次结果；
+    - 未命中 (miss): 新 K 线收盘 / 修订 / 首次出现，交由流式引擎增量推进或重新播种。
+    结果与对同一窗口调用 calculate_rsi / calculate_smi 逐位相同: 窗口起点不变时 (历史不足 500 根)
+    流式引擎直接接续；滚动窗口的起点前移后从新起点重新递推 (每根新 K 线 O(窗口)，盘中 tick 仍为 O(1))。
+    条目按 LRU 淘汰，监控列表移除的品种可通过 retain() 主动清理。
+    compute_many() 一次处理整轮监控列表: 需要整段播种的序列较多时 (冷启动 / 切换数据源或周期)，
+    由向量化批量引擎一次算出所有序列的递推状态，流式引擎只接续最后几根。
+    """
+
+    # 需要整段播种的序列达到该数量时改用批量引擎 (500 根 K 线下约 8 条起比逐条递推快)
+    BATCH_SEED_MIN = 8
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def compute(self, source, symbol, tf, ohlcv):
+        """返回 (rsi, smi, sig)；ohlcv 为 ccxt 格式、按时间升序的 K 线列表"""
+        if not ohlcv:
+            return None, None, None
+
+        with self._lock:
+            return self._compute(self._entry((source, symbol, tf)), ohlcv)
+
+    def is_warm(self, source, symbol, tf):
+        """该序列是否已有流式状态 (下一次 compute 通常只需接续最新 K 线)"""
+        with self._lock:
+            entry = self._entries.get((source, symbol, tf))
+            return entry is not None and entry.closed_ts is not None
+
+    def compute_many(self, source, requests):
+        """
+        批量版 compute: requests = [(symbol, tf, ohlcv), ...]，返回 {(symbol, tf): (rsi, smi, sig)}
+        需要整段播种的序列不少于 BATCH_SEED_MIN 条时先批量播种，其余与 compute 相同
+        """
+        results = {}
+        with self._lock:
+            pending = []
+            for symbol, tf, ohlcv in requests:
+                if not ohlcv:
+                    results[(symbol, tf)] = (None, None, None)
+                    continue
+                pending.append((symbol, tf, ohlcv, self._entry((source, symbol, tf))))
+
+            cold = [(entry, ohlcv) for _, _, ohlcv, entry in pending
+                    if len(ohlcv) > 3 and self._needs_reseed(entry, ohlcv)]
+            if len(cold) >= self.BATCH_SEED_MIN:
+                self._batch_seed(cold)
+
+            for symbol, tf, ohlcv, entry in pending:
+                results[(symbol, tf)] = self._compute(entry, ohlcv)
+        return results
+
+    def _batch_seed(self, cold):
+        """
+        批量播种: 对每条序列除最后 3 根以外的前缀一次算出递推状态，倒数第 3 根作为未收盘 K 线接入，
+        随后的 _compute (未命中路径) 只需流式推进最后几根，结果与逐根 feed 逐位相同
+        """
+        rsi_stream, smi_stream = cold[0][0].rsi_stream, cold[0][0].smi_stream
+        closes = pad_series([[row[4] for row in ohlcv[:-3]] for _, ohlcv in cold])
+        _, _, _, rsi_states, smi_states = batch_indicator_states(
+            closes, rsi_stream.period, smi_stream.long_len, smi_stream.short_len, smi_stream.sig_len)
+        for (entry, ohlcv), rsi_state, smi_state in zip(cold, rsi_states, smi_states):
+            ts, close = ohlcv[-3][0], ohlcv[-3][4]
+            entry.rsi_stream.seed(rsi_state, ts, close)
+            entry.smi_stream.seed(smi_state, ts, close)
+            entry.window_start = ohlcv[0][0]
+
+    @staticmethod
+    def _needs_reseed(entry, ohlcv):
+        """窗口起点已移动 (或尚无状态): 需要从 ohlcv[0] 起整段重新递推"""
+        return entry.window_start != ohlcv[0][0] or entry.rsi_stream.needs_reseed(ohlcv)
+
+    def _entry(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = _Entry()
+            self._entries[key] = entry
+            self._evict_overflow()
+        else:
+            self._entries.move_to_end(key)
+        return entry
+
+    def _compute(self, entry, ohlcv):
+        live_ts, live_close = ohlcv[-1][0], ohlcv[-1][4]
+        if len(ohlcv) > 1:
+            closed_ts, closed_close = ohlcv[-2][0], ohlcv[-2][4]
+        else:
+            closed_ts, closed_close = None, None
+
+        if (entry.closed_ts is not None
+                and ohlcv[0][0] == entry.window_start
+                and closed_ts == entry.closed_ts
+                and closed_close == entry.closed_close):
+            self.hits += 1
+            if entry.live == (live_ts, live_close):
+                return entry.result
+            rsi = entry.rsi_stream.update(live_ts, live_close)
+            smi, sig = entry.smi_stream.update(live_ts, live_close)
+        else:
+            self.misses += 1
+            if self._needs_reseed(entry, ohlcv):
+                entry.rsi_stream.reset()
+                entry.smi_stream.reset()
+                entry.window_start = ohlcv[0][0]
+            rsi = entry.rsi_stream.feed(ohlcv)
+            smi, sig = entry.smi_stream.feed(ohlcv)
+            entry.closed_ts = closed_ts
+            entry.closed_close = closed_close
+
+        entry.live = (live_ts, live_close)
+        entry.result = (rsi, smi, sig)
+        return entry.result
+
+    def retain(self, keys):
+        """只保留指定的 (source, symbol, tf) 条目 (监控列表变化时调用)"""
+        keep = set(keys)
+        with self._lock:
+            for key in list(self._entries.keys()):
+                if key not in keep:
+                    del self._entries[key]
+                    self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 4) if total else 0
+            }
+
+    def _evict_overflow(self):
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
@@ -2,6 +2,171 @@
 # ---------------------------------------
 # 专门负责数学计算的模块
 # ---------------------------------------
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+# ---------------------------------------
+# 向量化批量引擎: 一次计算 (品种 × K线) 矩阵
+# ---------------------------------------
+# 约定:
+# - 输入为二维数组，每行一个品种的收盘价序列，右对齐；
+#   长度不足的行在左侧用 NaN 填充 (见 pad_series)。
+# - 递归只在时间维度循环 (O(bars) 次 Python 迭代)，品种维度完全向量化，
+#   因此解释器开销不随监控品种数线性增长。
+# - 逐元素运算顺序与原纯 Python 实现一致，结果逐位相同。
+# - 单条序列时批量引擎的 numpy 开销远大于收益，单品种接口走下方的纯 Python 实现；
+#   监控线程在多个品种需要 (重新) 播种流式状态时调用 batch_indicator_states 一次算完。
+
+def pad_series(series_list):
+    """将若干条不等长序列右对齐为 NaN 左填充的二维数组"""
+    width = max((len(s) for s in series_list), default=0)
+    matrix = np.full((len(series_list), width), np.nan)
+    for row, series in enumerate(series_list):
+        if len(series):
+            matrix[row, width - len(series):] = series
+    return matrix
+
+
+def _as_matrix(closes):
+    matrix = np.asarray(closes, dtype=float)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    return matrix
+
+
+def _valid_counts(matrix):
+    return np.count_nonzero(~np.isnan(matrix), axis=1)
+
+
+def batch_ema(matrix, period):
+    """逐行 EMA (首个有效值播种，与 TradingView 递归逻辑一致)"""
+    matrix = _as_matrix(matrix)
+    alpha = 2 / (period + 1)
+    out = np.full(matrix.shape, np.nan)
+    prev = np.full(matrix.shape[0], np.nan)
+    for t in range(matrix.shape[1]):
+        price = matrix[:, t]
+        prev = np.where(np.isnan(prev), price, (price * alpha) + (prev * (1 - alpha)))
+        out[:, t] = prev
+    return out
+
+
+def batch_rsi(closes, period=14):
+    """逐行 RSI (Wilder 平滑)，数据不足的行返回 NaN"""
+    return _rsi_core(closes, period)[0]
+
+
+def _rsi_core(closes, period):
+    """返回 (rsi, 递推末状态 (seen, gain_sum, loss_sum, avg_gain, avg_loss))"""
+    matrix = _as_matrix(closes)
+    rows = matrix.shape[0]
+    changes = np.diff(matrix, axis=1)
+    gains = np.maximum(changes, 0)
+    losses = np.maximum(-changes, 0)
+
+    seen = np.zeros(rows, dtype=int)
+    gain_sum = np.zeros(rows)
+    loss_sum = np.zeros(rows)
+    avg_gain = np.full(rows, np.nan)
+    avg_loss = np.full(rows, np.nan)
+
+    for t in range(changes.shape[1]):
+        valid = ~np.isnan(changes[:, t])
+        seen = seen + valid
+        seeding = valid & (seen <= period)
+        gain_sum = np.where(seeding, gain_sum + gains[:, t], gain_sum)
+        loss_sum = np.where(seeding, loss_sum + losses[:, t], loss_sum)
+
+        seeded = valid & (seen == period)
+        avg_gain = np.where(seeded, gain_sum / period, avg_gain)
+        avg_loss = np.where(seeded, loss_sum / period, avg_loss)
+
+        smoothing = valid & (seen > period)
+        avg_gain = np.where(smoothing, (avg_gain * (period - 1) + gains[:, t]) / period, avg_gain)
+        avg_loss = np.where(smoothing, (avg_loss * (period - 1) + losses[:, t]) / period, avg_loss)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = np.where(avg_loss == 0, 100.0, 100 - (100 / (1 + avg_gain / avg_loss)))
+    rsi[_valid_counts(matrix) < period + 1] = np.nan
+    return rsi, (seen, gain_sum, loss_sum, avg_gain, avg_loss)
+
+
+def batch_smi(closes, long_len=20, short_len=5, sig_len=5):
+    """
+    逐行 SMI Ergodic (TradingView 对齐版)
+    返回 (tsi, signal) 两个一维数组，数据不足的行为 NaN
+    """
+    return _smi_core(closes, long_len, short_len, sig_len)[:2]
+
+
+def _smi_core(closes, long_len, short_len, sig_len):
+    """返回 (tsi, signal, 递推末状态 (pc_long, pc_short, apc_long, apc_short, signal))"""
+    matrix = _as_matrix(closes)
+    changes = np.diff(matrix, axis=1)
+
+    # 分子: EMA(EMA(change, long), short) / 分母: EMA(EMA(|change|, long), short)
+    pc_long = batch_ema(changes, long_len)
+    pc_short = batch_ema(pc_long, short_len)
+    apc_long = batch_ema(np.abs(changes), long_len)
+    apc_short = batch_ema(apc_long, short_len)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tsi_series = np.where(apc_short == 0, 0.0, pc_short / apc_short)
+    tsi_series[np.isnan(apc_short)] = np.nan
+    signal_series = batch_ema(tsi_series, sig_len)
+
+    if matrix.shape[1] < 2:
+        empty = np.full(matrix.shape[0], np.nan)
+        return empty, empty.copy(), (empty,) * 5
+
+    tsi = tsi_series[:, -1].copy()
+    signal = signal_series[:, -1].copy()
+    short_rows = _valid_counts(matrix) < long_len + short_len + sig_len + 50
+    tsi[short_rows] = np.nan
+    signal[short_rows] = np.nan
+    state = (pc_long[:, -1], pc_short[:, -1], apc_long[:, -1], apc_short[:, -1], signal_series[:, -1])
+    return tsi, signal, state
+
+
+def batch_indicators(closes, rsi_period=14, long_len=20, short_len=5, sig_len=5):
+    """一次性计算所有行的 (rsi, tsi, signal)"""
+    return batch_indicator_states(closes, rsi_period, long_len, short_len, sig_len)[:3]
+
+
+def batch_indicator_states(closes, rsi_period=14, long_len=20, short_len=5, sig_len=5):
+    """
+    同 batch_indicators，另返回每行递推的末状态 (StreamingRSI / StreamingSMI 的状态元组格式)，
+    供流式引擎批量播种: 返回 (rsi, tsi, signal, rsi_states, smi_states)
+    """
+    matrix = _as_matrix(closes)
+    rsi, (seen, gain_sum, loss_sum, avg_gain, avg_loss) = _rsi_core(matrix, rsi_period)
+    tsi, signal, smi_state = _smi_core(matrix, long_len, short_len, sig_len)
+
+    valid = ~np.isnan(matrix)
+    counts = np.count_nonzero(valid, axis=1)
+    # 每行最后一个有效收盘价 (右对齐，即最后一列；空行为 NaN)
+    last_close = matrix[:, -1] if matrix.shape[1] else np.full(matrix.shape[0], np.nan)
+
+    rsi_states, smi_states = [], []
+    for row in range(matrix.shape[0]):
+        if not counts[row]:
+            rsi_states.append((None, 0, 0, 0, None, None))
+            smi_states.append((None, 0, None, None, None, None, None))
+            continue
+        close = float(last_close[row])
+        rsi_states.append((close, int(seen[row]), float(gain_sum[row]), float(loss_sum[row]),
+                           _to_scalar(avg_gain[row]), _to_scalar(avg_loss[row])))
+        smi_states.append((close, int(counts[row])) + tuple(_to_scalar(col[row]) for col in smi_state))
+    return rsi, tsi, signal, rsi_states, smi_states
+
+
+def _to_scalar(value):
+    return None if np.isnan(value) else float(value)
+
+# ---------------------------------------
+# 单品种接口 (逐根纯 Python 递推；单条序列时比构造批量矩阵快一个数量级)
+# ---------------------------------------
 
 def calculate_ema_series(series, period):
     """计算 EMA 序列 (递归算法)"""
@@ -83,4 +248,239 @@ def calculate_smi(prices, long_len=20, short_len=5, sig_len=5):
     if not signal_series: return None, None
     
     # 返回最新的两个值
-    return tsi_series[-1], signal_series[-1]
\ No newline at end of file
+    return tsi_series[-1], signal_series[-1]
+
+
+# ---------------------------------------
+# 流式 (增量) 指标引擎: 每根 K 线 O(1) 更新
+# ---------------------------------------
+# 说明:
+# - 已收盘 K 线的递归状态 (EMA / Wilder) 被"提交"后不再重算；
+# - 未收盘 K 线 (live) 只做试算 (peek)，不污染已提交状态，可被反复修正；
+# - 运算顺序与上方批量函数逐项一致，因此从同一根 K 线开始喂入时，输出与批量函数逐位相同；
+# - 递归指标依赖起点: 对滚动窗口 (如监控线程的最近 500 根) 要与批量函数一致，
+#   窗口起点移动后必须从新起点重新喂入 (见 IndicatorCache)，不能在旧状态上接续。
+
+class StreamingEMA:
+    """单条 EMA 的递归状态 (与 calculate_ema_series 相同的首值播种方式)"""
+
+    def __init__(self, period):
+        self.period = period
+        self.alpha = 2 / (period + 1)
+        self.value = None
+
+    def peek(self, price):
+        """试算: 返回加入 price 后的 EMA，但不修改状态"""
+        if self.value is None:
+            return price
+        return (price * self.alpha) + (self.value * (1 - self.alpha))
+
+
+class _StreamingIndicator(ABC):
+    """
+    流式指标基类：负责 K 线时间戳管理
+    - update(ts, close): 同一 ts 视为未收盘 K 线修正；更大的 ts 表示上一根已收盘
+    - 支持修正"最近一根已提交 K 线" (交易所事后修订收盘价时)，仍为 O(1)
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self._state = self._initial_state()
+        self._prev_state = None      # 最近一次提交前的状态快照 (用于回滚修订)
+        self._committed_ts = None    # 最近一根已提交 K 线的时间戳
+        self._committed_close = None
+        self._live_ts = None
+        self._live_close = None
+        self.value = self._empty_value()
+
+    @property
+    def last_ts(self):
+        return self._live_ts if self._live_ts is not None else self._committed_ts
+
+    def update(self, ts, close):
+        """喂入一根 K 线 (新 K 线或未收盘 K 线的修正)，返回最新指标值"""
+        if self._live_ts is not None and ts == self._live_ts:
+            # 未收盘 K 线修正: 仅替换试算输入
+            self._live_close = close
+        elif self._live_ts is None or ts > self._live_ts:
+            # 新 K 线: 上一根 live 收盘，提交其状态
+            if self._live_ts is not None:
+                self._prev_state = self._state
+                self._state = self._commit(self._state, self._live_close)
+                self._committed_ts = self._live_ts
+                self._committed_close = self._live_close
+            self._live_ts = ts
+            self._live_close = close
+        elif ts == self._committed_ts:
+            # 已提交 K 线被交易所修订: 回滚一步后重新提交
+            if close != self._committed_close and self._prev_state is not None:
+                self._state = self._commit(self._prev_state, close)
+                self._committed_close = close
+            return self.value
+        else:
+            # 更早的 K 线无法 O(1) 修正，交由调用方重新播种
+            raise ValueError(f"K 线时间戳回退: {ts} < {self._committed_ts}")
+
+        self.value = self._evaluate(self._state, self._live_close)
+        return self.value
+
+    def seed(self, state, ts, close):
+        """
+        以外部算出的递推状态 (batch_indicator_states) 作为已提交前缀，ts / close 为紧随其后的一根 K 线 (视为未收盘)
+        之后的 feed 只需从该根起接续，免去整段逐根递推
+        """
+        self.reset()
+        self._state = state
+        self._live_ts = ts
+        self._live_close = close
+        self.value = self._evaluate(state, close)
+
+    def needs_reseed(self, ohlcv):
+        """feed(ohlcv) 是否会整体重新播种 (尚无状态，或与已有状态无重叠)"""
+        anchor = self._committed_ts if self._committed_ts is not None else self._live_ts
+        return anchor is None or ohlcv[0][0] > anchor
+
+    def feed(self, ohlcv):
+        """
+        批量喂入 ccxt 格式 K 线 [[ts, o, h, l, c, v], ...]
+        只处理 >= 最近已提交时间戳的部分；若与已有状态无重叠 (断档) 则整体重新播种
+        """
+        if not ohlcv:
+            return self.value
+
+        if self.needs_reseed(ohlcv):
+            self.reset()
+            rows = ohlcv
+        else:
+            anchor = self._committed_ts if self._committed_ts is not None else self._live_ts
+            # 从尾部回扫，只取新增部分 (通常仅 1~2 根)
+            start = len(ohlcv)
+            while start > 0 and ohlcv[start - 1][0] >= anchor:
+                start -= 1
+            rows = ohlcv[start:]
+
+        for row in rows:
+            self.update(row[0], row[4])
+        return self.value
+
+    # --- 子类实现 ---
+    @abstractmethod
+    def _initial_state(self):
+        """空状态"""
+
+    def _empty_value(self):
+        return None
+
+    @abstractmethod
+    def _commit(self, state, close):
+        """将一根已收盘 K 线计入状态，返回新状态"""
+
+    @abstractmethod
+    def _evaluate(self, state, close):
+        """以 close 作为未收盘 K 线试算指标值 (不修改状态)"""
+
+
+class StreamingRSI(_StreamingIndicator):
+    """流式 RSI (Wilder 平滑)，与对同一段完整序列调用 calculate_rsi 的结果一致"""
+
+    def __init__(self, period=14):
+        self.period = period
+        super().__init__()
+
+    def _initial_state(self):
+        # (上一收盘价, 已有涨跌数, 播种期涨幅和, 播种期跌幅和, avg_gain, avg_loss)
+        return (None, 0, 0, 0, None, None)
+
+    def _step(self, state, close):
+        prev_close, count, gain_sum, loss_sum, avg_gain, avg_loss = state
+        if prev_close is None:
+            return (close, 0, 0, 0, None, None)
+
+        change = close - prev_close
+        gain = max(change, 0)
+        loss = max(-change, 0)
+        count += 1
+
+        if count <= self.period:
+            gain_sum = gain_sum + gain
+            loss_sum = loss_sum + loss
+            if count == self.period:
+                avg_gain = gain_sum / self.period
+                avg_loss = loss_sum / self.period
+        else:
+            avg_gain = (avg_gain * (self.period - 1) + gain) / self.period
+            avg_loss = (avg_loss * (self.period - 1) + loss) / self.period
+
+        return (close, count, gain_sum, loss_sum, avg_gain, avg_loss)
+
+    def _commit(self, state, close):
+        return self._step(state, close)
+
+    def _evaluate(self, state, close):
+        _, count, _, _, avg_gain, avg_loss = self._step(state, close)
+        if count < self.period: return None
+        if avg_loss == 0: return 100
+        return 100 - (100 / (1 + avg_gain / avg_loss))
+
+
+class StreamingSMI(_StreamingIndicator):
+    """流式 SMI Ergodic (TSI + Signal)，与对同一段完整序列调用 calculate_smi 的结果一致"""
+
+    def __init__(self, long_len=20, short_len=5, sig_len=5):
+        self.long_len = long_len
+        self.short_len = short_len
+        self.sig_len = sig_len
+        self.min_bars = long_len + short_len + sig_len + 50
+        # 复用 StreamingEMA 的递推公式；状态由 _state 元组持有，便于快照回滚
+        self._ema = {
+            'pc_long': StreamingEMA(long_len),
+            'pc_short': StreamingEMA(short_len),
+            'apc_long': StreamingEMA(long_len),
+            'apc_short': StreamingEMA(short_len),
+            'signal': StreamingEMA(sig_len),
+        }
+        super().__init__()
+
+    def _initial_state(self):
+        # (上一收盘价, 已有价格数, pc_long, pc_short, apc_long, apc_short, signal)
+        return (None, 0, None, None, None, None, None)
+
+    def _empty_value(self):
+        return (None, None)
+
+    def _step(self, state, close):
+        prev_close, count, pc_long, pc_short, apc_long, apc_short, signal = state
+        if prev_close is None:
+            return (close, 1, None, None, None, None, None), None
+
+        change = close - prev_close
+        abs_change = abs(change)
+
+        ema = self._ema
+        ema['pc_long'].value = pc_long
+        ema['pc_short'].value = pc_short
+        ema['apc_long'].value = apc_long
+        ema['apc_short'].value = apc_short
+        ema['signal'].value = signal
+
+        pc_long = ema['pc_long'].peek(change)
+        pc_short = ema['pc_short'].peek(pc_long)
+        apc_long = ema['apc_long'].peek(abs_change)
+        apc_short = ema['apc_short'].peek(apc_long)
+
+        tsi = 0 if apc_short == 0 else pc_short / apc_short
+        signal = ema['signal'].peek(tsi)
+
+        return (close, count + 1, pc_long, pc_short, apc_long, apc_short, signal), tsi
+
+    def _commit(self, state, close):
+        new_state, _ = self._step(state, close)
+        return new_state
+
+    def _evaluate(self, state, close):
+        new_state, tsi = self._step(state, close)
+        if new_state[1] < self.min_bars or tsi is None:
+            return None, None
+        return tsi, new_state[6]
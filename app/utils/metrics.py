@@ -0,0 +1,177 @@
+# app/utils/metrics.py
+# ---------------------------------------
+# 轻量级延迟统计 (进程内)
+# - 每个 (指标名, 标签) 一条序列: 计数 / 总和 + 定长采样窗口 (用于 p50/p95/p99)
+# - observe 只做一次追加，分位数在导出时才计算
+# - 以 Prometheus 文本格式导出 (summary 类型)
+# ---------------------------------------
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class _Series:
+    __slots__ = ('count', 'total', 'window', 'lock')
+
+    def __init__(self, window):
+        self.count = 0
+        self.total = 0.0
+        self.window = deque(maxlen=window)
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        with self.lock:
+            self.count += 1
+            self.total += value
+            self.window.append(value)
+
+    def summary(self):
+        with self.lock:
+            values = sorted(self.window)
+            count, total = self.count, self.total
+        if not values:
+            return count, total, {}
+        n = len(values)
+        return count, total, {q: values[min(int(q * n), n - 1)] for q in QUANTILES}
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Metrics:
+    PREFIX = 'myquantbot_'
+    WINDOW = 1024          # 每条序列保留的最近样本数
+
+    # 交易所客户端上被计时的方法
+    EXCHANGE_METHODS = (
+        'load_markets', 'fetch_ticker', 'fetch_tickers', 'fetch_ohlcv',
+        'create_order', 'create_orders', 'cancel_order', 'cancel_orders', 'cancel_all_orders',
+        'fetch_order', 'fetch_open_orders', 'fetch_my_trades',
+        'fetch_positions', 'fetch_balance', 'fetch_funding_rate', 'set_leverage',
+    )
+
+    _series = {}           # { (name, labels): _Series }
+    _counters = {}         # { (name, labels): int }
+    _help = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def describe(cls, name, text):
+        cls._help[name] = text
+
+    @classmethod
+    def observe(cls, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        series = cls._series.get(key)
+        if series is None:
+            with cls._lock:
+                series = cls._series.setdefault(key, _Series(cls.WINDOW))
+        series.observe(seconds)
+
+    @classmethod
+    def inc(cls, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with cls._lock:
+            cls._counters[key] = cls._counters.get(key, 0) + amount
+
+    @classmethod
+    @contextmanager
+    def timer(cls, name, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            cls.observe(name, time.perf_counter() - t0, **labels)
+
+    @classmethod
+    def instrument(cls, client):
+        """为 ccxt 客户端的主要接口挂上计时 (按 交易所 / 方法 / 品种 分组)"""
+        for method_name in cls.EXCHANGE_METHODS:
+            method = getattr(client, method_name, None)
+            if method is None: continue
+            setattr(client, method_name, cls._timed(method, client.id, method_name))
+        return client
+
+    @classmethod
+    def _timed(cls, method, exchange_id, method_name):
+        def label_of(args, kwargs):
+            symbol = kwargs.get('symbol')
+            if symbol is None:
+                # fetch_order / cancel_order 的品种是第二个参数
+                for arg in args[:2]:
+                    if isinstance(arg, str) and '/' in arg:
+                        symbol = arg
+                        break
+            return {'exchange': exchange_id, 'method': method_name, 'symbol': symbol or ''}
+
+        if asyncio.iscoroutinefunction(method):
+            async def timed(*args, **kwargs):
+                labels = label_of(args, kwargs)
+                t0 = time.perf_counter()
+                try:
+                    return await method(*args, **kwargs)
+                except Exception:
+                    cls.inc('exchange_errors_total', **labels)
+                    raise
+                finally:
+                    cls.observe('exchange_request_seconds', time.perf_counter() - t0, **labels)
+        else:
+            def timed(*args, **kwargs):
+                labels = label_of(args, kwargs)
+                t0 = time.perf_counter()
+                try:
+                    return method(*args, **kwargs)
+                except Exception:
+                    cls.inc('exchange_errors_total', **labels)
+                    raise
+                finally:
+                    cls.observe('exchange_request_seconds', time.perf_counter() - t0, **labels)
+        timed.__name__ = method.__name__
+        return timed
+
+    @classmethod
+    def render(cls):
+        """导出为 Prometheus 文本格式"""
+        lines = []
+        by_name = {}
+        for (name, labels), series in list(cls._series.items()):
+            by_name.setdefault(name, []).append((labels, series))
+
+        for name in sorted(by_name):
+            full = cls.PREFIX + name
+            if name in cls._help:
+                lines.append(f"# HELP {full} {cls._help[name]}")
+            lines.append(f"# TYPE {full} summary")
+            for labels, series in sorted(by_name[name], key=lambda x: x[0]):
+                count, total, quantiles = series.summary()
+                base = ','.join(f'{k}="{_escape(v)}"' for k, v in labels)
+                sep = ',' if base else ''
+                for q, v in quantiles.items():
+                    lines.append(f'{full}{{{base}{sep}quantile="{q}"}} {v:.6f}')
+                lines.append(f'{full}_sum{{{base}}} {total:.6f}')
+                lines.append(f'{full}_count{{{base}}} {count}')
+
+        counters = {}
+        for (name, labels), value in list(cls._counters.items()):
+            counters.setdefault(name, []).append((labels, value))
+        for name in sorted(counters):
+            full = cls.PREFIX + name
+            if name in cls._help:
+                lines.append(f"# HELP {full} {cls._help[name]}")
+            lines.append(f"# TYPE {full} counter")
+            for labels, value in sorted(counters[name]):
+                base = ','.join(f'{k}="{_escape(v)}"' for k, v in labels)
+                lines.append(f'{full}{{{base}}} {value}')
+
+        return "\n".join(lines) + "\n"
+
+
+Metrics.describe('exchange_request_seconds', 'Exchange REST call latency (including rate-limit wait)')
+Metrics.describe('exchange_errors_total', 'Exchange REST calls that raised')
+Metrics.describe('indicator_compute_seconds', 'RSI/SMI computation time per symbol')
+Metrics.describe('indicator_batch_seconds', 'RSI/SMI computation time per cold-start batch (all symbols)')
@@ -1,31 +1,204 @@
+import heapq
+import itertools
+import queue
+import threading
+import time
 import requests
 import logging
 
-def send_message(config, message):
-    """
-    通用消息发送器
-    :param config: 包含 notification 配置的字典
-    :param message: 要发送的文本
-    """
+# 各渠道单条消息长度上限
+_MAX_LEN = {'telegram': 4000, 'discord': 1900}
+
+
+def _resolve_targets(config):
+    """从配置中解析出发送目标 [(channel, url, payload_key, extra), ...]"""
     notify_cfg = config.get('notification', {})
-    
+    targets = []
+
     # 1. Telegram
     tg_token = notify_cfg.get('tg_token')
     tg_chat_id = notify_cfg.get('tg_chat_id')
     if tg_token and tg_chat_id:
-        try:
-            url = f"https://api.telegram.org/bot{tg_token}/sendMessage"
-            requests.post(url, json={'chat_id': tg_chat_id, 'text': message}, timeout=5)
-        except Exception as e:
-            logging.error(f"[Notifier] TG 发送失败: {e}")
+        url = f"https://api.telegram.org/bot{tg_token}/sendMessage"
+        targets.append(('telegram', url, 'text', (('chat_id', tg_chat_id),)))
 
     # 2. Discord
     discord_url = notify_cfg.get('discord_webhook')
     if discord_url:
+        targets.append(('discord', discord_url, 'content', ()))
+
+    return tuple(targets)
+
+
+def _split(text, limit):
+    return [text[i:i + limit] for i in range(0, len(text), limit)] or [text]
+
+
+class NotificationDispatcher:
+    """
+    后台消息派发器
+    - 热路径 (send_message) 只做入队，不做任何网络 IO
+    - 每个渠道一个长连接 Session，按渠道限速
+    - 短时间内的多条消息合并为一条发送；失败按指数退避重试
+    - 限速等待与重试均为按到期时间重新排期 (不在派发线程上休眠)，单个渠道故障不阻塞其它渠道
+    """
+    QUEUE_SIZE = 200
+    BATCH_WINDOW = 2.0                                  # 合并窗口 (秒)
+    MAX_RETRIES = 3
+    MIN_INTERVAL = {'telegram': 1.0, 'discord': 0.5}    # 同一目标两次发送的最小间隔 (秒)
+
+    _queue = queue.Queue(maxsize=QUEUE_SIZE)
+    _pending = []        # 待发送 / 待重试的消息堆: (到期时间, 序号, target, text, 已重试次数)
+    _seq = itertools.count()
+    _sessions = {}
+    _last_sent = {}
+    _thread = None
+    _lock = threading.Lock()
+    stats = {"queued": 0, "sent": 0, "merged": 0, "dropped": 0, "retried": 0, "failed": 0}
+
+    @classmethod
+    def enqueue(cls, config, message):
+        targets = _resolve_targets(config)
+        if not targets:
+            return
+        cls._ensure_worker()
         try:
-            requests.post(discord_url, json={'content': message}, timeout=5)
+            cls._queue.put_nowait((targets, message))
+            cls.stats["queued"] += 1
+        except queue.Full:
+            cls.stats["dropped"] += 1
+            logging.error("[Notifier] 发送队列已满，消息被丢弃")
+
+    @classmethod
+    def _ensure_worker(cls):
+        if cls._thread and cls._thread.is_alive():
+            return
+        with cls._lock:
+            if cls._thread and cls._thread.is_alive():
+                return
+            cls._thread = threading.Thread(target=cls._run, daemon=True, name="notifier")
+            cls._thread.start()
+
+    @classmethod
+    def _run(cls):
+        while True:
+            try:
+                batch = cls._collect()
+
+                # 按目标分组，同一目标的消息合并为一条
+                grouped = {}
+                for targets, message in batch:
+                    for target in targets:
+                        grouped.setdefault(target, []).append(message)
+
+                for target, messages in grouped.items():
+                    if len(messages) > 1:
+                        cls.stats["merged"] += len(messages) - 1
+                    text = "\n\n".join(messages)
+                    for chunk in _split(text, _MAX_LEN.get(target[0], 2000)):
+                        cls._schedule(target, chunk)
+
+                cls._send_due()
+            except Exception as e:
+                logging.error(f"[Notifier] 派发线程异常: {e}")
+
+    @classmethod
+    def _collect(cls):
+        """等待新消息 (最多等到最早一条待发消息到期)，收到后在合并窗口内收集突发的后续消息"""
+        try:
+            first = cls._queue.get(timeout=cls._until_next_due())
+        except queue.Empty:
+            return []
+        batch = [first]
+
+        # 合并窗口: 收集突发的后续消息 (待发消息到期时提前结束)
+        deadline = time.time() + cls.BATCH_WINDOW
+        while True:
+            remaining = deadline - time.time()
+            next_due = cls._until_next_due()
+            if next_due is not None:
+                remaining = min(remaining, next_due)
+            if remaining <= 0:
+                break
+            try:
+                batch.append(cls._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    @classmethod
+    def _until_next_due(cls):
+        if not cls._pending:
+            return None
+        return max(cls._pending[0][0] - time.time(), 0)
+
+    @classmethod
+    def _schedule(cls, target, text, attempt=0, due=None):
+        heapq.heappush(cls._pending, (due or time.time(), next(cls._seq), target, text, attempt))
+
+    @classmethod
+    def _send_due(cls):
+        """发送所有已到期的消息；目标未到限速间隔的重新排期到可发送时间"""
+        while cls._pending and cls._pending[0][0] <= time.time():
+            _, _, target, text, attempt = heapq.heappop(cls._pending)
+            ready_at = cls._last_sent.get(target, 0) + cls.MIN_INTERVAL.get(target[0], 1.0)
+            if ready_at > time.time():
+                cls._schedule(target, text, attempt, ready_at)
+                continue
+            cls._deliver(target, text, attempt)
+
+    @classmethod
+    def _session(cls, channel):
+        session = cls._sessions.get(channel)
+        if session is None:
+            session = cls._sessions[channel] = requests.Session()
+        return session
+
+    @classmethod
+    def _deliver(cls, target, text, attempt=0):
+        """发送一次；可重试的失败按退避时间重新排期"""
+        channel, url, payload_key, extra = target
+        payload = dict(extra)
+        payload[payload_key] = text
+
+        retry_after = None
+        try:
+            resp = cls._session(channel).post(url, json=payload, timeout=5)
+            cls._last_sent[target] = time.time()
+            if resp.status_code < 400:
+                cls.stats["sent"] += 1
+                return
+            if resp.status_code == 429:
+                try:
+                    body = resp.json()
+                    retry_after = body.get('retry_after') or body.get('parameters', {}).get('retry_after')
+                except ValueError:
+                    pass
+            elif resp.status_code < 500:
+                # 4xx (配置错误等) 重试无意义
+                logging.error(f"[Notifier] {channel} 发送被拒绝: HTTP {resp.status_code}")
+                cls.stats["failed"] += 1
+                return
+            err = f"HTTP {resp.status_code}"
         except Exception as e:
-            logging.error(f"[Notifier] Discord 发送失败: {e}")
-            
+            err = e
+
+        if attempt < cls.MAX_RETRIES:
+            delay = float(retry_after) if retry_after else min(2 ** attempt, 30)
+            cls._schedule(target, text, attempt + 1, time.time() + delay)
+            cls.stats["retried"] += 1
+        else:
+            logging.error(f"[Notifier] {channel} 发送失败 (已重试 {cls.MAX_RETRIES} 次): {err}")
+            cls.stats["failed"] += 1
+
+
+def send_message(config, message):
+    """
+    通用消息发送器 (异步: 仅入队，由后台派发线程发送)
+    :param config: 包含 notification 配置的字典
+    :param message: 要发送的文本
+    """
+    NotificationDispatcher.enqueue(config, message)
+
     # 本地日志兜底
     print(f"📣 [ALERT] {message}")
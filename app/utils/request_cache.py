@@ -0,0 +1,80 @@
+# app/utils/request_cache.py
+# ---------------------------------------
+# 请求合并 (single-flight) + 短 TTL 结果缓存
+# 同一 key 的并发请求只触发一次上游调用，其余请求等待并共享结果
+# ---------------------------------------
+import threading
+import time
+from collections import OrderedDict
+
+
+class _Flight:
+    __slots__ = ('event', 'value', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlightCache:
+    def __init__(self, ttl=1.5, max_entries=256, wait_timeout=30):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.wait_timeout = wait_timeout
+        self._cache = OrderedDict()   # { key: (stored_at, value) }
+        self._flights = {}            # { key: _Flight }
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get(self, key, loader):
+        """返回缓存值；过期时由第一个请求者调用 loader()，并发的相同请求等待其结果"""
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached and time.time() - cached[0] < self.ttl:
+                self.hits += 1
+                self._cache.move_to_end(key)
+                return cached[1]
+
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            if not flight.event.wait(self.wait_timeout):
+                raise TimeoutError(f"等待上游结果超时: {key}")
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = loader()
+            with self._lock:
+                self._cache[key] = (time.time(), flight.value)
+                self._cache.move_to_end(key)
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+            return flight.value
+        except Exception as e:
+            # 失败结果不缓存，仅透传给本轮等待者
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.event.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._cache),
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced
+            }
@@ -7,4 +7,48 @@ class Config:
     # --- 行情源配置 ---
     # 可选值: 'binance', 'okx', 'coinbase'
     # 建议: 美国/合规需求选 'coinbase'；合约参考选 'okx'
-    MARKET_SOURCE = 'coinbase'
\ No newline at end of file
+    MARKET_SOURCE = 'coinbase'
+
+    # --- 行情推送模式 ---
+    # 'rest': REST 轮询 (默认，与旧版一致) | 'stream': WebSocket 推送 (ccxt.pro) | 'replay': 本地回放
+    MARKET_FEED = 'rest'
+    FEED_POLL_INTERVAL = 2           # rest 模式轮询间隔 (秒)
+    FEED_STALE_SECONDS = 10          # 推送价格超过该时长未更新则回退 REST
+    REPLAY_FILE = 'feed_replay.jsonl'
+    FEED_RECORD_FILE = None          # 设为文件路径 (如 'feed_replay.jsonl') 时录制 rest / stream 行情事件，供 replay 回放
+    REPLAY_SPEED = 1.0               # 回放倍速
+
+    # --- 行情监控并发参数 ---
+    MONITOR_WORKERS = 8      # 并发拉取线程数上限
+
+    # --- 系统资源采样 ---
+    SYS_SAMPLE_INTERVAL = 2  # psutil 采样周期 (秒)，独立于行情循环
+
+    # --- 图表接口缓存 ---
+    KLINE_CACHE_TTL = 1.5    # /api/kline 结果共享时长 (秒)
+
+    # --- 交易所共享限频 ---
+    RATE_LIMIT_BURST_SECONDS = 1.0  # 令牌桶突发容量 (按 rateLimit 折算的秒数)
+
+    # --- 合约机器人行情来源 ---
+    BOT_SHARED_FEED = False      # 默认是否订阅监控线程的价格推送 (机器人配置 shared_feed 可覆盖)
+    # 仅当监控行情源与机器人为同一交易所时生效 (机器人登记自己的合约市场，由推送层单独报价)，否则机器人自行拉取价格
+    BOT_MIN_STEP_INTERVAL = 0.5  # 推送驱动时两次步进的最短间隔 (秒)
+    ORDER_SUBMIT_WORKERS = 4     # 不支持批量下单时单个机器人同时在途的提交请求数
+    ORDER_SUBMIT_POOL_SIZE = 16  # thread 模式下所有机器人共用的提交线程池大小 (不随机器人数量增长)
+    ACCOUNT_SYNC_POOL_SIZE = 4   # thread 模式下所有机器人共用的账户查询线程池大小 (与提交线程池分开)
+    # async: 所有机器人共用一个事件循环 + ccxt 异步客户端，run_step 由共享步进线程池执行 (默认)
+    # thread: 每个机器人一个常驻线程 (机器人配置 execution_mode 可单独覆盖)
+    BOT_EXECUTION_MODE = 'async'
+    # async 模式下执行各机器人 run_step 的共享线程数。步进只在执行期间占用线程，
+    # 机器人数超过该值时排队轮流步进 (线程数固定，不随机器人数量增长)
+    BOT_STEP_WORKERS = 16
+
+    # --- 合约机器人账户数据缓存 (秒) ---
+    ACCOUNT_POSITION_TTL = 2      # 持仓 (成交后会强制刷新)
+    ACCOUNT_BALANCE_TTL = 60      # 钱包余额
+    ACCOUNT_FUNDING_TTL = 600     # 资金费率最长缓存 (另外在下次结算时间点到期)
+
+    # --- K 线本地缓存 (内存映射，重启后免重新下载历史) ---
+    # 置为 None 则仅使用内存缓存
+    OHLCV_CACHE_DIR = os.environ.get('OHLCV_CACHE_DIR') or '/opt/myquantbot/ohlcv_cache'
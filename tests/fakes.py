@@ -0,0 +1,191 @@
+# tests/fakes.py
+# ---------------------------------------
+# 测试用的内存假实现 (不访问交易所)
+# ---------------------------------------
+import asyncio
+import random
+
+import ccxt
+
+from app.strategies.future_grid_strategy import FutureGridBot
+
+
+def make_bot(**overrides):
+    config = {'symbol': 'BTC/USDT', 'lower_price': 90, 'upper_price': 110, 'grid_num': 20,
+              'amount': 1, 'active_order_limit': 3, 'strategy_type': 'neutral'}
+    config.update(overrides)
+    bot = FutureGridBot(config, lambda msg: None)
+    assert bot.generate_grids()
+    return bot
+
+
+def random_candles(n, seed, tf_ms=60000, start=0):
+    rng = random.Random(seed)
+    price, rows = 100.0, []
+    for i in range(n):
+        price += rng.uniform(-1, 1)
+        rows.append([start + i * tf_ms, price, price, price, round(price, 2), 1.0])
+    return rows
+
+
+class FakeOhlcvExchange:
+    """只提供 fetch_ohlcv 的行情源，记录每次调用的 (since, limit)"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = []
+
+    @staticmethod
+    def parse_timeframe(tf):
+        return ccxt.Exchange.parse_timeframe(tf)
+
+    def fetch_ohlcv(self, symbol, tf, since=None, limit=None):
+        self.calls.append((since, limit))
+        rows = [r for r in self.rows if since is None or r[0] >= since]
+        return [list(r) for r in (rows[-limit:] if limit else rows)]
+
+
+class FakeExchange:
+    """内存撮合的最小交易所: 限价单挂在 orders，fill() / trade() 模拟成交"""
+    id = 'fake'
+    apiKey = 'key'
+
+    def __init__(self, has=None):
+        self.has = dict(has or {})
+        self.orders = {}
+        self.trades = []
+        self.calls = []
+        self.rejected_prices = set()      # create_orders 中按单拒绝的价格
+        self.failing_batch_prices = set() # 含这些价格的 create_orders 整批报错
+        self._next_id = 0
+
+    def _tick(self):
+        self._next_id += 1
+        return self._next_id
+
+    def milliseconds(self):
+        return 0
+
+    def price_to_precision(self, symbol, price):
+        return f"{float(price):.2f}"
+
+    def amount_to_precision(self, symbol, amount):
+        return f"{float(amount):.3f}"
+
+    def create_order(self, symbol, type, side, amount, price=None, params=None):
+        self.calls.append(('create_order', float(price or 0)))
+        return self._open(side, amount, price)
+
+    def _open(self, side, amount, price):
+        order = {'id': str(self._tick()), 'side': side, 'price': float(price or 0), 'amount': float(amount),
+                 'filled': 0.0, 'status': 'open', 'timestamp': self._next_id}
+        self.orders[order['id']] = order
+        return dict(order)
+
+    def create_orders(self, orders, params=None):
+        prices = [float(o['price']) for o in orders]
+        self.calls.append(('create_orders', tuple(prices)))
+        if self.failing_batch_prices & set(prices):
+            raise ccxt.ExchangeError('batch rejected')
+        results = []
+        for o, price in zip(orders, prices):
+            if price in self.rejected_prices:
+                results.append({'id': None, 'info': {'code': -2010, 'price': price}})
+            else:
+                results.append(self._open(o['side'], o['amount'], price))
+        return results
+
+    def cancel_order(self, order_id, symbol=None):
+        self.calls.append(('cancel_order', order_id))
+        self.orders[order_id]['status'] = 'canceled'
+
+    def cancel_all_orders(self, symbol=None):
+        for order in self.orders.values():
+            if order['status'] == 'open':
+                order['status'] = 'canceled'
+
+    def fetch_open_orders(self, symbol=None):
+        return [dict(o) for o in self.orders.values() if o['status'] == 'open']
+
+    def fetch_order(self, order_id, symbol=None):
+        return dict(self.orders[order_id])
+
+    def fetch_positions(self, symbols=None):
+        return []
+
+    def fetch_my_trades(self, symbol=None, since=None, limit=None):
+        self.calls.append(('fetch_my_trades', since))
+        rows = [dict(t) for t in self.trades if since is None or t['timestamp'] >= since]
+        return rows[:limit] if limit else rows
+
+    def open_order_at(self, side, price):
+        for order in self.orders.values():
+            if order['status'] == 'open' and order['side'] == side and abs(order['price'] - price) < 1e-9:
+                return order
+        raise AssertionError(f"no open {side} order at {price}")
+
+    def fill(self, side, price):
+        order = self.open_order_at(side, price)
+        order.update(status='closed', filled=order['amount'], lastTradeTimestamp=self._tick())
+        return order['id']
+
+    def trade(self, side, price, amount, timestamp):
+        """挂单部分 / 全部成交，记录一笔成交明细 (同一毫秒可有多笔)"""
+        order = self.open_order_at(side, price)
+        order['filled'] += amount
+        if order['filled'] >= order['amount'] - 1e-9:
+            order['status'] = 'closed'
+        self.trades.append({'id': f"t{self._tick()}", 'order': order['id'], 'side': side,
+                            'price': price, 'amount': amount, 'timestamp': timestamp})
+        return order['id']
+
+
+def open_book(exchange):
+    return {(o['side'], o['price']) for o in exchange.fetch_open_orders()}
+
+
+def local_book(bot):
+    return {(side, round(bot._grid_price(i), 2)) for side in ('buy', 'sell') for i in bot.active_orders[side]}
+
+
+def make_live_bot(exchange=None, **overrides):
+    bot = make_bot(**overrides)
+    bot.exchange = exchange or FakeExchange()
+    bot.market_symbol = 'BTC/USDT:USDT'
+    bot.running = True
+    return bot
+
+
+def assert_book_consistent(bot):
+    assert local_book(bot) == open_book(bot.exchange)
+    target = bot._target_order_set(bot.gap_idx)
+    assert bot.active_orders['buy'].keys() == target['buy']
+    assert bot.active_orders['sell'].keys() == target['sell']
+    assert {oid: (side, i) for side in ('buy', 'sell') for i, oid in bot.active_orders[side].items()} == bot.order_index
+
+
+class FakeAsyncExchange:
+    """FakeExchange 的异步版本 (模拟 ccxt.async_support): 网络方法为协程，记录同时在途的请求数"""
+    NETWORK_METHODS = ('create_order', 'create_orders', 'cancel_order', 'cancel_all_orders',
+                       'fetch_open_orders', 'fetch_order', 'fetch_positions', 'fetch_my_trades')
+
+    def __init__(self, has=None, latency=0.02):
+        self.sync = FakeExchange(has)
+        self.latency = latency
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def __getattr__(self, name):
+        attr = getattr(self.sync, name)
+        if name not in self.NETWORK_METHODS:
+            return attr
+
+        async def call(*args, **kwargs):
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            try:
+                await asyncio.sleep(self.latency)
+                return attr(*args, **kwargs)
+            finally:
+                self.in_flight -= 1
+        return call
@@ -0,0 +1,57 @@
+# tests/test_bot_manager.py
+# ---------------------------------------
+# 多机器人: 默认 async 模式共用事件循环与有界步进线程池，线程数不随机器人数量增长
+# ---------------------------------------
+import threading
+import time
+from types import SimpleNamespace
+
+from app.services.async_runtime import AsyncRuntime
+from app.services.bot_manager import BotManager
+from app.strategies.future_grid_strategy import FutureGridBot
+
+
+def test_fifty_bots_step_on_a_fixed_number_of_threads(monkeypatch, tmp_path):
+    monkeypatch.setattr(BotManager, '_bots', {})
+    monkeypatch.setattr(BotManager, 'EXTERNAL_STATE_PATH', str(tmp_path / 'bot_state.json'))
+    monkeypatch.setattr(BotManager, 'BOTS_STATE_DIR', str(tmp_path / 'bots'))
+
+    def init_exchange(bot):
+        # 模拟模式 (无 API Key)，不连接交易所
+        bot.exchange = SimpleNamespace(apiKey='')
+        bot.market_symbol = bot.config['symbol']
+        return True
+    monkeypatch.setattr(FutureGridBot, 'init_exchange', init_exchange)
+
+    steps = {}
+    step_threads = set()
+    lock = threading.Lock()
+
+    def run_step(bot, price):
+        with lock:
+            steps[bot.config['symbol']] = steps.get(bot.config['symbol'], 0) + 1
+            step_threads.add(threading.current_thread().name)
+        time.sleep(0.01)   # 步进内的阻塞调用 (查单 / 下单)
+    monkeypatch.setattr(FutureGridBot, 'run_step', run_step)
+
+    AsyncRuntime.loop()
+    baseline = threading.active_count()
+    bot_ids = [f'bot{i}' for i in range(50)]
+    try:
+        for i, bot_id in enumerate(bot_ids):
+            BotManager.start_bot({'symbol': f'C{i}/USDT', 'lower_price': 90, 'upper_price': 110,
+                                  'grid_num': 20, 'amount': 1}, bot_id)
+
+        deadline = time.time() + 5
+        while len(steps) < 50 and time.time() < deadline:
+            time.sleep(0.1)
+        peak = threading.active_count()
+
+        assert len(steps) == 50
+        assert all(bot.async_mode and bot.running for bot in BotManager.list_bots().values())
+        assert peak <= baseline + AsyncRuntime.STEP_WORKERS
+        assert all(name.startswith('bot-step') for name in step_threads)
+    finally:
+        for bot_id in bot_ids:
+            BotManager.stop_bot(bot_id)
+    assert not any(bot.running for bot in BotManager.list_bots().values())
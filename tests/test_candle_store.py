@@ -0,0 +1,105 @@
+# tests/test_candle_store.py
+# ---------------------------------------
+# K 线仓库: since= 增量补齐 / 缺口整段重建 / 序列的建立与淘汰
+# ---------------------------------------
+import os
+import time
+
+import ccxt
+import pytest
+
+from app.services.candle_store import CandleStore
+from tests.fakes import FakeOhlcvExchange, random_candles
+
+
+@pytest.fixture
+def candle_store(monkeypatch):
+    monkeypatch.setattr(CandleStore, 'CACHE_DIR', None)
+    monkeypatch.setattr(CandleStore, 'REFRESH_INTERVAL', 0)
+    monkeypatch.setattr(CandleStore, '_series', {})
+    monkeypatch.setattr(CandleStore, '_last_refresh', {})
+    monkeypatch.setattr(CandleStore, '_last_access', {})
+    monkeypatch.setattr(CandleStore, '_locks', {})
+    monkeypatch.setattr(CandleStore, 'stats', dict.fromkeys(CandleStore.stats, 0))
+    return CandleStore
+
+
+def test_candle_store_top_up_and_gap_reload(candle_store):
+    tf_ms = 60000
+    start = (int(time.time() * 1000) // tf_ms - 20) * tf_ms
+    exchange = FakeOhlcvExchange(random_candles(20, seed=1, start=start))
+
+    assert candle_store.get_ohlcv(exchange, 'fake', 'BTC/USDT', '1m') == exchange.rows
+    assert candle_store.stats['full_loads'] == 1
+
+    # 新增一根: 只用 since= 增量补齐
+    exchange.rows = exchange.rows + random_candles(1, seed=2, start=start + 20 * tf_ms)
+    assert candle_store.get_ohlcv(exchange, 'fake', 'BTC/USDT', '1m') == exchange.rows
+    assert candle_store.stats['full_loads'] == 1
+    assert exchange.calls[-1][0] is not None
+
+    # 本地缺一根 (重叠段内): 整段重建，之后与上游一致
+    series = candle_store.get_series('fake', 'BTC/USDT', '1m')
+    rows = series.to_list()
+    series.clear()
+    series.merge(rows[:-3] + rows[-2:])
+    assert candle_store.get_ohlcv(exchange, 'fake', 'BTC/USDT', '1m') == exchange.rows
+    assert candle_store.stats['gaps'] == 1
+    assert candle_store.stats['full_loads'] == 2
+
+
+def recent_candles(n, seed=1, tf_ms=60000):
+    start = (int(time.time() * 1000) // tf_ms - n) * tf_ms
+    return random_candles(n, seed=seed, start=start)
+
+
+def test_series_created_only_after_successful_fetch_of_known_market(candle_store, monkeypatch, tmp_path):
+    monkeypatch.setattr(CandleStore, 'CACHE_DIR', str(tmp_path))
+    exchange = FakeOhlcvExchange(recent_candles(20))
+    exchange.markets = {'BTC/USDT': {}}
+    exchange.timeframes = {'1m': '1m', '1h': '1h'}
+
+    # 未知交易对 / 周期: 直接拒绝，不访问交易所
+    with pytest.raises(ccxt.BadSymbol):
+        candle_store.get_ohlcv(exchange, 'fake', '../../etc/passwd', '1m')
+    with pytest.raises(ccxt.BadRequest):
+        candle_store.get_ohlcv(exchange, 'fake', 'BTC/USDT', '7x')
+    assert exchange.calls == []
+
+    # 拉取失败 / 返回空: 不登记序列，也不创建落盘文件
+    def fail(*args, **kwargs):
+        raise ccxt.NetworkError('timeout')
+    monkeypatch.setattr(exchange, 'fetch_ohlcv', fail)
+    with pytest.raises(ccxt.NetworkError):
+        candle_store.get_ohlcv(exchange, 'fake', 'BTC/USDT', '1m')
+    monkeypatch.setattr(exchange, 'fetch_ohlcv', lambda *args, **kwargs: [])
+    assert candle_store.get_ohlcv(exchange, 'fake', 'BTC/USDT', '1h') == []
+    assert candle_store._series == {}
+    assert os.listdir(tmp_path) == []
+
+    # 成功: 建立序列并落盘；移出内存后再次读取时映射落盘文件，只做增量补齐
+    del exchange.fetch_ohlcv
+    assert candle_store.get_ohlcv(exchange, 'fake', 'BTC/USDT', '1m') == exchange.rows
+    assert len(os.listdir(tmp_path)) == 1
+    candle_store.evict('fake')
+    exchange.calls.clear()
+    assert candle_store.get_ohlcv(exchange, 'fake', 'BTC/USDT', '1m') == exchange.rows
+    assert exchange.calls[0][0] is not None
+
+
+def test_series_are_evicted_by_lru_cap_and_idle_time(candle_store, monkeypatch):
+    monkeypatch.setattr(CandleStore, 'MAX_SERIES', 2)
+    exchange = FakeOhlcvExchange(recent_candles(10))
+
+    for symbol in ('A/USDT', 'B/USDT'):
+        candle_store.get_ohlcv(exchange, 'fake', symbol, '1m')
+    candle_store.read('fake', 'A/USDT', '1m')
+    candle_store.get_ohlcv(exchange, 'fake', 'C/USDT', '1m')
+    # B 最久未访问，被淘汰
+    assert set(candle_store._series) == {('fake', 'A/USDT', '1m'), ('fake', 'C/USDT', '1m')}
+
+    assert candle_store.evict_idle(max_idle=60) == 0
+    candle_store._last_access[('fake', 'A/USDT', '1m')] -= 120
+    assert candle_store.evict_idle(max_idle=60) == 1
+    assert set(candle_store._series) == {('fake', 'C/USDT', '1m')}
+    assert set(candle_store._locks) <= {('fake', 'C/USDT', '1m')}
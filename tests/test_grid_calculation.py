@@ -0,0 +1,25 @@
+# tests/test_grid_calculation.py
+# ---------------------------------------
+# 网格索引计算: O(1) 公式与二分查找结果一致
+# ---------------------------------------
+import random
+from bisect import bisect_right
+
+import pytest
+
+from tests.fakes import make_bot
+
+
+@pytest.mark.parametrize('lower,upper,num', [(90, 110, 20), (0.1234, 0.5678, 37), (25000, 31000, 600)])
+def test_grid_index_matches_bisect(lower, upper, num):
+    bot = make_bot(lower_price=lower, upper_price=upper, grid_num=num)
+    grids = list(bot.grids)
+    rng = random.Random(num)
+    prices = grids + [lower - (upper - lower), upper * 2] + [rng.uniform(lower * 0.9, upper * 1.1) for _ in range(500)]
+
+    for price in prices:
+        expected = min(max(bisect_right(grids, price) - 1, 0), len(grids) - 1)
+        assert bot.calculate_grid_index(price) == expected, price
+
+        nearest = min(range(len(grids)), key=lambda i: (abs(grids[i] - price), i))
+        assert bot.nearest_grid_index(price) == nearest, price
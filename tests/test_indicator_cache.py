@@ -0,0 +1,46 @@
+# tests/test_indicator_cache.py
+# ---------------------------------------
+# 指标缓存: 结果与对同一 K 线窗口调用批量函数逐位一致
+# ---------------------------------------
+import random
+
+from app.utils.indicator_cache import IndicatorCache
+from app.utils.indicators import calculate_rsi, calculate_smi
+from tests.fakes import random_candles
+
+WINDOW = 500
+
+
+def expected(window):
+    closes = [row[4] for row in window]
+    return (calculate_rsi(closes), *calculate_smi(closes))
+
+
+def test_rolling_window_matches_batch_past_window_size():
+    history = random_candles(WINDOW + 300, seed=3)
+    cache = IndicatorCache()
+
+    # 历史从不足一个窗口开始增长，越过 500 根后窗口起点随每根新 K 线前移
+    for end in range(WINDOW - 50, len(history) + 1):
+        window = [list(row) for row in history[max(0, end - WINDOW):end]]
+        assert cache.compute('binance', 'BTC/USDT', '1m', window) == expected(window), end
+
+        # 盘中 tick: 只修正未收盘 K 线
+        window[-1][4] += 0.125
+        assert cache.compute('binance', 'BTC/USDT', '1m', window) == expected(window), end
+
+    assert cache.hits > 0
+
+
+def test_compute_many_batch_seed_matches_single_compute():
+    series = {f"S{i}/USDT": random_candles(random.Random(i).randint(4, WINDOW), seed=i)
+              for i in range(IndicatorCache.BATCH_SEED_MIN + 4)}
+    batched, single = IndicatorCache(), IndicatorCache()
+
+    for _ in range(3):
+        results = batched.compute_many('binance', [(s, '1h', rows) for s, rows in series.items()])
+        for symbol, rows in series.items():
+            assert results[(symbol, '1h')] == single.compute('binance', symbol, '1h', rows) == expected(rows)
+            # 下一轮: 滚动一根新 K 线
+            last = rows[-1]
+            rows.append([last[0] + 60000, 0, 0, 0, last[4] + 0.5, 0])
@@ -0,0 +1,55 @@
+# tests/test_indicators.py
+# ---------------------------------------
+# 流式指标 / 向量化批量引擎与单品种批量函数逐位一致
+# ---------------------------------------
+import numpy as np
+import pytest
+
+from app.utils.indicators import (StreamingRSI, StreamingSMI, batch_indicators, calculate_rsi,
+                                  calculate_smi, pad_series)
+from tests.fakes import random_candles
+
+
+@pytest.mark.parametrize('n', [16, 90, 500])
+def test_streaming_matches_single_series(n):
+    ohlcv = random_candles(n, seed=n)
+    closes = [row[4] for row in ohlcv]
+
+    assert StreamingRSI().feed(ohlcv) == calculate_rsi(closes)
+    assert StreamingSMI().feed(ohlcv) == calculate_smi(closes)
+
+
+def test_streaming_live_bar_revisions_match_single_series():
+    ohlcv = random_candles(120, seed=7)
+    rsi, smi = StreamingRSI(), StreamingSMI()
+    rsi.feed(ohlcv)
+    smi.feed(ohlcv)
+
+    # 未收盘 K 线反复修正，已收盘 K 线被交易所修订一次
+    for close in (99.0, 101.5, 100.25):
+        ohlcv[-1] = ohlcv[-1][:4] + [close, 1.0]
+        closes = [row[4] for row in ohlcv]
+        assert rsi.update(ohlcv[-1][0], close) == calculate_rsi(closes)
+        assert smi.update(ohlcv[-1][0], close) == calculate_smi(closes)
+
+    ohlcv[-2] = ohlcv[-2][:4] + [ohlcv[-2][4] + 0.37, 1.0]
+    closes = [row[4] for row in ohlcv]
+    rsi.update(ohlcv[-2][0], ohlcv[-2][4])
+    smi.update(ohlcv[-2][0], ohlcv[-2][4])
+    assert rsi.update(ohlcv[-1][0], ohlcv[-1][4]) == calculate_rsi(closes)
+    assert smi.update(ohlcv[-1][0], ohlcv[-1][4]) == calculate_smi(closes)
+
+
+def test_batch_engine_matches_single_series():
+    series = [random_candles(n, seed=n) for n in (3, 16, 90, 500)]
+    rsi, tsi, signal = batch_indicators(pad_series([[row[4] for row in rows] for rows in series]))
+
+    for row, ohlcv in enumerate(series):
+        closes = [r[4] for r in ohlcv]
+        expected_rsi = calculate_rsi(closes)
+        expected_tsi, expected_signal = calculate_smi(closes)
+        assert np.isnan(rsi[row]) if expected_rsi is None else rsi[row] == expected_rsi
+        if expected_tsi is None:
+            assert np.isnan(tsi[row]) and np.isnan(signal[row])
+        else:
+            assert (tsi[row], signal[row]) == (expected_tsi, expected_signal)
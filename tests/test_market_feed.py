@@ -0,0 +1,64 @@
+# tests/test_market_feed.py
+# ---------------------------------------
+# 共享行情: 机器人登记自己的合约市场，由推送层单独报价并驱动机器人步进
+# ---------------------------------------
+import threading
+import time
+
+from app.services.market_feed import MarketFeed, RestPollingAdapter
+from app.services.monitor import SharedState
+from tests.fakes import make_live_bot
+
+
+class FakePublicExchange:
+    """公共行情客户端: 现货与永续各有报价，BTC/USDT 按显示符号解析为现货"""
+    has = {'fetchTickers': True}
+    prices = {'BTC/USDT': 100.0, 'BTC/USDT:USDT': 101.5}
+
+    def __init__(self):
+        self.calls = []
+
+    def market(self, symbol):
+        return {'symbol': symbol}
+
+    def fetch_tickers(self, symbols):
+        self.calls.append(('fetch_tickers', tuple(symbols)))
+        return {s: {'symbol': s, 'last': self.prices[s]} for s in symbols}
+
+    def fetch_ticker(self, symbol):
+        self.calls.append(('fetch_ticker', symbol))
+        return {'symbol': symbol, 'last': self.prices[symbol]}
+
+
+def test_running_bot_is_driven_by_its_own_market_price(monkeypatch):
+    monkeypatch.setattr(SharedState, 'target_source', 'binance')
+    logs = []
+    bot = make_live_bot(shared_feed=True, exchange_id='binance')
+    bot.log = logs.append
+    bot.min_step_interval = 0
+    stepped = []
+
+    def step(price):
+        stepped.append(price)
+        bot.running = False
+    monkeypatch.setattr(bot, '_step_in_worker', step)
+
+    bot._subscribe_feed()
+    assert MarketFeed.tracked_markets() == ['BTC/USDT:USDT']
+
+    loop = threading.Thread(target=bot._main_loop, daemon=True)
+    loop.start()
+    public = FakePublicExchange()
+    adapter = RestPollingAdapter('binance', MarketFeed.publish)
+    adapter.symbols = ['BTC/USDT']
+    deadline = time.time() + 5
+    while loop.is_alive() and time.time() < deadline:
+        adapter.poll_once(public)
+        time.sleep(0.05)
+    loop.join(timeout=1)
+
+    # 现货报价不驱动合约网格；永续报价来自推送层，机器人没有自行 fetch_ticker
+    assert stepped == [101.5]
+    assert ('fetch_ticker', 'BTC/USDT:USDT') in public.calls
+    assert not [msg for msg in logs if '价格获取失败' in msg]
+    assert MarketFeed.tracked_markets() == []
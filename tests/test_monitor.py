@@ -0,0 +1,117 @@
+# tests/test_monitor.py
+# ---------------------------------------
+# 监控主循环: 按完成顺序逐个发布指标 / 冷启动品种整批播种 / 超时任务带入下一轮
+# ---------------------------------------
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.services import monitor
+from app.services.exchange_registry import ExchangeRegistry
+from app.services.market_bus import MarketBus
+from app.utils.indicator_cache import IndicatorCache
+from app.utils.metrics import Metrics
+from tests.fakes import random_candles
+
+
+@pytest.fixture
+def published(monkeypatch):
+    symbols = []
+    monkeypatch.setattr(monitor.SharedState, 'indicator_cache', IndicatorCache())
+    monkeypatch.setattr(monitor.SharedState, 'watch_settings', {})
+    monkeypatch.setattr(MarketBus, 'publish', lambda symbol, fields, create=True: symbols.append(symbol))
+    return symbols
+
+
+def polled(symbol, seed):
+    monitor.SharedState.watch_settings[symbol] = '1m'
+    return symbol, '1m', 100.0, 5, random_candles(60, seed=seed)
+
+
+def test_hung_symbol_does_not_delay_others_and_is_carried_over(published):
+    fast, slow = polled('FAST/USDT', 1), polled('SLOW/USDT', 2)
+    cache = monitor.SharedState.indicator_cache
+    for symbol, tf, _, _, ohlcv in (fast, slow):
+        cache.compute('binance', symbol, tf, ohlcv)
+
+    release = threading.Event()
+    with ThreadPoolExecutor(2) as pool:
+        fast_future = pool.submit(lambda: fast)
+        slow_future = pool.submit(lambda: release.wait() and slow)
+
+        late = monitor.collect_round('binance', {fast_future: 'FAST/USDT', slow_future: 'SLOW/USDT'}, timeout=0.2)
+        assert published == ['FAST/USDT']
+        assert late == {'SLOW/USDT': slow_future}
+
+        # 下一轮沿用同一个任务，不重复提交
+        release.set()
+        late = monitor.collect_round('binance', {slow_future: 'SLOW/USDT'}, timeout=5)
+        assert published == ['FAST/USDT', 'SLOW/USDT']
+        assert late == {}
+
+
+def test_only_cold_symbols_go_through_batch_seed(published, monkeypatch):
+    cache = monitor.SharedState.indicator_cache
+    warm = polled('WARM/USDT', 0)
+    cache.compute('binance', 'WARM/USDT', '1m', warm[4])
+    cold = [polled(f"C{i}/USDT", i + 1) for i in range(IndicatorCache.BATCH_SEED_MIN)]
+
+    batches = []
+    compute_many = cache.compute_many
+    monkeypatch.setattr(cache, 'compute_many',
+                        lambda source, requests: batches.append([r[0] for r in requests]) or compute_many(source, requests))
+
+    with ThreadPoolExecutor(4) as pool:
+        futures = {pool.submit(lambda item=item: item): item[0] for item in [warm] + cold}
+        assert monitor.collect_round('binance', futures, timeout=5) == {}
+
+    assert batches and sorted(batches[0]) == sorted(item[0] for item in cold)
+    assert len(batches) == 1
+    assert sorted(published) == sorted(item[0] for item in [warm] + cold)
+    assert all(cache.is_warm('binance', item[0], '1m') for item in cold)
+
+
+def test_indicator_timings_are_per_symbol_or_per_batch(published, monkeypatch):
+    monkeypatch.setattr(Metrics, '_series', {})
+    cache = monitor.SharedState.indicator_cache
+    warm = polled('WARM/USDT', 0)
+    cache.compute('binance', 'WARM/USDT', '1m', warm[4])
+    cold = [polled(f"C{i}/USDT", i + 1) for i in range(3)]
+
+    with ThreadPoolExecutor(4) as pool:
+        futures = {pool.submit(lambda item=item: item): item[0] for item in [warm] + cold}
+        monitor.collect_round('binance', futures, timeout=5)
+
+    # 单独计算的品种按品种计时；冷启动整批只记一次，不带品种标签
+    labels = {name: [dict(l) for n, l in Metrics._series if n == name]
+              for name in ('indicator_compute_seconds', 'indicator_batch_seconds')}
+    assert labels['indicator_compute_seconds'] == [{'source': 'binance', 'symbol': 'WARM/USDT', 'tf': '1m'}]
+    assert labels['indicator_batch_seconds'] == [{'source': 'binance'}]
+    assert Metrics._series[('indicator_batch_seconds', (('source', 'binance'),))].count == 1
+
+
+def test_each_worker_thread_gets_its_own_public_client(monkeypatch):
+    created = []
+
+    def create(exchange_id, market_type=None):
+        created.append((exchange_id, market_type))
+        return object()
+
+    monkeypatch.setattr(ExchangeRegistry, 'create', staticmethod(create))
+    monkeypatch.setattr(ExchangeRegistry, 'ensure_markets', classmethod(lambda cls, client: {}))
+    monkeypatch.setattr(monitor, '_worker_local', threading.local())
+
+    barrier = threading.Barrier(4)
+
+    def worker_clients():
+        barrier.wait()
+        return [monitor.get_worker_exchange('okx') for _ in range(3)]
+
+    with ThreadPoolExecutor(4) as pool:
+        per_worker = list(pool.map(lambda _: worker_clients(), range(4)))
+
+    # 同一线程内复用，线程之间互不共用
+    assert all(len({id(c) for c in clients}) == 1 for clients in per_worker)
+    assert len({id(clients[0]) for clients in per_worker}) == 4
+    assert created == [('okx', 'swap')] * 4
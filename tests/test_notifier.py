@@ -0,0 +1,85 @@
+# tests/test_notifier.py
+# ---------------------------------------
+# 消息派发: 失败渠道按到期时间重新排期，不阻塞其它渠道
+# ---------------------------------------
+import time
+
+import pytest
+
+from app.utils.notifier import NotificationDispatcher
+
+TELEGRAM = ('telegram', 'https://tg.example/send', 'text', (('chat_id', 1),))
+DISCORD = ('discord', 'https://discord.example/hook', 'content', ())
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+    def json(self):
+        return {}
+
+
+class FakeSession:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.posts = []
+
+    def post(self, url, json=None, timeout=None):
+        self.posts.append(json)
+        return FakeResponse(self.status_code)
+
+
+@pytest.fixture
+def dispatcher(monkeypatch):
+    sessions = {'telegram': FakeSession(502), 'discord': FakeSession(204)}
+    monkeypatch.setattr(NotificationDispatcher, '_pending', [])
+    monkeypatch.setattr(NotificationDispatcher, '_last_sent', {})
+    monkeypatch.setattr(NotificationDispatcher, '_sessions', sessions)
+    monkeypatch.setattr(NotificationDispatcher, 'stats', dict.fromkeys(NotificationDispatcher.stats, 0))
+    return NotificationDispatcher
+
+
+def test_failing_channel_is_retried_without_blocking_others(dispatcher):
+    sessions = dispatcher._sessions
+    dispatcher._schedule(TELEGRAM, 'alert')
+    dispatcher._schedule(DISCORD, 'alert')
+
+    t0 = time.time()
+    dispatcher._send_due()
+    # 派发线程不因重试退避而休眠: Discord 立即送达，Telegram 排期到 1 秒后重试
+    assert time.time() - t0 < 0.5
+    assert len(sessions['discord'].posts) == 1
+    assert len(sessions['telegram'].posts) == 1
+    assert [(item[2][0], item[4]) for item in dispatcher._pending] == [('telegram', 1)]
+    assert dispatcher._pending[0][0] >= t0 + 1
+
+    # 其后的新消息不等待 Telegram 的重试
+    dispatcher._schedule(DISCORD, 'next', due=time.time())
+    dispatcher._last_sent.clear()
+    dispatcher._send_due()
+    assert len(sessions['discord'].posts) == 2
+    assert len(sessions['telegram'].posts) == 1
+
+    # 重试耗尽后记为失败
+    while dispatcher._pending:
+        due, seq, target, text, attempt = dispatcher._pending.pop()
+        dispatcher._last_sent.clear()
+        dispatcher._schedule(target, text, attempt, due=time.time())
+        dispatcher._send_due()
+    assert len(sessions['telegram'].posts) == dispatcher.MAX_RETRIES + 1
+    assert dispatcher.stats['retried'] == dispatcher.MAX_RETRIES
+    assert dispatcher.stats['failed'] == 1
+    assert dispatcher.stats['sent'] == 2
+
+
+def test_rate_limited_target_is_rescheduled_instead_of_sleeping(dispatcher):
+    dispatcher._schedule(DISCORD, 'first')
+    dispatcher._schedule(DISCORD, 'second')
+
+    t0 = time.time()
+    dispatcher._send_due()
+    assert time.time() - t0 < 0.2
+    assert [p['content'] for p in dispatcher._sessions['discord'].posts] == ['first']
+    assert dispatcher._pending[0][3] == 'second'
+    assert dispatcher._pending[0][0] == pytest.approx(dispatcher._last_sent[DISCORD] + dispatcher.MIN_INTERVAL['discord'])
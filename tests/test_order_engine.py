@@ -0,0 +1,205 @@
+# tests/test_order_engine.py
+# ---------------------------------------
+# 挂单簿与交易所对账 (交易所为内存假实现)
+# ---------------------------------------
+import threading
+import time
+
+import pytest
+
+from app.services.async_runtime import AsyncExchangeFacade
+from tests.fakes import FakeAsyncExchange, FakeExchange, assert_book_consistent, make_live_bot, open_book
+
+
+def test_multi_fill_reconciliation_moves_gap_once():
+    bot = make_live_bot()
+    bot.initialize_grid_orders(100.0)
+    assert bot.gap_idx == 10
+    assert_book_consistent(bot)
+    assert len(bot.order_index) == 6
+
+    # 两档卖单在同一轮内成交: 空档直接移到最后成交的一档
+    bot.exchange.fill('sell', 101.0)
+    bot.exchange.fill('sell', 102.0)
+    bot._check_order_status()
+
+    assert bot.gap_idx == 12
+    assert_book_consistent(bot)
+
+    # 反向: 三档买单成交
+    for price in (101.0, 100.0, 99.0):
+        bot.exchange.fill('buy', price)
+    bot._check_order_status()
+
+    assert bot.gap_idx == 9
+    assert_book_consistent(bot)
+
+
+def test_order_wall_keeps_full_depth_at_range_edge():
+    bot = make_live_bot(lower_price=90, upper_price=110, grid_num=20, active_order_limit=3)
+    bot.initialize_grid_orders(109.6)
+    assert bot.gap_idx == 20
+    assert len(bot.active_orders['sell']) == 3
+    assert len(bot.active_orders['buy']) == 3
+    assert open_book(bot.exchange) >= {('sell', 111.0), ('sell', 112.0), ('sell', 113.0)}
+    assert_book_consistent(bot)
+
+
+def trade_queries(exchange):
+    return [call[1] for call in exchange.calls if call[0] == 'fetch_my_trades']
+
+
+def test_trade_cursor_dedupes_and_accumulates_partial_fills():
+    exchange = FakeExchange(has={'fetchMyTrades': True})
+    exchange.milliseconds = lambda: 1_000_000
+    bot = make_live_bot(exchange)
+    bot.initialize_grid_orders(100.0)
+    bot.last_reconcile_time = time.time()
+
+    # 部分成交: 只累计，不推窗
+    sell_id = exchange.trade('sell', 101.0, 0.4, timestamp=1_000_100)
+    bot._check_order_status()
+    assert bot.gap_idx == 10
+    assert bot._fill_progress[sell_id] == pytest.approx(0.4)
+    assert trade_queries(exchange)[-1] == 995_000
+
+    # 同一毫秒的剩余成交 + 一笔非网格订单的成交: since 闭区间会再次返回第一笔，按 id 去重
+    exchange.trade('sell', 101.0, 0.6, timestamp=1_000_100)
+    exchange.trades.append({'id': 'manual', 'order': 'market-1', 'side': 'buy', 'price': 100.0,
+                            'amount': 3.0, 'timestamp': 1_000_100})
+    bot._check_order_status()
+    assert trade_queries(exchange)[-1] == 1_000_100
+    assert bot.gap_idx == 11
+    assert sell_id not in bot._fill_progress
+    assert_book_consistent(bot)
+
+    # 没有新成交: 重复返回的旧成交不会再次推窗
+    bot._check_order_status()
+    assert bot.gap_idx == 11
+    assert_book_consistent(bot)
+
+
+def test_batch_create_orders_handles_partial_rejections():
+    exchange = FakeExchange(has={'createOrders': True})
+    exchange.rejected_prices = {98.0}
+    exchange.failing_batch_prices = {103.0}
+    bot = make_live_bot(exchange)
+    bot.initialize_grid_orders(100.0)
+
+    # 6 单按每批 5 单拆成两批: 第一批中 98 被单独拒绝，第二批整批失败后逐单补挂
+    batches = [call[1] for call in exchange.calls if call[0] == 'create_orders']
+    assert batches == [(99.0, 98.0, 97.0, 101.0, 102.0), (103.0,)]
+    assert [call[1] for call in exchange.calls if call[0] == 'create_order'] == [103.0]
+    assert open_book(exchange) == {('buy', 99.0), ('buy', 97.0),
+                                   ('sell', 101.0), ('sell', 102.0), ('sell', 103.0)}
+    assert set(bot.active_orders['buy']) == {9, 7}
+    assert set(bot.active_orders['sell']) == {11, 12, 13}
+    assert len(bot.order_index) == 5
+
+    # 下一次成交推窗时补上被拒绝的一档
+    exchange.rejected_prices.clear()
+    exchange.fill('sell', 101.0)
+    bot._check_order_status()
+    assert bot.gap_idx == 11
+    assert_book_consistent(bot)
+
+
+def test_async_facade_gathers_order_calls_concurrently():
+    client = FakeAsyncExchange()
+    bot = make_live_bot(AsyncExchangeFacade(client))
+    assert hasattr(bot.exchange, 'gather')
+
+    bot.initialize_grid_orders(100.0)
+    assert_book_consistent(bot)
+    # 整面挂单墙在事件循环上一次 gather 提交
+    assert client.max_in_flight == 6
+
+    # 失败的调用按位置返回异常对象，不影响其余结果
+    results = bot._gather_calls(('fetch_order', ('missing',), {}),
+                                ('fetch_open_orders', (bot.market_symbol,), {}))
+    assert isinstance(results[0], KeyError)
+    assert len(results[1]) == 6
+
+    client.sync.fill('sell', 101.0)
+    client.sync.fill('sell', 102.0)
+    bot._check_order_status()
+    assert bot.gap_idx == 12
+    assert_book_consistent(bot)
+
+
+def order_ids(exchange):
+    return {o['id'] for o in exchange.fetch_open_orders()}
+
+
+def test_rebalance_keeps_unchanged_orders_and_diffs_the_rest():
+    bot = make_live_bot()
+    bot.initialize_grid_orders(100.0)
+    exchange = bot.exchange
+    original = order_ids(exchange)
+
+    # 只加大挂单数: 原 6 单全部保留，两侧各补 2 单
+    bot.config['active_order_limit'] = 5
+    exchange.calls.clear()
+    bot.rebalance_orders(100.0)
+    assert not [c for c in exchange.calls if c[0] == 'cancel_order']
+    assert sorted(c[1] for c in exchange.calls if c[0] == 'create_order') == [95.0, 96.0, 104.0, 105.0]
+    assert original < order_ids(exchange)
+    assert_book_consistent(bot)
+
+    # 扩大区间但步长不变 (regrid): 价格相同的挂单重映射到新网格索引，无需撤挂
+    before = order_ids(exchange)
+    bot.config.update(lower_price=80, upper_price=120, grid_num=40)
+    exchange.calls.clear()
+    bot.rebalance_orders(100.0, regrid=True)
+    assert exchange.calls == []
+    assert order_ids(exchange) == before
+    assert bot.gap_idx == 20
+    assert_book_consistent(bot)
+
+    # 步长减半: 仍落在整数价位上的挂单保留，其余撤销 / 新挂
+    bot.config.update(grid_num=80)
+    exchange.calls.clear()
+    bot.rebalance_orders(100.0, regrid=True)
+    cancelled = {c[1] for c in exchange.calls if c[0] == 'cancel_order'}
+    placed = sorted(c[1] for c in exchange.calls if c[0] == 'create_order')
+    assert {exchange.orders[oid]['price'] for oid in cancelled} == {95.0, 96.0, 97.0, 103.0, 104.0, 105.0}
+    assert placed == [97.5, 98.5, 99.5, 100.5, 101.5, 102.5]
+    assert order_ids(exchange) >= before - cancelled
+    assert_book_consistent(bot)
+
+    # 下单数量变化: 所有挂单都被替换
+    bot.config['amount'] = 2
+    exchange.calls.clear()
+    bot.rebalance_orders(100.0)
+    assert len([c for c in exchange.calls if c[0] == 'cancel_order']) == 10
+    assert not order_ids(exchange) & before
+    assert {o['amount'] for o in exchange.fetch_open_orders()} == {2.0}
+    assert_book_consistent(bot)
+
+
+def test_account_reads_do_not_queue_behind_order_submits():
+    bot = make_live_bot()
+    release = threading.Event()
+    order_pool = bot._order_pool()
+    # 占满共享下单线程池
+    blockers = [order_pool.submit(release.wait) for _ in range(bot.SUBMIT_POOL_SIZE)]
+    try:
+        done = threading.Event()
+        threads = []
+
+        def fetch_positions(symbols=None):
+            threads.append(threading.current_thread().name)
+            return []
+        bot.exchange.fetch_positions = fetch_positions
+        bot.exchange.fetch_balance = lambda: threads.append(threading.current_thread().name) or {}
+
+        def sync():
+            bot._gather_calls(('fetch_positions', (), {}), ('fetch_balance', (), {}), account=True)
+            done.set()
+        threading.Thread(target=sync, daemon=True).start()
+        assert done.wait(2)
+        assert all(name.startswith('account-sync') for name in threads) and len(threads) == 2
+    finally:
+        release.set()
+        for f in blockers:
+            f.result()
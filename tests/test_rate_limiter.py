@@ -0,0 +1,17 @@
+# tests/test_rate_limiter.py
+# ---------------------------------------
+# 限频桶: 低优先级不能动用为高优先级预留的额度
+# ---------------------------------------
+from app.services.rate_limiter import RateLimiter, _Bucket
+
+
+def test_rate_limiter_reserves_capacity_for_higher_priorities():
+    bucket = _Bucket(rate=0.001, capacity=10)
+    granted = 0
+    while not bucket.try_acquire(1, RateLimiter.MARKET):
+        granted += 1
+    # MARKET 不能动用 30% 预留，剩余额度仍可供 ACCOUNT / ORDER 使用
+    assert granted == 7
+    assert bucket.try_acquire(1, RateLimiter.CHART) > 0
+    assert bucket.try_acquire(1, RateLimiter.ACCOUNT) == 0
+    assert bucket.try_acquire(1, RateLimiter.ORDER) == 0